@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# PYTHON_ARGCOMPLETE_OK
+"""
+Measure the startup cost of every CLI entry point in this repository.
+
+For each script, the cumulative import time reported by `python -X importtime` is collected while printing --help.
+For scripts that run tests, the time from process launch until the first test is scheduled is also measured.
+Every measurement is repeated and the median is compared against a budget; the script exits non-zero if any entry
+point goes over budget so that slow imports sneaking back onto the startup path get caught in CI.
+"""
+import argparse
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import timeit
+from typing import List, Optional, Dict, Any
+
+# Scripts that accept --help without side effects
+ENTRY_POINTS = ["run.py", "run_performance.py", "run_unit.py", "create_graph.py", "merge.py", "patch.py",
+                "unpatch.py", "setup_unit_tests.py", "generate_workloads.py", "report.py",
+                "history.py", "compare.py", "dependencies.py"]
+
+# Scripts that schedule tests, and so have a meaningful time-to-first-test
+TEST_ENTRY_POINTS = ["run.py", "run_performance.py"]
+
+# Lines printed with --progress when a test is first handed to a worker
+FIRST_TEST_MARKERS = ("Running test", "Skipping test", "Ignoring test")
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def parse_importtime(stderr: str) -> int:
+    """
+    Sum the cumulative import time in microseconds of every top level import in `python -X importtime` output.
+
+    Each line looks like "import time:       self [us] |  cumulative | imported package", and nested imports are
+    indented under the package that imported them, so only unindented packages are counted.
+    """
+    total = 0
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3:
+            continue
+        cumulative, package = fields[1].strip(), fields[2]
+        if not cumulative.isdigit():
+            # header line
+            continue
+        if package.startswith("  "):
+            # nested import, already included in its parent's cumulative time
+            continue
+        total += int(cumulative)
+    return total
+
+
+def measure_import_time(script: str) -> float:
+    """
+    Return the cumulative import time of a script in milliseconds.
+    """
+    cmd = [sys.executable, "-X", "importtime", os.path.join(SCRIPT_DIR, script), "--help"]
+    p = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, cwd=SCRIPT_DIR)
+    if p.returncode != 0:
+        raise RuntimeError(f"{script} --help failed with exit code {p.returncode}:\n"
+                           f"{p.stderr.decode('utf-8', errors='ignore')}")
+    return parse_importtime(p.stderr.decode("utf-8", errors="ignore")) / 1000
+
+
+def measure_first_test_time(script: str, test_args: List[str]) -> Optional[float]:
+    """
+    Return the time in milliseconds from launching a script until it reports scheduling its first test.
+
+    The script is killed as soon as the first test is seen, so the runner itself never needs to be installed.
+    Returns None if the script exited without scheduling a test.
+    """
+    cmd = [sys.executable, "-u", os.path.join(SCRIPT_DIR, script), "--progress"] + test_args
+    start = timeit.default_timer()
+    # in a session of its own, so the test workers and runner it started can be killed along with it
+    p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, cwd=SCRIPT_DIR,
+                         start_new_session=True)
+    try:
+        for raw_line in p.stdout:
+            if raw_line.decode("utf-8", errors="ignore").startswith(FIRST_TEST_MARKERS):
+                return (timeit.default_timer() - start) * 1000
+        return None
+    finally:
+        try:
+            os.killpg(p.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        p.wait()
+
+
+def benchmark(options: argparse.Namespace) -> List[Dict[str, Any]]:
+    """
+    Benchmark every selected entry point and return one result row per script.
+    """
+    scripts = options.scripts.split(",") if options.scripts is not None else ENTRY_POINTS
+    test_args = ["--runner", options.runner, "--numbers", options.numbers, "--versions", options.versions]
+    results = []
+    for script in scripts:
+        import_times = [measure_import_time(script) for _ in range(options.repeat)]
+        row = {"script": script, "import_ms": statistics.median(import_times), "first_test_ms": None}
+        if script in TEST_ENTRY_POINTS and not options.skip_first_test:
+            first_test_times = [measure_first_test_time(script, test_args) for _ in range(options.repeat)]
+            if None not in first_test_times:
+                row["first_test_ms"] = statistics.median(first_test_times)
+        results.append(row)
+    return results
+
+
+def check_budgets(results: List[Dict[str, Any]], import_budget: float, first_test_budget: float) -> bool:
+    """
+    Print a report of the benchmark and return False if any entry point is over budget.
+    """
+    within_budget = True
+    print(f'{"Entry point":<24}{"Import (ms)":>14}{"First test (ms)":>18}')
+    for row in results:
+        over = []
+        if row["import_ms"] > import_budget:
+            over.append("import")
+        if row["first_test_ms"] is not None and row["first_test_ms"] > first_test_budget:
+            over.append("first test")
+        first_test = f'{row["first_test_ms"]:.1f}' if row["first_test_ms"] is not None else "-"
+        flag = f'  OVER BUDGET ({", ".join(over)})' if over else ""
+        print(f'{row["script"]:<24}{row["import_ms"]:>14.1f}{first_test:>18}{flag}')
+        within_budget = within_budget and not over
+    return within_budget
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scripts", default=None,
+                        help=f"Comma separated list of entry points to measure. Default: {','.join(ENTRY_POINTS)}")
+    parser.add_argument("--repeat", default=5, type=int, help="Number of times to measure each entry point.")
+    parser.add_argument("--import-budget", default=300, type=float,
+                        help="Maximum cumulative import time in milliseconds for any entry point.")
+    parser.add_argument("--first-test-budget", default=1500, type=float,
+                        help="Maximum time in milliseconds from launch until the first test is scheduled.")
+    parser.add_argument("--skip-first-test", default=False, action="store_true",
+                        help="Only measure import time.")
+    parser.add_argument("--runner", default="miniwdl", help="Runner to pass when measuring time-to-first-test.")
+    parser.add_argument("--numbers", default="0", help="Test numbers to pass when measuring time-to-first-test.")
+    parser.add_argument("--versions", default="1.0", help="WDL version to pass when measuring time-to-first-test.")
+    import argcomplete
+    argcomplete.autocomplete(parser)
+    options = parser.parse_args(argv)
+
+    results = benchmark(options)
+    if not check_budgets(results, options.import_budget, options.first_test_budget):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+columnar.py: Store performance results in a columnar file with a real schema.
+
+The performance CSV mixes runtimes with the statuses of tests that didn't succeed in one Runtime column, so every
+reader has to re-parse it. A columnar file instead has one typed row per run, with the test, runner and its
+fingerprint, WDL version, repeat, status, wall and CPU time, peak memory, runner overhead and the time spent in each
+phase of the run. Files ending in .parquet are written as Parquet, and files ending in .arrow or .feather as Arrow IPC.
+
+pyarrow is only needed to read or write these files, so it is imported when one is used.
+"""
+from typing import Optional, Any, Dict, List, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
+
+COLUMNAR_EXTENSIONS = (".parquet", ".arrow", ".feather")
+
+# Phases of a test execution that are timed, as stored in each response under 'phases'
+PHASES = ["setup", "run", "verify", "collect"]
+
+# Column names and their Arrow types, in order. Wall time, CPU time and peak memory are only recorded for timed
+# runs; the runtime in the performance CSV is the wall time of a succeeded run.
+COLUMNS = [
+    ("test_id", "string"),
+    ("number", "int32"),
+    ("runner", "string"),
+    ("runner_fingerprint", "string"),
+    ("wdl_version", "string"),
+    ("repeat", "int32"),
+    ("warmup", "bool_"),
+    ("status", "string"),
+    ("wall_time", "float64"),
+    ("cpu_time", "float64"),
+    ("max_rss_bytes", "int64"),
+    ("overhead", "float64"),
+] + [(f"phase_{phase}", "float64") for phase in PHASES]
+
+# pandas types that can hold each Arrow type along with nulls, so that integer columns with missing values aren't
+# turned into floats when files are combined
+PANDAS_TYPES = {"string": "string", "int32": "Int32", "int64": "Int64", "bool_": "boolean", "float64": "float64"}
+
+
+def is_columnar(path: str) -> bool:
+    """
+    Check if a path names a columnar results file rather than a CSV.
+    """
+    return path.endswith(COLUMNAR_EXTENSIONS)
+
+
+def import_pyarrow():
+    """
+    Import pyarrow, with a helpful error if it isn't installed.
+    """
+    try:
+        import pyarrow
+    except ImportError:
+        raise RuntimeError("Reading or writing Parquet or Arrow files requires pyarrow. Install it with "
+                           "`pip install pyarrow`.")
+    return pyarrow
+
+
+def get_schema() -> "pa.Schema":
+    """
+    Get the Arrow schema of a columnar results file.
+    """
+    pa = import_pyarrow()
+    return pa.schema([(name, getattr(pa, type_name)()) for name, type_name in COLUMNS])
+
+
+def responses_to_columns(all_responses: Dict[str, List[Dict[str, Any]]], overheads: Dict[str, Optional[float]],
+                         warmup: bool = False) -> Dict[str, List[Any]]:
+    """
+    Turn the test responses of each runner into columns, with one row per run.
+    """
+    columns: Dict[str, List[Any]] = {name: [] for name, _ in COLUMNS}
+    for runner, test_responses in all_responses.items():
+        for response in test_responses:
+            time = response.get("time") or {}
+            phases = response.get("phases") or {}
+            cpu_time = time["user"] + time["sys"] if time.get("user") is not None else None
+            row = {
+                "test_id": str(response["id"]),
+                "number": response["number"],
+                "runner": runner,
+                "runner_fingerprint": response.get("runner_fingerprint"),
+                "wdl_version": response.get("version"),
+                "repeat": response.get("repeat"),
+                "warmup": warmup,
+                "status": response["status"],
+                "wall_time": time.get("real"),
+                "cpu_time": cpu_time,
+                "max_rss_bytes": response.get("max_rss"),
+                "overhead": overheads.get(runner),
+            }
+            row.update({f"phase_{phase}": phases.get(phase) for phase in PHASES})
+            for name, values in columns.items():
+                values.append(row[name])
+    return columns
+
+
+def concat_columns(*all_columns: Dict[str, List[Any]]) -> Dict[str, List[Any]]:
+    """
+    Join the rows of several sets of columns.
+    """
+    return {name: [value for columns in all_columns for value in columns[name]] for name, _ in COLUMNS}
+
+
+def write_columnar(columns: Dict[str, List[Any]], path: str) -> None:
+    """
+    Write columns to a Parquet or Arrow IPC file, depending on its extension.
+    """
+    pa = import_pyarrow()
+    write_table(pa.Table.from_pydict(columns, schema=get_schema()), path)
+
+
+def frame_to_table(df: "pd.DataFrame") -> "pa.Table":
+    """
+    Turn a dataframe of columnar results, such as several files read with read_columnar and concatenated, into an
+    Arrow table with the schema of a columnar results file. Columns it doesn't have, as in files from older versions,
+    are all nulls.
+    """
+    import pandas as pd
+    pa = import_pyarrow()
+    df = pd.DataFrame({name: (df[name] if name in df.columns else pd.Series(None, index=df.index, dtype=object))
+                       .astype(PANDAS_TYPES[type_name]) for name, type_name in COLUMNS}, index=df.index)
+    return pa.Table.from_pandas(df, schema=get_schema(), preserve_index=False)
+
+
+def write_table(table: "pa.Table", path: str) -> None:
+    """
+    Write an Arrow table to a Parquet or Arrow IPC file, depending on its extension.
+    """
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        pq.write_table(table, path)
+    else:
+        import pyarrow.feather as feather
+        feather.write_feather(table, path)
+
+
+def read_columnar(path: str) -> "pd.DataFrame":
+    """
+    Read a Parquet or Arrow IPC results file into a dataframe.
+    """
+    import_pyarrow()
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        table = pq.read_table(path)
+    else:
+        import pyarrow.feather as feather
+        table = feather.read_table(path)
+    return table.to_pandas()
+
+
+def to_performance_csv_frame(df: "pd.DataFrame") -> "pd.DataFrame":
+    """
+    Convert a columnar results dataframe to the columns of the performance CSV, leaving out warm-up runs. As in the
+    CSV, the runtime of a run that didn't succeed is its status.
+    """
+    import pandas as pd
+    df = df[~df["warmup"].fillna(False).astype(bool)]
+    succeeded = df["status"] == "SUCCEEDED"
+    return pd.DataFrame({
+        "Test ID": df["test_id"].astype(str),
+        "Runner": df["runner"].astype(str),
+        "Runtime": df["wall_time"].astype(object).where(succeeded, df["status"]),
+        "Runner Fingerprint": df["runner_fingerprint"].fillna(""),
+        "Overhead": df["overhead"].astype(object).where(df["overhead"].notna(), ""),
+    }).reset_index(drop=True)
+
+
+def read_performance_frame(path: str) -> "pd.DataFrame":
+    """
+    Read a performance CSV, or a columnar results file as the columns of one.
+    """
+    import pandas as pd
+    if is_columnar(path):
+        return to_performance_csv_frame(read_columnar(path))
+    return pd.read_csv(path)
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# PYTHON_ARGCOMPLETE_OK
+"""
+Compare the runtimes of a candidate set of results against a baseline, and fail on significant regressions.
+
+Each set of results is either a CSV (or columnar file) from run_performance.py, or a run in a history database from
+--history-db:
+
+    python compare.py baseline.csv candidate.csv
+    python compare.py --db history.db 12 latest
+
+For every test and runner in both sets, the succeeded runtimes are compared with a two-sided Mann-Whitney U test,
+which assumes nothing about how runtimes are distributed. The p-values are corrected for testing many tests at once
+(Holm by default, or Benjamini-Hochberg), and each significant change is reported with the ratio of the medians and
+the rank-biserial correlation (from -1, always faster, to 1, always slower) as effect sizes. The exit code is 1 if any
+test got significantly slower by more than --threshold, so that runner upgrades can be gated in CI.
+"""
+import argparse
+import math
+import os
+import statistics
+import sys
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
+
+# Largest combined sample size for which exact Mann-Whitney p-values are computed, when there are no ties
+EXACT_LIMIT = 50
+
+
+def load_results_file(path: str) -> Dict[Tuple[str, str], List[float]]:
+    """
+    Load the succeeded runtimes in a performance CSV or columnar file, by (test ID, runner).
+    """
+    import pandas as pd
+    from columnar import read_performance_frame
+    df = read_performance_frame(path)
+    runtimes = pd.to_numeric(df["Runtime"], errors="coerce")
+    succeeded = runtimes.notna()
+    grouped = runtimes[succeeded].groupby([df["Test ID"][succeeded].astype(str), df["Runner"][succeeded]], sort=False)
+    return {key: series.tolist() for key, series in grouped}
+
+
+def load_history_run(db: str, run: str) -> Dict[Tuple[str, str], List[float]]:
+    """
+    Load the succeeded runtimes of a run in a history database, by (test ID, runner). The run is its ID, or "latest".
+    """
+    from history import connect, get_run_times
+    connection = connect(db)
+    if run == "latest":
+        row = connection.execute("SELECT MAX(id) FROM runs").fetchone()
+        if row[0] is None:
+            raise Exception(f"'{db}' has no runs!")
+        run_id = row[0]
+    else:
+        run_id = int(run)
+    times = get_run_times(connection, run_id)
+    connection.close()
+    return times
+
+
+def rank(values: List[float]) -> Tuple[List[float], List[int]]:
+    """
+    Rank values from 1, giving tied values the average of their ranks. Also returns the size of each group of ties.
+    """
+    order = sorted(range(len(values)), key=lambda i: values[i])
+    ranks = [0.0] * len(values)
+    ties = []
+    start = 0
+    while start < len(order):
+        end = start
+        while end + 1 < len(order) and values[order[end + 1]] == values[order[start]]:
+            end += 1
+        for i in range(start, end + 1):
+            ranks[order[i]] = (start + end) / 2 + 1
+        ties.append(end - start + 1)
+        start = end + 1
+    return ranks, ties
+
+
+@lru_cache(maxsize=None)
+def u_distribution(m: int, n: int) -> Tuple[int, ...]:
+    """
+    Count the orderings of samples of sizes m and n without ties that give each value of U, from 0 to m * n.
+    """
+    if m == 0 or n == 0:
+        return (1,)
+    # the largest value either ends the first sample, adding n to U, or ends the second sample
+    with_last_in_first = u_distribution(m - 1, n)
+    with_last_in_second = u_distribution(m, n - 1)
+    counts = [0] * (m * n + 1)
+    for u, count in enumerate(with_last_in_first):
+        counts[u + n] += count
+    for u, count in enumerate(with_last_in_second):
+        counts[u] += count
+    return tuple(counts)
+
+
+def mann_whitney_u(baseline: List[float], candidate: List[float]) -> Tuple[float, float]:
+    """
+    Run a two-sided Mann-Whitney U test of whether candidate tends to be larger or smaller than baseline.
+
+    Returns the U statistic of candidate (the number of pairs in which the candidate is larger, counting ties as half)
+    and the p-value, which is exact for small samples without ties and from the tie-corrected normal approximation
+    otherwise.
+    """
+    m, n = len(candidate), len(baseline)
+    ranks, ties = rank(candidate + baseline)
+    u = sum(ranks[:m]) - m * (m + 1) / 2
+    if m + n <= EXACT_LIMIT and all(tie == 1 for tie in ties):
+        counts = u_distribution(m, n)
+        total = sum(counts)
+        lower = sum(counts[:int(u) + 1]) / total
+        upper = sum(counts[int(u):]) / total
+        return u, min(1.0, 2 * min(lower, upper))
+    total_size = m + n
+    tie_correction = sum(tie ** 3 - tie for tie in ties) / (total_size * (total_size - 1))
+    variance = m * n / 12 * (total_size + 1 - tie_correction)
+    if variance == 0:
+        return u, 1.0
+    z = max(0.0, abs(u - m * n / 2) - 0.5) / math.sqrt(variance)
+    return u, math.erfc(z / math.sqrt(2))
+
+
+def adjust_p_values(p_values: List[float], method: str) -> List[float]:
+    """
+    Correct p-values for multiple comparisons with the Holm (family-wise error rate) or Benjamini-Hochberg (false
+    discovery rate) method, or not at all.
+    """
+    count = len(p_values)
+    order = sorted(range(count), key=lambda i: p_values[i])
+    adjusted = [0.0] * count
+    if method == "holm":
+        running = 0.0
+        for position, i in enumerate(order):
+            running = max(running, min(1.0, (count - position) * p_values[i]))
+            adjusted[i] = running
+    elif method == "bh":
+        running = 1.0
+        for position, i in reversed(list(enumerate(order))):
+            running = min(running, count / (position + 1) * p_values[i])
+            adjusted[i] = running
+    else:
+        adjusted = list(p_values)
+    return adjusted
+
+
+def compare(baseline: Dict[Tuple[str, str], List[float]], candidate: Dict[Tuple[str, str], List[float]],
+            correction: str = "holm", min_samples: int = 2) -> List[Dict[str, Any]]:
+    """
+    Compare the runtimes of every (test ID, runner) in both sets of results.
+
+    Returns one comparison per (test ID, runner), with its sample sizes, medians, median ratio, rank-biserial
+    correlation and raw and corrected p-values. Pairs with fewer than min_samples runtimes on either side are included
+    without a p-value.
+    """
+    comparisons = []
+    for key in baseline:
+        if key not in candidate:
+            continue
+        before, after = baseline[key], candidate[key]
+        comparison: Dict[str, Any] = {"test_id": key[0], "runner": key[1], "baseline_n": len(before),
+                                      "candidate_n": len(after), "baseline_median": None, "candidate_median": None,
+                                      "ratio": None, "rank_biserial": None, "p": None, "adjusted_p": None}
+        if len(before) > 0 and len(after) > 0:
+            comparison["baseline_median"] = statistics.median(before)
+            comparison["candidate_median"] = statistics.median(after)
+            if comparison["baseline_median"] > 0:
+                comparison["ratio"] = comparison["candidate_median"] / comparison["baseline_median"]
+        if len(before) >= min_samples and len(after) >= min_samples:
+            u, comparison["p"] = mann_whitney_u(before, after)
+            comparison["rank_biserial"] = 2 * u / (len(before) * len(after)) - 1
+        comparisons.append(comparison)
+    tested = [comparison for comparison in comparisons if comparison["p"] is not None]
+    for comparison, adjusted_p in zip(tested, adjust_p_values([comparison["p"] for comparison in tested],
+                                                              correction)):
+        comparison["adjusted_p"] = adjusted_p
+    return comparisons
+
+
+def get_verdict(comparison: Dict[str, Any], alpha: float, threshold: float) -> str:
+    """
+    Classify a comparison as a regression, an improvement, a significant change within the threshold, unchanged, or
+    untested.
+    """
+    if comparison["adjusted_p"] is None or comparison["ratio"] is None:
+        return "untested"
+    if comparison["adjusted_p"] >= alpha:
+        return "unchanged"
+    if comparison["ratio"] > 1 + threshold:
+        return "regression"
+    if comparison["ratio"] < 1 - threshold:
+        return "improvement"
+    return "within threshold"
+
+
+def print_comparisons(comparisons: List[Dict[str, Any]], verdicts: List[str], show_all: bool) -> None:
+    print(f'{"Test ID":<30}  {"Runner":<16}  {"n":>7}  {"Baseline (s)":>12}  {"Candidate (s)":>13}  {"Change":>8}  '
+          f'{"Effect":>6}  {"p":>8}  {"Adj. p":>8}  Verdict')
+    for comparison, verdict in zip(comparisons, verdicts):
+        if not show_all and verdict not in ("regression", "improvement"):
+            continue
+
+        def number(key: str, spec: str) -> str:
+            return "-" if comparison[key] is None else format(comparison[key], spec)
+        change = "-" if comparison["ratio"] is None else f'{comparison["ratio"] - 1:+.1%}'
+        print(f'{comparison["test_id"]:<30}  {comparison["runner"]:<16}  '
+              f'{f"""{comparison["baseline_n"]}/{comparison["candidate_n"]}""":>7}  '
+              f'{number("baseline_median", ".3f"):>12}  {number("candidate_median", ".3f"):>13}  {change:>8}  '
+              f'{number("rank_biserial", "+.2f"):>6}  {number("p", ".4f"):>8}  {number("adjusted_p", ".4f"):>8}  '
+              f'{verdict}')
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline", help="Baseline results: a CSV or columnar file, or a run ID with --db.")
+    parser.add_argument("candidate", help="Candidate results: a CSV or columnar file, or a run ID with --db.")
+    parser.add_argument("--db", default=None,
+                        help="History database to take the baseline and candidate runs from. Runs are given by ID, "
+                             "or as \"latest\".")
+    parser.add_argument("--alpha", default=0.05, type=float,
+                        help="Significance level, after correcting for multiple comparisons. Default: 0.05")
+    parser.add_argument("--threshold", default=0.05, type=float,
+                        help="Fail if a test's median runtime got significantly slower by more than this fraction. "
+                             "Default: 0.05")
+    parser.add_argument("--correction", default="holm", choices=["holm", "bh", "none"],
+                        help="How to correct p-values for comparing many tests: holm controls the chance of any "
+                             "false alarm, bh (Benjamini-Hochberg) the fraction of false alarms. Default: holm")
+    parser.add_argument("--min-samples", default=5, type=int,
+                        help="Fewest runtimes on each side to test a test and runner. With fewer, no change can be "
+                             "significant. Default: 5")
+    parser.add_argument("--all", default=False, action="store_true",
+                        help="Print every compared test, not just regressions and improvements.")
+    import argcomplete
+    argcomplete.autocomplete(parser)
+    options = parser.parse_args(argv)
+
+    if options.db is not None:
+        if not os.path.exists(options.db):
+            raise Exception(f"'{options.db}' doesn't exist!")
+        baseline = load_history_run(options.db, options.baseline)
+        candidate = load_history_run(options.db, options.candidate)
+    else:
+        for file in (options.baseline, options.candidate):
+            if not os.path.exists(file):
+                raise Exception(f"'{file}' doesn't exist!")
+        baseline = load_results_file(options.baseline)
+        candidate = load_results_file(options.candidate)
+
+    comparisons = compare(baseline, candidate, options.correction, options.min_samples)
+    verdicts = [get_verdict(comparison, options.alpha, options.threshold) for comparison in comparisons]
+    print_comparisons(comparisons, verdicts, options.all)
+    regressions = verdicts.count("regression")
+    untested = verdicts.count("untested")
+    print(f"\n{len(comparisons)} tests compared: {regressions} regressions, {verdicts.count('improvement')} "
+          f"improvements, {verdicts.count('within threshold')} significant changes within "
+          f"{options.threshold:.0%}, {untested} with too few runtimes to test")
+    if regressions > 0:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -19,47 +19,42 @@ import argparse
 import os.path
 import sys
 import uuid
-from collections import defaultdict
-from typing import List, Optional, Dict, Any
-
-import argcomplete
-import matplotlib.pyplot as plt
-import matplotlib.patches as mpatches
-import numpy as np
-import pandas as pd
-from ruamel import yaml
+from concurrent.futures import as_completed, wait, Future, FIRST_COMPLETED, ProcessPoolExecutor
+from typing import List, Optional, Dict, Any, Iterable, Tuple, Set, TypedDict, TYPE_CHECKING
 
 from lib import get_specific_tests
+from runner_styles import graph_position, get_runner_colors
 from run_performance import call_and_write_csv
 from run import add_options
 
-default_color_list = plt.rcParams['axes.prop_cycle'].by_key()['color']
-colors = {
-    "miniwdl": default_color_list[0],
-    "cromwell": default_color_list[1],
-    "toil-wdl-runner": default_color_list[2]
-}
-
-graph_order = ["miniwdl", "toil-wdl-runner", "cromwell"]
+if TYPE_CHECKING:
+    import pandas as pd
+    from matplotlib.figure import Figure
 
 
-def create_bar_graph(all_runtimes: Dict[str, Dict[str, Any]], unique_tests_subset: List[str],
-                     include_runners: List[str], iteration: int, precision: int = 0, label: bool = True) -> None:
+def create_bar_graph(fig: "Figure", all_runtimes: Dict[str, Dict[str, Any]], unique_tests_subset: List[str],
+                     include_runners: List[str], precision: int = 0, label: bool = True,
+                     all_stats: Optional[Dict[str, Dict[str, Optional[Dict[str, float]]]]] = None) -> None:
     """
     Draw the bar graph with error bars representing standard deviation using matplotlib
+    :param fig: figure to draw the graph on
     :param all_runtimes: all runtimes, each list of runtimes is indexed by all_runtimes[test_id][runner].
     Must be in order
     :param unique_tests_subset: list of test ID names specific to this graph call
     :param include_runners: runners in include in a list of strings
-    :param iteration: iteration number
     :param precision: precision for the average runtimes
     :param label: show extra label information on the graph. In this graph, this is the average runtime of each test.
+    :param all_stats: optional; precomputed mean and std of each runner's runtimes, indexed like all_runtimes
     """
+    import matplotlib.patches as mpatches
+    import numpy as np
+
+    colors = get_runner_colors(include_runners)
     total_width = 0.9
     number_of_runners = len(include_runners)
     bar_width = total_width / number_of_runners
 
-    fig, ax = plt.subplots()
+    ax = fig.subplots()
     # # add some text for labels, title and axes ticks
     ax.set_ylabel('Time in Seconds')
     ax.set_title('WDL Test Runtimes')
@@ -67,7 +62,7 @@ def create_bar_graph(all_runtimes: Dict[str, Dict[str, Any]], unique_tests_subse
 
     single_width = 1
 
-    output_order = sorted(include_runners, key=lambda x: graph_order.index(x))
+    output_order = sorted(include_runners, key=graph_position)
 
     def autolabel(rects):
         """
@@ -85,7 +80,11 @@ def create_bar_graph(all_runtimes: Dict[str, Dict[str, Any]], unique_tests_subse
         # store the runner name mapped to the data so it can be graphed in a manual order
         runner_name_to_graph_data = {}
         for runner_idx, (runner_name, runtimes) in enumerate(runner_runtimes.items()):
-            if len(runtimes) != 0:
+            stats = all_stats[test_id][runner_name] if all_stats is not None else None
+            if stats is not None:
+                std = stats["std"]
+                avg = stats["mean"]
+            elif len(runtimes) != 0:
                 std = np.std(runtimes)
                 avg = np.average(runtimes)
             else:
@@ -117,25 +116,28 @@ def create_bar_graph(all_runtimes: Dict[str, Dict[str, Any]], unique_tests_subse
         break
     ax.legend(handles=legend_patch_list)
     x_labels = unique_tests_subset
-    plt.xticks(range(len(x_labels)), x_labels)
-    plt.setp(ax.get_xticklabels(), rotation=45, horizontalalignment='right', fontsize='x-small')
-    plt.tight_layout()
-    plt.figure(iteration)
+    ax.set_xticks(range(len(x_labels)), x_labels, rotation=45, horizontalalignment='right', fontsize='x-small')
+    fig.tight_layout()
 
 
-def create_box_graph(all_runtimes: Dict[str, Dict[str, Any]], unique_tests_subset: List[str],
-                     include_runners: List[str], iteration: int, precision: int = 0, label: bool = True) -> None:
+def create_box_graph(fig: "Figure", all_runtimes: Dict[str, Dict[str, Any]], unique_tests_subset: List[str],
+                     include_runners: List[str], precision: int = 0, label: bool = True) -> None:
     """
     Draw the boxplot graph with matplotlib
+    :param fig: figure to draw the graph on
     :param all_runtimes: all runtimes, each list of runtimes is indexed by all_runtimes[test_id][runner].
         Must be in order
     :param unique_tests_subset: list of test ID names specific to this graph call
     :param include_runners: runners in include in a list of strings
-    :param iteration: iteration number
     :param precision: precision for the median labels
     :param label: whether to draw labels as well. In this graph, the labels are the medians of each entry
     """
-    fig, ax = plt.subplots()
+    from matplotlib.artist import setp
+    import matplotlib.patches as mpatches
+    import numpy as np
+
+    colors = get_runner_colors(include_runners)
+    ax = fig.subplots()
     ax.set_ylabel('Time in Seconds')
     ax.set_title('WDL Test Runtimes')
     ax.set_xlabel('WDL Test ID')
@@ -145,7 +147,7 @@ def create_box_graph(all_runtimes: Dict[str, Dict[str, Any]], unique_tests_subse
     number_of_runners = len(include_runners)
     box_width = total_width / number_of_runners
 
-    output_order = sorted(include_runners, key=lambda x: graph_order.index(x))
+    output_order = sorted(include_runners, key=graph_position)
 
     def autolabel(box_obj):
         """
@@ -162,14 +164,14 @@ def create_box_graph(all_runtimes: Dict[str, Dict[str, Any]], unique_tests_subse
     def autocolor(box_obj, runner_color):
         """
         Color the boxes, fliers, medians, means, whiskers, and caps of a boxplot to the corresponding color
-        according to the `colors` object in the global scope
+        according to the `colors` mapping from get_runner_colors()
         """
         for item in ['boxes', 'fliers', 'medians', 'means']:
             for sub_item in box_obj[item]:
-                plt.setp(sub_item, color=runner_color)
+                setp(sub_item, color=runner_color)
         for item in ['whiskers', 'caps']:
             for sub_items in zip(box_obj[item][::2], box_obj[item][1::2]):
-                plt.setp(sub_items, color=runner_color)
+                setp(sub_items, color=runner_color)
 
     for test_id, runner_runtimes in all_runtimes.items():
         # store the runner name mapped to the data so it can be graphed in a manual order
@@ -202,122 +204,197 @@ def create_box_graph(all_runtimes: Dict[str, Dict[str, Any]], unique_tests_subse
         break
     ax.legend(handles=legend_patch_list)
     ax.set_ylim(bottom=0)
-    plt.xticks(range(len(x_labels)), x_labels)
-    plt.setp(ax.get_xticklabels(), rotation=45, horizontalalignment='right', fontsize='x-small')
-    plt.tight_layout()
-    plt.figure(iteration)
+    ax.set_xticks(range(len(x_labels)), x_labels, rotation=45, horizontalalignment='right', fontsize='x-small')
+    fig.tight_layout()
+
+
+class RuntimeSummary(TypedDict):
+    """
+    Every runtime series and summary statistic needed to draw graphs, computed from the CSV in one pass.
+    """
+    # runners in the order they first appear in the CSV
+    runners: List[str]
+    # runtimes of each (test ID, runner), with runs that didn't succeed as 0
+    runtimes: Dict[Tuple[str, str], List[float]]
+    # mean, median and (population) standard deviation of each (test ID, runner)
+    stats: Dict[Tuple[str, str], Dict[str, float]]
+    # tests that were skipped by every runner on every run
+    skipped_tests: Set[str]
 
 
-def generate_graphs_from_range(df: pd.DataFrame, iteration: int, ignored_runners: Optional[List[str]] = None,
-                               test_ids_to_graph: Optional[List[str]] = None, graph_type="box",
-                               start: Optional[int] = None, end: Optional[int] = None, label: bool = True,
-                               precision: int = 0, ignore_skipped: bool = False) -> None:
+def summarize_runtimes(df: "pd.DataFrame", net_time: bool = False) -> RuntimeSummary:
     """
-    Launch a new graph for each range
+    Group the runtimes in a performance CSV by test and runner, and compute their summary statistics.
+
     :param df: pandas dataframe of csv
-    :param iteration: iteration call number
+    :param net_time: subtract each runner's overhead from its runtimes
+    """
+    import pandas as pd
+
+    runtimes = pd.to_numeric(df["Runtime"], errors="coerce")
+    if net_time:
+        # noise can make a test look faster than a no-op, so don't go below 0
+        runtimes = (runtimes - pd.to_numeric(df["Overhead"], errors="coerce").fillna(0)).clip(lower=0)
+    # the value is SKIPPED or FAILED, so set to 0 to indicate failure to run
+    runtimes = runtimes.fillna(0)
+    grouped = runtimes.groupby([df["Test ID"], df["Runner"]], sort=False)
+    stats = pd.DataFrame({"mean": grouped.mean(), "median": grouped.median(), "std": grouped.std(ddof=0)})
+    ran = (df["Runtime"].astype(str) != "SKIPPED").groupby(df["Test ID"], sort=False).any()
+    return {
+        "runners": df["Runner"].unique().tolist(),
+        "runtimes": {key: series.tolist() for key, series in grouped},
+        "stats": stats.to_dict(orient="index"),
+        "skipped_tests": set(ran.index[~ran]),
+    }
+
+
+class GraphPage(TypedDict):
+    """
+    Everything needed to draw one graph, small enough to send to a rendering process.
+    """
+    graph_type: str
+    # test IDs on the x axis, in order
+    test_ids: List[str]
+    include_runners: List[str]
+    # runtimes and precomputed statistics of each runner, indexed by [test_id][runner]
+    all_runtimes: Dict[str, Dict[str, List[float]]]
+    all_stats: Dict[str, Dict[str, Optional[Dict[str, float]]]]
+    label: bool
+    precision: int
+
+
+def get_graph_page(summary: RuntimeSummary, test_ids_to_graph: List[str], ignored_runners: Optional[List[str]] = None,
+                   graph_type: str = "box", label: bool = True, precision: int = 0,
+                   ignore_skipped: bool = False) -> GraphPage:
+    """
+    Collect what is needed to draw the graph of some tests
+    :param summary: runtimes and statistics from summarize_runtimes
+    :param test_ids_to_graph: test ids to graph, in order
     :param ignored_runners: optional; runner(s) to ignore when graphing
-    :param test_ids_to_graph: optional; list of test ids to graph
     :param graph_type: type of graph to create, default box
-    :param start: optional, start index in df to graph
-    :param end: optional, end index in df to graph
     :param label: optional, whether to graph with labels
     :param precision: number of decimal points to display in the labels
     :param ignore_skipped: ignore skipped tests
     """
-
-    unique_runners = df["Runner"].unique()
-    unique_tests = df["Test ID"].unique()
-    if test_ids_to_graph is None:
-        unique_tests_subset = unique_tests[start:end]
-    else:
-        unique_tests_subset = test_ids_to_graph
+    test_ids = test_ids_to_graph
     if ignore_skipped:
-        # remove all tests that are skipped from the graph
-        parsed_ids = df.query('Runtime == "SKIPPED"')['Test ID'].unique()
-        test_ids_to_skip = set()
-        for test_id in parsed_ids:
-            # in case the csv has other valid runtimes
-            # as of now this will not happen, but it may be useful to add this functionality later
-            # ex: object is not and will never be supported in miniwdl/toil-wdl-runner, that could be considered skipped
-            if len(df.query('`Test ID` == "{test_id}" & Runtime != "SKIPPED"')) == 0:
-                test_ids_to_skip.add(test_id)
-        unique_tests_subset = [test_id for test_id in unique_tests_subset if test_id not in test_ids_to_skip]
-    all_runtimes = defaultdict(lambda: defaultdict(list))
-    for test_idx, test_id in enumerate(unique_tests_subset):
-        for runner_idx, runner in enumerate(unique_runners):
-            if runner in (ignored_runners or []):
-                continue
-            # get rows with same Runner and testID
-            relevant_rows = df.loc[(df['Test ID'] == test_id) & (df["Runner"] == runner)]
-            runtimes = relevant_rows['Runtime'].tolist()
-            for runtimes_idx, time in enumerate(runtimes):
-                try:
-                    runtimes[runtimes_idx] = float(time)
-                except ValueError:
-                    # the value is SKIPPED or FAILED, so set to 0 to indicate failure to run
-                    runtimes[runtimes_idx] = 0
-            all_runtimes[test_id][runner] = runtimes
-    include_runners = unique_runners.tolist()
-    for runner_to_ignore in (ignored_runners or []):
-        include_runners.remove(runner_to_ignore)
-    if graph_type == "box":
-        create_box_graph(all_runtimes, unique_tests_subset if test_ids_to_graph is None else test_ids_to_graph,
-                         include_runners, iteration + 1, label=label, precision=precision)
-    if graph_type == "bar":
-        create_bar_graph(all_runtimes, unique_tests_subset if test_ids_to_graph is None else test_ids_to_graph,
-                         include_runners, iteration + 1, label=label, precision=precision)
+        # remove all tests that no runner ran from the graph
+        test_ids = [test_id for test_id in test_ids if test_id not in summary["skipped_tests"]]
+    include_runners = [runner for runner in summary["runners"] if runner not in (ignored_runners or [])]
+    return {
+        "graph_type": graph_type,
+        "test_ids": test_ids,
+        "include_runners": include_runners,
+        "all_runtimes": {test_id: {runner: summary["runtimes"].get((test_id, runner), []) for runner in include_runners}
+                         for test_id in test_ids},
+        "all_stats": {test_id: {runner: summary["stats"].get((test_id, runner)) for runner in include_runners}
+                      for test_id in test_ids},
+        "label": label,
+        "precision": precision,
+    }
+
+
+def draw_page(fig: "Figure", page: GraphPage) -> None:
+    """
+    Draw the graph of a page onto a figure.
+    """
+    if page["graph_type"] == "box":
+        create_box_graph(fig, page["all_runtimes"], page["test_ids"], page["include_runners"],
+                         label=page["label"], precision=page["precision"])
+    if page["graph_type"] == "bar":
+        create_bar_graph(fig, page["all_runtimes"], page["test_ids"], page["include_runners"],
+                         precision=page["precision"], label=page["label"], all_stats=page["all_stats"])
+
+
+def render_page(page: GraphPage, filepath: str, size: Tuple[float, float]) -> str:
+    """
+    Draw a page on its own headless Agg figure and write it to an image file.
+
+    This doesn't touch pyplot, so no figure is kept registered after it is written and pages can be rendered in any
+    process, in parallel.
+    :param size: width and height of the image in inches
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=size)
+    FigureCanvasAgg(fig)
+    draw_page(fig, page)
+    fig.savefig(filepath, dpi=fig.dpi * 2)
+    return filepath
+
+
+def write_pages(pages: Iterable[GraphPage], filepaths: List[str], size: Tuple[float, float], jobs: int) -> None:
+    """
+    Render pages to image files, in a pool of jobs processes if there is more than one page.
+
+    At most two pages per process are waiting to be rendered at a time, so memory use doesn't grow with the number of
+    pages.
+    """
+    if jobs <= 1 or len(filepaths) <= 1:
+        for page, filepath in zip(pages, filepaths):
+            render_page(page, filepath, size)
+        return
+    jobs = min(jobs, len(filepaths))
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        pending: Set["Future[str]"] = set()
+        for page, filepath in zip(pages, filepaths):
+            if len(pending) >= jobs * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+            pending.add(executor.submit(render_page, page, filepath, size))
+        for future in as_completed(pending):
+            future.result()
 
 
 def create_graph(from_file: str, options: argparse.Namespace) -> None:
-    data = pd.read_csv(from_file)
-    df = pd.DataFrame(data)
+    from ruamel.yaml import YAML
+    from columnar import read_performance_frame
+
+    df = read_performance_frame(from_file)
     number_of_entries_per_graph = options.display_num if not options.display_all else sys.maxsize
+    net_time = options.net_time
+    if net_time and "Overhead" not in df.columns:
+        print(f"Warning: {from_file} has no runner overheads recorded, so graphing total runtimes.")
+        net_time = False
     ignored_runners = None if options.ignore_runner is None else options.ignore_runner.split(",")
     label = not options.no_labels
 
-    unique_tests = df["Test ID"].unique()
+    unique_tests = df["Test ID"].unique().tolist()
+    # group everything once, so each page is only a lookup
+    summary = summarize_runtimes(df, net_time)
     if options.conformance_file is None:
         # TODO: We can't actualy not have a conformance file; it has a default value.
 
         # if test IDs are specified on command line, graph those only
-        test_ids_to_graph = options.id.split(",") if options.id is not None else None
-
-        num_unique_tests_to_display = len(test_ids_to_graph or unique_tests)
-        iterations = num_unique_tests_to_display // number_of_entries_per_graph + (
-                num_unique_tests_to_display % number_of_entries_per_graph != 0)
-        for iteration in range(iterations):
-            start, end = (iteration * number_of_entries_per_graph, iteration *
-                          number_of_entries_per_graph + number_of_entries_per_graph)
-            generate_graphs_from_range(df, iteration, ignored_runners, graph_type=options.graph_type, start=start,
-                                       end=end, label=label, precision=options.precision,
-                                       test_ids_to_graph=test_ids_to_graph, ignore_skipped=options.ignore_skipped)
+        all_test_ids_to_graph = options.id.split(",") if options.id is not None else unique_tests
     else:
         if not os.path.exists(options.conformance_file):
             print(f"Conformance file {options.conformance_file} not found!")
             return
         # graph tests in order according to conformance.yaml
         with open(options.conformance_file, "r") as f:
-            data = yaml.safe_load(f)
+            data = YAML(typ='safe').load(f)
             # this also allows specifying which tests to graph by tag/id/numbers
             all_test_idx_to_graph = get_specific_tests(conformance_tests=data, options=options)
             all_test_ids_to_graph = list_of_idx_to_ids(data, all_test_idx_to_graph)
-        num_unique_tests_to_display = len(all_test_ids_to_graph)
-        iterations = num_unique_tests_to_display // number_of_entries_per_graph + (
-                num_unique_tests_to_display % number_of_entries_per_graph != 0)
-        for iteration in range(iterations):
-            start, end = (iteration * number_of_entries_per_graph, iteration *
-                          number_of_entries_per_graph + number_of_entries_per_graph)
-            test_ids_to_graph = all_test_ids_to_graph[start:end]
-            generate_graphs_from_range(df, iteration, ignored_runners, graph_type=options.graph_type,
-                                       test_ids_to_graph=test_ids_to_graph, label=label, precision=options.precision,
-                                       ignore_skipped=options.ignore_skipped)
+    num_unique_tests_to_display = len(all_test_ids_to_graph)
+    iterations = num_unique_tests_to_display // number_of_entries_per_graph + (
+            num_unique_tests_to_display % number_of_entries_per_graph != 0)
+    # pages are built as they are drawn, so only the ones being drawn are held at once
+    pages = (get_graph_page(summary, all_test_ids_to_graph[start:start + number_of_entries_per_graph],
+                            ignored_runners, graph_type=options.graph_type, label=label,
+                            precision=options.precision, ignore_skipped=options.ignore_skipped)
+             for start in range(0, iterations * number_of_entries_per_graph, number_of_entries_per_graph))
     if options.output is None:
+        import matplotlib.pyplot as plt
+        for iteration, page in enumerate(pages):
+            draw_page(plt.figure(iteration + 1), page)
         plt.show()
     else:
         # else write to a file
         img_filename, img_ext = os.path.splitext(options.output)
-        figure_numbers = plt.get_fignums()
         width_size = 0
         height_size = 0
 
@@ -333,12 +410,11 @@ def create_graph(from_file: str, options: argparse.Namespace) -> None:
         # minimum dimensions so the graph won't be cut off
         min_width = 5
         min_height = 5
-        for i in figure_numbers:
-            figure = plt.figure(i)
-            # default size of figure is too small, so expand
-            figure.set_size_inches(max(width_size, min_width), max(height_size, min_height))
-            filepath = img_filename + str(i) + img_ext if len(figure_numbers) > 1 else options.output
-            plt.savefig(filepath, dpi=plt.figure(i).dpi * 2)
+        # default size of figure is too small, so expand
+        size = (max(width_size, min_width), max(height_size, min_height))
+        filepaths = [img_filename + str(i) + img_ext if iterations > 1 else options.output
+                     for i in range(1, iterations + 1)]
+        write_pages(pages, filepaths, size, options.render_jobs or os.cpu_count() or 1)
 
 
 def list_of_idx_to_ids(conformance_tests, list_of_idx):
@@ -347,7 +423,9 @@ def list_of_idx_to_ids(conformance_tests, list_of_idx):
 
 def add_create_graph_args(parser: argparse.ArgumentParser) -> None:
     graph_args = parser.add_argument_group("Arguments for graphing runtimes of WDL tests")
-    graph_args.add_argument("--from-file", "-f", dest="file", default=None, help="Specify a csv file to read from.")
+    graph_args.add_argument("--from-file", "-f", dest="file", default=None,
+                            help="Specify a csv file to read from, or a .parquet, .arrow or .feather file from "
+                                 "run_performance.py --columnar-output.")
     graph_args.add_argument("--display-num", "-d", default=30, type=int, help="Specify the number of tests to "
                                                                               "display per graph.")
     graph_args.add_argument("--display-all", "-a", default=False, action="store_true",
@@ -363,6 +441,9 @@ def add_create_graph_args(parser: argparse.ArgumentParser) -> None:
     graph_args.add_argument("--ignore-skipped", default=False, action="store_true", help="Specify whether to not graph "
                                                                                         "skipped conformance tests in "
                                                                                         "the graph.")
+    graph_args.add_argument("--net-time", default=False, action="store_true",
+                            help="Subtract each runner's overhead (the time it takes to run a no-op workflow) from "
+                                 "its runtimes, to graph only the time spent on each test's actual work.")
     output_args = parser.add_argument_group("Arguments for specifying how to write the graph to a file.")
     output_args.add_argument("--output", "-o", default=None,
                              help="Instead of displaying the graphs, output it into an image. If --display-num is set "
@@ -374,12 +455,16 @@ def add_create_graph_args(parser: argparse.ArgumentParser) -> None:
     output_args.add_argument("--dimensions", const="default", default=None, nargs="?", action="store",
                              help="If custom dimensions are needed, this can be called with input format x_size,y_size "
                                   "in inches. Calling this with no value will size the graph accordingly.")
+    output_args.add_argument("--render-jobs", default=None, type=int,
+                             help="Number of processes to render graph images in at once. Rendering is headless, so "
+                                  "this works without a display. Default: the number of CPUs")
 
 
 def main(args):
     parser = argparse.ArgumentParser(description=__doc__)
     add_options(parser)
     add_create_graph_args(parser)
+    import argcomplete
     argcomplete.autocomplete(parser)
     options = parser.parse_args(args)
 
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+# PYTHON_ARGCOMPLETE_OK
+"""
+Work out which conformance tests a change to this repository affects, so that CI can run only those.
+
+Each test depends on everything in its test directory (WDL, JSON, patch files and data), on the WDL files its WDL
+imports, on any files its JSON inputs point to, on its setup script and on its entry in the conformance file. These
+are kept in an index in .wdl-conformance-cache, which is only rebuilt when a file it was built from changes or a file
+is added to or removed from a directory it listed. The WDL files a run generates for other versions (_version_*.wdl)
+are ignored. The harness (every script and module at the top of this repository, and the files they read) affects every test.
+
+    python dependencies.py origin/main
+    python run.py --runner miniwdl --changed-since origin/main
+
+With --check-generated, every test is converted to each of its WDL versions, as a run does, to check that this
+doesn't change which tests are affected.
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import subprocess
+import sys
+from typing import Optional, Any, Dict, List, Set
+
+from lib import CACHE_DIR, get_wdl_file, get_test_wdl_file
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Files other than the top-level Python scripts and modules that affect every test when they change
+HARNESS_FILES = ["requirements.txt", "unit_tests_patch_data.yaml", "Makefile", "common.mk"]
+
+WDL_IMPORT = re.compile(r'^\s*import\s+["\']([^"\']+)["\']', re.MULTILINE)
+
+# WDL files generated for other versions by get_wdl_file, and the temporary files they are written through
+GENERATED_FILE = re.compile(r'^_version_.*\.wdl(\..*\.tmp)?$')
+
+
+def is_generated(path: str) -> bool:
+    return GENERATED_FILE.match(os.path.basename(path)) is not None
+
+
+def get_wdl_imports(wdl_file: str) -> List[str]:
+    """
+    Get the paths of the local WDL files a WDL file imports, relative to it. Imports by URL are left out.
+    """
+    with open(wdl_file, "r") as f:
+        imports = WDL_IMPORT.findall(f.read())
+    return [os.path.normpath(os.path.join(os.path.dirname(wdl_file), path)) for path in imports if "://" not in path]
+
+
+def get_input_files(value: Any, base_dir: str) -> List[str]:
+    """
+    Get the paths of the local files and directories that a test's JSON inputs point to.
+    """
+    if isinstance(value, dict):
+        return [path for item in value.values() for path in get_input_files(item, base_dir)]
+    if isinstance(value, list):
+        return [path for item in value for path in get_input_files(item, base_dir)]
+    if isinstance(value, str) and "://" not in value and value.strip() != "":
+        path = os.path.normpath(os.path.join(base_dir, value))
+        if os.path.exists(path):
+            return [path]
+    return []
+
+
+def list_dir(path: str) -> List[str]:
+    """
+    List the entries of a directory, leaving out generated files.
+    """
+    return sorted(entry for entry in os.listdir(path) if not is_generated(entry))
+
+
+def get_test_files(test: Dict[str, Any], sources: Dict[str, int], listings: Dict[str, List[str]]) -> Set[str]:
+    """
+    Get the absolute paths of every file a test depends on, adding each file read to find them to sources with its
+    modification time, and each directory listed to listings with its entries.
+    """
+    test_dir = os.path.abspath(test["inputs"]["dir"])
+    files: Set[str] = set()
+
+    def add_tree(path: str) -> None:
+        if os.path.isdir(path):
+            listings[path] = list_dir(path)
+            for entry in listings[path]:
+                add_tree(os.path.join(path, entry))
+        elif not is_generated(path):
+            files.add(path)
+
+    if os.path.isdir(test_dir):
+        add_tree(test_dir)
+    # WDL files, even if they are outside the test directory, and all they import
+    pending = [os.path.abspath(get_test_wdl_file(test))]
+    while len(pending) > 0:
+        wdl_file = pending.pop()
+        if wdl_file in sources or not os.path.exists(wdl_file):
+            continue
+        files.add(wdl_file)
+        sources[wdl_file] = os.stat(wdl_file).st_mtime_ns
+        pending.extend(get_wdl_imports(wdl_file))
+    if test["inputs"].get("json") is not None:
+        json_file = os.path.join(test_dir, test["inputs"]["json"])
+        if os.path.exists(json_file):
+            files.add(json_file)
+            sources[json_file] = os.stat(json_file).st_mtime_ns
+            with open(json_file, "r") as f:
+                try:
+                    inputs = json.load(f)
+                except ValueError:
+                    inputs = None
+            for path in get_input_files(inputs, test_dir):
+                add_tree(path)
+    if test.get("setup") is not None:
+        files.add(os.path.abspath(test["setup"]))
+    return files
+
+
+def get_harness_files() -> Set[str]:
+    """
+    Get the absolute paths of the files that affect every test: the Python scripts and modules at the top of this
+    repository (run.py, run_performance.py, runners.py and so on), other than the checks of the harness itself, and
+    HARNESS_FILES.
+    """
+    files = {os.path.join(SCRIPT_DIR, file) for file in HARNESS_FILES}
+    files |= {os.path.join(SCRIPT_DIR, file) for file in os.listdir(SCRIPT_DIR)
+              if file.endswith(".py") and not file.startswith("test_")}
+    return files
+
+
+def get_index_path(conformance_file: str) -> str:
+    digest = hashlib.sha1(os.path.abspath(conformance_file).encode()).hexdigest()[:12]
+    return os.path.join(CACHE_DIR, "dependency-index", f"{digest}.json")
+
+
+def build_index(conformance_file: str, tests: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Build the dependency index of a conformance file: the files each test ID depends on, and the modification time of
+    every file read and the entries of every directory listed to find them, to tell when the index is stale.
+    """
+    sources = {os.path.abspath(conformance_file): os.stat(conformance_file).st_mtime_ns}
+    listings: Dict[str, List[str]] = {}
+    test_files = {}
+    for test in tests:
+        test_files[str(test["id"])] = sorted(get_test_files(test, sources, listings))
+    return {"sources": sources, "listings": listings, "tests": test_files}
+
+
+def is_index_current(index: Dict[str, Any]) -> bool:
+    """
+    Check that no file a dependency index was built from has changed, and that no directory it listed has gained or
+    lost an entry since. Generated files don't count, so converting tests for a run leaves the index current.
+    """
+    if "listings" not in index:
+        # from before directories were keyed on their entries
+        return False
+    return (all(os.path.exists(source) and os.stat(source).st_mtime_ns == mtime
+                for source, mtime in index["sources"].items()) and
+            all(os.path.isdir(path) and list_dir(path) == entries for path, entries in index["listings"].items()))
+
+
+def load_index(conformance_file: str, tests: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Load the dependency index of a conformance file from the cache, rebuilding it if anything it was built from has
+    changed since.
+    """
+    path = get_index_path(conformance_file)
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            index = json.load(f)
+        if is_index_current(index):
+            return index
+    index = build_index(conformance_file, tests)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "w") as f:
+        json.dump(index, f)
+    os.replace(path + ".tmp", path)
+    return index
+
+
+def git(args: List[str], cwd: str) -> str:
+    """
+    Run a git command and get its output, raising a RuntimeError with git's message if it fails.
+    """
+    try:
+        result = subprocess.run(["git"] + args, cwd=cwd, capture_output=True, text=True)
+    except OSError as e:
+        raise RuntimeError(f"Can't run git: {e}")
+    if result.returncode != 0:
+        raise RuntimeError(f"git {' '.join(args)} failed: {result.stderr.strip()}")
+    return result.stdout
+
+
+def get_changed_files(ref: str) -> List[str]:
+    """
+    Get the absolute paths of the files that differ between a git ref and the working tree, including untracked files
+    but not generated ones.
+    """
+    top_level = git(["rev-parse", "--show-toplevel"], SCRIPT_DIR).strip()
+    # without rename detection, a renamed file is listed under both its old and its new path
+    changed = git(["diff", "--name-only", "--no-renames", ref, "--"], top_level).splitlines()
+    changed += git(["ls-files", "--others", "--exclude-standard"], top_level).splitlines()
+    return [os.path.join(top_level, path) for path in changed if path.strip() != "" and not is_generated(path)]
+
+
+def get_changed_entries(conformance_file: str, tests: List[Dict[str, Any]], ref: str) -> Set[str]:
+    """
+    Get the IDs of the tests whose entries in a conformance file are new or different since a git ref.
+    """
+    from ruamel.yaml import YAML
+    top_level = git(["rev-parse", "--show-toplevel"], SCRIPT_DIR).strip()
+    path = os.path.relpath(os.path.realpath(conformance_file), os.path.realpath(top_level))
+    try:
+        old_tests = YAML(typ="safe").load(git(["show", f"{ref}:{path}"], top_level)) or []
+    except RuntimeError:
+        # the file is new
+        old_tests = []
+    old_entries = {str(test["id"]): test for test in old_tests}
+    return {str(test["id"]) for test in tests if old_entries.get(str(test["id"])) != test}
+
+
+def get_affected_tests(conformance_file: str, tests: List[Dict[str, Any]], ref: str) -> Optional[Set[str]]:
+    """
+    Get the IDs of the tests in a conformance file that changes since a git ref affect, or None if a harness file
+    changed, which affects every test.
+    """
+    changed = {os.path.realpath(path) for path in get_changed_files(ref)}
+    if not changed.isdisjoint(os.path.realpath(path) for path in get_harness_files()):
+        return None
+    affected = set()
+    if os.path.realpath(conformance_file) in changed:
+        affected |= get_changed_entries(conformance_file, tests, ref)
+    for test_id, files in load_index(conformance_file, tests)["tests"].items():
+        if not changed.isdisjoint(os.path.realpath(path) for path in files):
+            affected.add(test_id)
+    # a deleted file is in no index built since, so it affects the tests in the directory that had it
+    deleted = [path for path in changed if not os.path.lexists(path)]
+    for test in tests:
+        test_dir = os.path.realpath(test["inputs"]["dir"])
+        if any(path.startswith(test_dir + os.sep) for path in deleted):
+            affected.add(str(test["id"]))
+    return affected
+
+
+def check_generated(conformance_file: str, tests: List[Dict[str, Any]], ref: str) -> List[str]:
+    """
+    Convert every test to each of its WDL versions, as a run does, and get the IDs of the tests this wrongly makes
+    affected since a git ref. The generated files that weren't there before are deleted again.
+    """
+    before = get_affected_tests(conformance_file, tests, ref)
+    generated = []
+    for test in tests:
+        wdl_dir = test["inputs"]["dir"]
+        wdl_input = get_test_wdl_file(test)
+        if not os.path.exists(wdl_input):
+            continue
+        for version in test["versions"]:
+            existed = set(os.listdir(wdl_dir))
+            wdl_file = os.path.join(wdl_dir, get_wdl_file(wdl_input, os.path.abspath(wdl_dir), version))
+            if os.path.basename(wdl_file) not in existed and is_generated(wdl_file):
+                generated.append(wdl_file)
+    try:
+        after = get_affected_tests(conformance_file, tests, ref)
+    finally:
+        for path in generated:
+            if os.path.exists(path):
+                os.remove(path)
+    every_test = {str(test["id"]) for test in tests}
+    newly_affected = (every_test if after is None else after) - (every_test if before is None else before)
+    return [str(test["id"]) for test in tests if str(test["id"]) in newly_affected]
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("ref", help="Git ref to compare the working tree with.")
+    parser.add_argument("--conformance-file", default="conformance.yaml",
+                        help="Conformance file of the tests. Default: conformance.yaml")
+    parser.add_argument("--check-generated", default=False, action="store_true",
+                        help="Check that converting the tests to other WDL versions, as a run does, doesn't change "
+                             "which tests are affected. Exits with 1 if it does.")
+    import argcomplete
+    argcomplete.autocomplete(parser)
+    options = parser.parse_args(argv)
+
+    from ruamel.yaml import YAML
+    with open(options.conformance_file, "r") as f:
+        tests = YAML(typ="safe").load(f)
+    if options.check_generated:
+        wrongly_affected = check_generated(options.conformance_file, tests, options.ref)
+        if len(wrongly_affected) > 0:
+            print(f"Converting tests made these affected: {','.join(wrongly_affected)}")
+            sys.exit(1)
+        print("Converting tests doesn't change which tests are affected.")
+        return
+    affected = get_affected_tests(options.conformance_file, tests, options.ref)
+    if affected is None:
+        print(f"Harness files changed since {options.ref}, so every test is affected.")
+    else:
+        # in conformance file order, ready for --id
+        print(",".join(str(test["id"]) for test in tests if str(test["id"]) in affected))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# PYTHON_ARGCOMPLETE_OK
+"""
+Generate synthetic workloads for measuring how runners scale.
+
+Each workload is a parameterized WDL workflow with its input fixtures, plus a conformance.yaml-style entry tagged
+"performance" so it runs through run.py and run_performance.py like any other test:
+
+    python generate_workloads.py --scatter 1,10,100 --file-size 1024,1048576 --depth 1,10,50
+    python run_performance.py --conformance-file synthetic.yaml --runners miniwdl,toil-wdl-runner
+
+The workloads are:
+  scatter:   scatter over N input files of M bytes each, with one task per file
+  chain:     a chain of D tasks, each taking the previous task's output file
+  files:     a single task that writes F files of M bytes each
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+from typing import List, Dict, Any
+
+# Image used by every generated task. Pull it ahead of time (see --pre-pull in run.py) to keep it out of the timings.
+IMAGE = "ubuntu:22.04"
+
+SCATTER_WDL = """version 1.0
+
+workflow {name} {{
+  input {{
+    Array[File] files
+  }}
+
+  scatter (file in files) {{
+    call measure {{ input: file = file }}
+  }}
+
+  output {{
+    Array[Int] sizes = measure.size
+  }}
+}}
+
+task measure {{
+  input {{
+    File file
+  }}
+
+  command <<<
+    wc -c < ~{{file}}
+  >>>
+
+  output {{
+    Int size = read_int(stdout())
+  }}
+
+  runtime {{
+    docker: "{image}"
+  }}
+}}
+"""
+
+CHAIN_WDL = """version 1.0
+
+workflow {name} {{
+  input {{
+    File start
+  }}
+
+{calls}
+  output {{
+    Int lines = step_{depth}.lines
+  }}
+}}
+
+task step {{
+  input {{
+    File previous
+  }}
+
+  command <<<
+    cat ~{{previous}} > out.txt
+    echo "step" >> out.txt
+    wc -l < out.txt > lines.txt
+  >>>
+
+  output {{
+    File out = "out.txt"
+    Int lines = read_int("lines.txt")
+  }}
+
+  runtime {{
+    docker: "{image}"
+  }}
+}}
+"""
+
+FILES_WDL = """version 1.0
+
+workflow {name} {{
+  call write_files
+
+  output {{
+    Int count = length(write_files.files)
+  }}
+}}
+
+task write_files {{
+  command <<<
+    mkdir out
+    for i in $(seq 1 {count}); do
+      head -c {size} /dev/zero > out/file_$i.bin
+    done
+  >>>
+
+  output {{
+    Array[File] files = glob("out/*.bin")
+  }}
+
+  runtime {{
+    docker: "{image}"
+  }}
+}}
+"""
+
+
+def parse_sizes(value: str) -> List[int]:
+    """
+    Parse a comma separated list of non-negative integers.
+    """
+    sizes = [int(size) for size in value.split(",") if size]
+    if any(size < 0 for size in sizes):
+        raise argparse.ArgumentTypeError(f"Sizes must not be negative: {value}")
+    return sizes
+
+
+def make_entry(test_id: str, description: str, workload: str, test_dir: str, outputs: Dict[str, Any],
+               json_input: bool = True) -> Dict[str, Any]:
+    """
+    Make a conformance.yaml-style entry for a generated workload.
+    """
+    inputs = {"dir": test_dir, "wdl": f"{test_id}.wdl"}
+    if json_input:
+        inputs["json"] = f"{test_id}.json"
+    return {
+        "description": description,
+        "tags": ["performance", "synthetic", workload],
+        "versions": ["1.0", "1.1"],
+        "id": test_id,
+        "dependencies": ["docker"],
+        "inputs": inputs,
+        "outputs": outputs,
+    }
+
+
+def generate_scatter(output_dir: str, width: int, size: int) -> Dict[str, Any]:
+    """
+    Write a workflow that scatters over width input files of size bytes each, and return its test entry.
+    """
+    test_id = f"synthetic_scatter_{width}x{size}"
+    name = f"syntheticScatter{width}x{size}"
+    test_dir = os.path.join(output_dir, test_id)
+    os.makedirs(os.path.join(test_dir, "data"), exist_ok=True)
+    files = []
+    for i in range(width):
+        path = os.path.join(test_dir, "data", f"file_{i}.bin")
+        with open(path, "wb") as f:
+            f.write(b"\0" * size)
+        # input paths are relative to where the tests are run from, like the other tests' inputs
+        files.append(path)
+    with open(os.path.join(test_dir, f"{test_id}.wdl"), "w") as f:
+        f.write(SCATTER_WDL.format(name=name, image=IMAGE))
+    with open(os.path.join(test_dir, f"{test_id}.json"), "w") as f:
+        json.dump({f"{name}.files": files}, f, indent=2)
+    return make_entry(test_id, f"Synthetic: scatter over {width} files of {size} bytes", "scatter", test_dir,
+                      {f"{name}.sizes": {"type": "Array[Int]", "value": [size] * width}})
+
+
+def generate_chain(output_dir: str, depth: int) -> Dict[str, Any]:
+    """
+    Write a workflow that calls a chain of depth tasks, and return its test entry.
+    """
+    test_id = f"synthetic_chain_{depth}"
+    name = f"syntheticChain{depth}"
+    test_dir = os.path.join(output_dir, test_id)
+    os.makedirs(test_dir, exist_ok=True)
+    start = os.path.join(test_dir, "start.txt")
+    with open(start, "w") as f:
+        f.write("start\n")
+    calls = ""
+    for step in range(1, depth + 1):
+        previous = "start" if step == 1 else f"step_{step - 1}.out"
+        calls += f"  call step as step_{step} {{ input: previous = {previous} }}\n"
+    with open(os.path.join(test_dir, f"{test_id}.wdl"), "w") as f:
+        f.write(CHAIN_WDL.format(name=name, calls=calls, depth=depth, image=IMAGE))
+    with open(os.path.join(test_dir, f"{test_id}.json"), "w") as f:
+        json.dump({f"{name}.start": start}, f, indent=2)
+    return make_entry(test_id, f"Synthetic: chain of {depth} dependent tasks", "chain", test_dir,
+                      {f"{name}.lines": {"type": "Int", "value": depth + 1}})
+
+
+def generate_files(output_dir: str, count: int, size: int) -> Dict[str, Any]:
+    """
+    Write a workflow with one task that outputs count files of size bytes each, and return its test entry.
+    """
+    test_id = f"synthetic_files_{count}x{size}"
+    name = f"syntheticFiles{count}x{size}"
+    test_dir = os.path.join(output_dir, test_id)
+    os.makedirs(test_dir, exist_ok=True)
+    with open(os.path.join(test_dir, f"{test_id}.wdl"), "w") as f:
+        f.write(FILES_WDL.format(name=name, count=count, size=size, image=IMAGE))
+    return make_entry(test_id, f"Synthetic: one task writing {count} files of {size} bytes", "files", test_dir,
+                      {f"{name}.count": {"type": "Int", "value": count}}, json_input=False)
+
+
+def generate(options: argparse.Namespace) -> List[Dict[str, Any]]:
+    """
+    Generate every requested workload and return their test entries.
+    """
+    entries = []
+    for width, size in itertools.product(options.scatter, options.file_size):
+        entries.append(generate_scatter(options.output_dir, width, size))
+    for depth in options.depth:
+        if depth < 1:
+            raise RuntimeError("Chain depth must be at least 1")
+        entries.append(generate_chain(options.output_dir, depth))
+    for count, size in itertools.product(options.file_count, options.file_size):
+        entries.append(generate_files(options.output_dir, count, size))
+    return entries
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output-dir", default="synthetic",
+                        help="Directory to write the workflows and their inputs into. Default: synthetic")
+    parser.add_argument("--suite", default="synthetic.yaml",
+                        help="Conformance file to write the test entries into, for use with --conformance-file. "
+                             "Default: synthetic.yaml")
+    parser.add_argument("--scatter", default=[1, 10, 100], type=parse_sizes,
+                        help="Comma separated scatter widths. Default: 1,10,100")
+    parser.add_argument("--file-size", default=[1024], type=parse_sizes,
+                        help="Comma separated sizes in bytes of the files in the scatter and files workloads. "
+                             "Default: 1024")
+    parser.add_argument("--depth", default=[1, 10], type=parse_sizes,
+                        help="Comma separated chain depths. Default: 1,10")
+    parser.add_argument("--file-count", default=[1, 100], type=parse_sizes,
+                        help="Comma separated numbers of files for a single task to write. Default: 1,100")
+    import argcomplete
+    argcomplete.autocomplete(parser)
+    options = parser.parse_args(argv)
+
+    entries = generate(options)
+    from ruamel.yaml import YAML
+    yaml = YAML()
+    yaml.default_flow_style = False
+    with open(options.suite, "w") as f:
+        yaml.dump(entries, f)
+    print(f"Wrote {len(entries)} synthetic workloads to {options.output_dir} and their test entries to "
+          f"{options.suite}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+# PYTHON_ARGCOMPLETE_OK
+"""
+Record every test execution into a local SQLite database, and query its history.
+
+run.py and run_performance.py record into the database given with --history-db. Each invocation is one run, with
+the host, git commit, runner fingerprints and options it ran with, and each test execution in it is one row with its
+status, timings and resource usage. Query it with:
+
+    python history.py --db history.db runs
+    python history.py --db history.db test md5 --runner miniwdl
+    python history.py --db history.db trends
+    python history.py --db history.db flaky
+"""
+import argparse
+import json
+import os
+import platform
+import shlex
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import threading
+from datetime import datetime, timezone
+from typing import Optional, Any, Dict, List, Tuple
+
+from lib import get_flakiness
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started_at TEXT NOT NULL,
+    finished_at TEXT,
+    host TEXT,
+    platform TEXT,
+    cpus INTEGER,
+    git_commit TEXT,
+    command TEXT,
+    runner_fingerprints TEXT NOT NULL DEFAULT '{}',
+    options TEXT
+);
+CREATE TABLE IF NOT EXISTS executions (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    test_id TEXT NOT NULL,
+    number INTEGER,
+    runner TEXT NOT NULL,
+    runner_fingerprint TEXT,
+    wdl_version TEXT,
+    repeat INTEGER,
+    status TEXT NOT NULL,
+    reason TEXT,
+    wall_time REAL,
+    user_time REAL,
+    sys_time REAL,
+    max_rss_bytes INTEGER,
+    phases TEXT,
+    resources TEXT
+);
+CREATE INDEX IF NOT EXISTS executions_by_test ON executions (test_id, runner, wdl_version, run_id);
+CREATE INDEX IF NOT EXISTS executions_by_run ON executions (run_id);
+CREATE INDEX IF NOT EXISTS runs_by_start ON runs (started_at);
+"""
+
+# Longest failure reason to store, in characters
+MAX_REASON_LENGTH = 4000
+
+# Number of most recent runs whose executions decide if a test is flaky
+FLAKY_RUNS = 20
+
+# Run ID of this process's run in each database, so every batch of tests in one invocation goes into the same run
+_CURRENT_RUNS: Dict[str, int] = {}
+_RUNS_LOCK = threading.Lock()
+
+
+def now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """
+    Open a history database, creating its tables if they don't exist yet.
+    """
+    connection = sqlite3.connect(path, timeout=60)
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def get_git_commit() -> Optional[str]:
+    """
+    Get the commit this checkout of the tests is at, marked as dirty if it has uncommitted changes.
+    """
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=script_dir, capture_output=True, text=True,
+                                timeout=10)
+        status = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=script_dir,
+                                capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    if commit.returncode != 0:
+        return None
+    return commit.stdout.strip() + ("-dirty" if status.stdout.strip() else "")
+
+
+def open_run(path: str, options: argparse.Namespace) -> int:
+    """
+    Get the ID of this process's run in a history database, starting the run with the given options the first time.
+
+    Scripts that run tests several times, like run_performance.py, should call this with their own options before
+    running any tests, so the run records those rather than the options of the first batch of tests.
+    """
+    with _RUNS_LOCK:
+        if path not in _CURRENT_RUNS:
+            command = shlex.join([os.path.basename(sys.argv[0])] + sys.argv[1:])
+            with connect(path) as connection:
+                cursor = connection.execute(
+                    "INSERT INTO runs (started_at, host, platform, cpus, git_commit, command, options) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (now(), socket.gethostname(), platform.platform(), os.cpu_count(), get_git_commit(), command,
+                     json.dumps(vars(options), default=str)))
+            connection.close()
+            _CURRENT_RUNS[path] = cursor.lastrowid
+        return _CURRENT_RUNS[path]
+
+
+def record_responses(path: str, options: argparse.Namespace, runner: str, fingerprint: Dict[str, Any],
+                     test_responses: List[Dict[str, Any]]) -> int:
+    """
+    Record the responses of a batch of tests by one runner into this process's run in a history database.
+
+    The failed attempts of a retried test are recorded as executions of their own, before its last attempt, so that
+    retries don't hide how flaky it is.
+
+    Returns the run ID.
+    """
+    run_id = open_run(path, options)
+    rows = []
+    for response in test_responses:
+        for attempt in response.get("retried_attempts", []) + [response]:
+            time = attempt.get("time") or {}
+            reason = attempt.get("reason")
+            if reason is not None and len(reason) > MAX_REASON_LENGTH:
+                reason = "..." + reason[-MAX_REASON_LENGTH:]
+            rows.append((run_id, str(response["id"]), response.get("number"), runner,
+                         response.get("runner_fingerprint"), response.get("version"), response.get("repeat"),
+                         attempt["status"], reason, time.get("real"), time.get("user"), time.get("sys"),
+                         attempt.get("max_rss"), json.dumps(attempt["phases"]) if attempt.get("phases") else None,
+                         json.dumps(attempt["resources"]) if attempt.get("resources") else None))
+    with _RUNS_LOCK, connect(path) as connection:
+        fingerprints = json.loads(connection.execute("SELECT runner_fingerprints FROM runs WHERE id = ?",
+                                                     (run_id,)).fetchone()[0])
+        fingerprints[runner] = fingerprint
+        connection.execute("UPDATE runs SET runner_fingerprints = ?, finished_at = ? WHERE id = ?",
+                           (json.dumps(fingerprints), now(), run_id))
+        connection.executemany(
+            "INSERT INTO executions (run_id, test_id, number, runner, runner_fingerprint, wdl_version, repeat, status, "
+            "reason, wall_time, user_time, sys_time, max_rss_bytes, phases, resources) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    connection.close()
+    return run_id
+
+
+def get_run_times(connection: sqlite3.Connection, run_id: int) -> Dict[Tuple[str, str], List[float]]:
+    """
+    Get the wall times of every succeeded execution in a run, by (test ID, runner).
+    """
+    times: Dict[Tuple[str, str], List[float]] = {}
+    for test_id, runner, wall_time in connection.execute(
+            "SELECT test_id, runner, wall_time FROM executions "
+            "WHERE run_id = ? AND status = 'SUCCEEDED' AND wall_time IS NOT NULL", (run_id,)):
+        times.setdefault((test_id, runner), []).append(wall_time)
+    return times
+
+
+def get_outcomes(connection: sqlite3.Connection, runner: Optional[str] = None,
+                 runs: int = FLAKY_RUNS) -> Dict[Tuple[str, str, str], List[Tuple[str, Optional[float]]]]:
+    """
+    Get the status and wall time of every execution in the most recent runs of each runner, in the order they ran, by
+    (test ID, WDL version, runner). Only runs that executed a runner count towards its most recent runs.
+    """
+    if runner is not None:
+        runners = [runner]
+    else:
+        runners = [row[0] for row in connection.execute("SELECT DISTINCT runner FROM executions ORDER BY runner")]
+    outcomes: Dict[Tuple[str, str, str], List[Tuple[str, Optional[float]]]] = {}
+    for test_runner in runners:
+        for test_id, version, status, wall_time in connection.execute(
+                "SELECT test_id, wdl_version, status, wall_time FROM executions WHERE runner = ? AND run_id IN "
+                "(SELECT DISTINCT run_id FROM executions WHERE runner = ? ORDER BY run_id DESC LIMIT ?) "
+                "ORDER BY run_id, repeat, id", (test_runner, test_runner, runs)):
+            outcomes.setdefault((test_id, version, test_runner), []).append((status, wall_time))
+    return outcomes
+
+
+def get_flaky_tests(path: str, runner: str, runs: int = FLAKY_RUNS) -> Dict[Tuple[str, str], Dict[str, Any]]:
+    """
+    Get the tests that both succeeded and failed with a runner in the most recent runs of a history database, with
+    their flakiness, by (test ID, WDL version).
+    """
+    if not os.path.exists(path):
+        return {}
+    connection = connect(path)
+    flaky = {}
+    for (test_id, version, _), outcomes in get_outcomes(connection, runner, runs).items():
+        flakiness = get_flakiness(outcomes)
+        if flakiness["flaky"]:
+            flaky[(test_id, version)] = flakiness
+    connection.close()
+    return flaky
+
+
+def format_flakiness(flakiness: Dict[str, Any]) -> str:
+    cv = f", runtime CV {flakiness['time_cv']:.1%}" if flakiness["time_cv"] is not None else ""
+    return (f"passed {flakiness['passed']}/{flakiness['executions']}, {flakiness['transitions']} status "
+            f"changes{cv}")
+
+
+def format_seconds(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.3f}"
+
+
+def print_runs(connection: sqlite3.Connection, limit: int) -> None:
+    """
+    Print the most recent runs with how many of their executions had each status.
+    """
+    print(f'{"Run":>5}  {"Started":<25}  {"Host":<20}  {"Commit":<18}  {"Runners":<30}  Executions')
+    for run_id, started_at, host, git_commit, fingerprints in connection.execute(
+            "SELECT id, started_at, host, git_commit, runner_fingerprints FROM runs ORDER BY id DESC LIMIT ?",
+            (limit,)):
+        statuses = connection.execute("SELECT status, COUNT(*) FROM executions WHERE run_id = ? GROUP BY status "
+                                      "ORDER BY status", (run_id,)).fetchall()
+        runners = ",".join(f"{runner}:{fingerprint['id']}" if isinstance(fingerprint, dict) else runner
+                           for runner, fingerprint in json.loads(fingerprints).items())
+        commit = (git_commit or "")[:12] + ("-dirty" if (git_commit or "").endswith("-dirty") else "")
+        print(f'{run_id:>5}  {started_at:<25}  {host or "":<20}  {commit:<18}  {runners:<30}  '
+              f'{", ".join(f"{count} {status.lower()}" for status, count in statuses)}')
+
+
+def print_test_history(connection: sqlite3.Connection, test_id: str, runner: Optional[str], limit: int) -> None:
+    """
+    Print a test's median time and outcomes in each of the most recent runs that ran it.
+    """
+    query = ("SELECT e.run_id, r.started_at, e.runner, e.runner_fingerprint, e.wdl_version, "
+             "COUNT(*), SUM(e.status = 'SUCCEEDED'), "
+             "GROUP_CONCAT(CASE WHEN e.status = 'SUCCEEDED' THEN e.wall_time END), "
+             "MAX(e.max_rss_bytes) "
+             "FROM executions e JOIN runs r ON r.id = e.run_id WHERE e.test_id = ?")
+    parameters: List[Any] = [test_id]
+    if runner is not None:
+        query += " AND e.runner = ?"
+        parameters.append(runner)
+    query += " GROUP BY e.run_id, e.runner, e.wdl_version ORDER BY e.run_id DESC LIMIT ?"
+    parameters.append(limit)
+    print(f'{"Run":>5}  {"Started":<25}  {"Runner":<16}  {"Fingerprint":<12}  {"Version":<8}  {"Succeeded":>9}  '
+          f'{"Median (s)":>10}  {"Peak RSS (MiB)":>14}')
+    for run_id, started_at, test_runner, fingerprint, version, runs, succeeded, times, max_rss in \
+            connection.execute(query, parameters):
+        median = statistics.median(float(time) for time in times.split(",")) if times else None
+        peak = f"{max_rss / 2 ** 20:.1f}" if max_rss is not None else "-"
+        print(f'{run_id:>5}  {started_at:<25}  {test_runner:<16}  {fingerprint or "":<12}  {version or "":<8}  '
+              f'{f"{succeeded}/{runs}":>9}  {format_seconds(median):>10}  {peak:>14}')
+
+
+def print_trends(connection: sqlite3.Connection, runs: int, top: int) -> None:
+    """
+    Compare the median time of each test and runner in the latest run with its median over the runs before it.
+    """
+    run_ids = [run_id for run_id, in connection.execute("SELECT id FROM runs ORDER BY id DESC LIMIT ?", (runs + 1,))]
+    if len(run_ids) < 2:
+        print("Need at least two runs to show trends.")
+        return
+    latest = get_run_times(connection, run_ids[0])
+    earlier: Dict[Tuple[str, str], List[float]] = {}
+    for run_id in run_ids[1:]:
+        for key, times in get_run_times(connection, run_id).items():
+            earlier.setdefault(key, []).extend(times)
+    changes = []
+    for key, times in latest.items():
+        if key in earlier:
+            before, after = statistics.median(earlier[key]), statistics.median(times)
+            if before > 0:
+                changes.append((after / before, key, before, after))
+    changes.sort(key=lambda change: abs(change[0] - 1), reverse=True)
+    print(f"Run {run_ids[0]} compared with the {len(run_ids) - 1} runs before it, biggest changes first:")
+    print(f'{"Test ID":<30}  {"Runner":<16}  {"Before (s)":>10}  {"Latest (s)":>10}  {"Change":>8}')
+    for ratio, (test_id, runner), before, after in changes[:top]:
+        print(f'{test_id:<30}  {runner:<16}  {before:>10.3f}  {after:>10.3f}  {ratio - 1:>+8.1%}')
+
+
+def print_flaky(connection: sqlite3.Connection, runner: Optional[str], runs: int) -> None:
+    """
+    Print every test that both succeeded and failed in the most recent runs, least reliable first.
+    """
+    flaky = []
+    for key, outcomes in get_outcomes(connection, runner, runs).items():
+        flakiness = get_flakiness(outcomes)
+        if flakiness["flaky"]:
+            flaky.append((key, flakiness))
+    flaky.sort(key=lambda item: (item[1]["pass_rate"], -item[1]["transitions"]))
+    print(f"Flaky tests in the last {runs} runs:")
+    print(f'{"Test ID":<30}  {"Version":<8}  {"Runner":<16}  {"Passed":>7}  {"Rate":>6}  {"Changes":>7}  '
+          f'{"Runtime CV":>10}')
+    for (test_id, version, test_runner), flakiness in flaky:
+        cv = f"{flakiness['time_cv']:.1%}" if flakiness["time_cv"] is not None else "-"
+        print(f'{test_id:<30}  {version or "":<8}  {test_runner:<16}  '
+              f'{f"""{flakiness["passed"]}/{flakiness["executions"]}""":>7}  {flakiness["pass_rate"]:>6.0%}  '
+              f'{flakiness["transitions"]:>7}  {cv:>10}')
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="history.db", help="History database to query. Default: history.db")
+    commands = parser.add_subparsers(dest="command", required=True)
+    runs_parser = commands.add_parser("runs", help="List the most recent runs.")
+    runs_parser.add_argument("--limit", default=20, type=int, help="Number of runs to list. Default: 20")
+    test_parser = commands.add_parser("test", help="Show how a test did in each of the most recent runs of it.")
+    test_parser.add_argument("test_id", help="ID of the test.")
+    test_parser.add_argument("--runner", default=None, help="Only show this runner.")
+    test_parser.add_argument("--limit", default=20, type=int, help="Number of runs to show. Default: 20")
+    trends_parser = commands.add_parser("trends", help="Show the tests whose times changed most in the latest run.")
+    trends_parser.add_argument("--runs", default=5, type=int,
+                               help="Number of runs before the latest to compare it with. Default: 5")
+    trends_parser.add_argument("--top", default=20, type=int, help="Number of tests to show. Default: 20")
+    flaky_parser = commands.add_parser("flaky", help="List the tests that both succeeded and failed in recent runs.")
+    flaky_parser.add_argument("--runner", default=None, help="Only show this runner.")
+    flaky_parser.add_argument("--runs", default=FLAKY_RUNS, type=int,
+                              help=f"Number of most recent runs to look at. Default: {FLAKY_RUNS}")
+    import argcomplete
+    argcomplete.autocomplete(parser)
+    options = parser.parse_args(argv)
+
+    if not os.path.exists(options.db):
+        raise Exception(f"'{options.db}' doesn't exist!")
+    connection = connect(options.db)
+    if options.command == "runs":
+        print_runs(connection, options.limit)
+    elif options.command == "test":
+        print_test_history(connection, options.test_id, options.runner, options.limit)
+    elif options.command == "trends":
+        print_trends(connection, options.runs, options.top)
+    elif options.command == "flaky":
+        print_flaky(connection, options.runner, options.runs)
+    connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+janitor.py: Clean up what test executions leave behind.
+
+Every execution can leave a results file, a Toil jobstore, a runner working directory (miniwdl-logs/...,
+cromwell-executions/...) and a copy of its scratch directory. The janitor is handed each response as soon as its test
+has been verified, and deletes that execution's artifacts on a background thread according to its policy, so long
+runs don't fill the disk and no test waits on a large delete.
+"""
+import json
+import os
+import queue
+import shutil
+import threading
+from typing import Optional, Any, Dict, List, Tuple
+
+
+def get_size(path: str) -> int:
+    """
+    Get the total size in bytes of a file or directory tree, without following symlinks.
+    """
+    try:
+        total = os.lstat(path).st_size
+    except OSError:
+        return 0
+    if os.path.isdir(path) and not os.path.islink(path):
+        for dirpath, dirnames, filenames in os.walk(path):
+            for name in filenames + dirnames:
+                try:
+                    total += os.lstat(os.path.join(dirpath, name)).st_size
+                except OSError:
+                    pass
+    return total
+
+
+def delete_path(path: str) -> None:
+    """
+    Delete a file or directory tree if it exists.
+    """
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path, ignore_errors=True)
+    elif os.path.lexists(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def get_runner_run_dirs(results_file: str) -> List[str]:
+    """
+    Get the working directories a runner reported in its results file: "dir" for miniwdl-style results, and
+    "workflowRoot" for Cromwell metadata.
+    """
+    try:
+        with open(results_file, 'r') as f:
+            results = json.load(f)
+    except (OSError, ValueError):
+        return []
+    if not isinstance(results, dict):
+        return []
+    return [results[key] for key in ("dir", "workflowRoot") if isinstance(results.get(key), str)]
+
+
+class Janitor:
+    """
+    Delete the artifacts of test executions in the background according to a retention policy.
+
+    The artifacts of each execution are listed in its response under 'execution_artifacts'. Once they are deleted, the
+    number of bytes freed is stored in the response under 'reclaimed_bytes'. The failed attempts of a retried test,
+    under 'retried_attempts', are cleaned up as executions of their own.
+
+    :param keep_failed: keep the artifacts of failed executions, unless they have to go to stay under max_bytes
+    :param keep_last: keep the artifacts of the N most recently finished executions
+    :param max_bytes: if set, delete the oldest kept artifacts while all kept artifacts add up to more than this
+    """
+
+    def __init__(self, keep_failed: bool = True, keep_last: int = 0, max_bytes: Optional[int] = None):
+        self.keep_failed = keep_failed
+        self.keep_last = keep_last
+        self.max_bytes = max_bytes
+        self.reclaimed_bytes = 0
+        # executions whose artifacts are still on disk, oldest first, with the size of their artifacts
+        self._kept: List[Tuple[Dict[str, Any], int]] = []
+        self._kept_bytes = 0
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def track(self, response: Dict[str, Any]) -> None:
+        """
+        Hand over the response of a verified test so its artifacts can be cleaned up.
+        """
+        for attempt in response.get('retried_attempts', []):
+            self.track(attempt)
+        if response.get('execution_artifacts'):
+            self._queue.put(response)
+
+    def finish(self) -> int:
+        """
+        Wait for all pending cleanup to be done, and return the total number of bytes reclaimed.
+        """
+        self._queue.put(None)
+        self._thread.join()
+        return self.reclaimed_bytes
+
+    def _run(self) -> None:
+        while True:
+            response = self._queue.get()
+            if response is None:
+                return
+            size = sum(get_size(path) for path in response['execution_artifacts'])
+            self._kept.append((response, size))
+            self._kept_bytes += size
+            self._apply_policy()
+
+    def _apply_policy(self) -> None:
+        recent = len(self._kept) - self.keep_last
+        for index, (response, size) in reversed(list(enumerate(self._kept))):
+            if index < recent and not (self.keep_failed and response['status'] == 'FAILED'):
+                self._delete(index)
+        if self.max_bytes is not None:
+            while self._kept and self._kept_bytes > self.max_bytes:
+                self._delete(0)
+
+    def _delete(self, index: int) -> None:
+        response, size = self._kept.pop(index)
+        for path in response['execution_artifacts']:
+            delete_path(path)
+        self._kept_bytes -= size
+        self.reclaimed_bytes += size
+        response['reclaimed_bytes'] = size
@@ -1,30 +1,31 @@
 # generic helper functions
 
+import functools
+import json
+import math
 import os
 import re
+import shutil
+import statistics
 import subprocess
+import threading
 from argparse import Namespace
-from distutils.util import strtobool
-
-from WDL.Type import (
-    Float as WDLFloat,
-    String as WDLString,
-    File as WDLFile,
-    Directory as WDLDirectory,
-    Int as WDLInt,
-    Boolean as WDLBool,
-    Array as WDLArray,
-    Map as WDLMap,
-    Pair as WDLPair,
-    StructInstance as WDLStruct,
-)
-
-from typing import Optional, Any, Dict, Union, List, Literal, Type, TypedDict
-from WDL.Type import Base as WDLBase
+from shutil import which
+
+from typing import Optional, Any, Dict, Union, List, Literal, Tuple, Type, TypedDict, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    # miniwdl is slow to import, so it is only pulled in by the type conversion helpers that need it
+    from WDL.Type import Base as WDLBase
+    from multiprocessing import Queue
+    from sampler import ProcessTreeSampler
 
 # All known WDL versions, in version order.
 WDL_VERSIONS = ["draft-2", "1.0", "1.1", "1.2", "development"]
 
+# Directory that results are persisted in between runs, such as the failures for --last-failed
+CACHE_DIR = ".wdl-conformance-cache"
+
 def version_leq(version: str, target: str):
     """
     Returns true if one WDL version is less than or equal to another.
@@ -249,8 +250,9 @@ def generate_wdl(filename: str, wdl_dir: str, target_version: str, outfile_name:
 
     # generate new wdl file
     outfile_path = os.path.join(wdl_dir, outfile_name)
+    temp_path = get_temp_path(outfile_path)
     with open(filename, 'r') as f:
-        with open(outfile_path, 'w') as out:
+        with open(temp_path, 'w') as out:
             gen = generate_replace_version_wdl(target_version, f.readlines())
             # if draft-2, remove input section and change command section syntax
             if version_leq(target_version, "draft-2"):
@@ -261,16 +263,37 @@ def generate_wdl(filename: str, wdl_dir: str, target_version: str, outfile_name:
                 gen = generate_change_container_specifier(gen)
             for line in gen:
                 out.write(line)
+    # tests running at the same time can generate the same file, so never let one read a half-written file
+    os.replace(temp_path, outfile_path)
     return outfile_path
 
 
+def get_temp_path(path: str) -> str:
+    """
+    Get a temporary path next to a file that no other process or thread will write to at the same time.
+    """
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
 def patch(filename: str, patch_filename: str, wdl_dir: str, outfile_name: str = "draft-2.wdl") -> str:
     """Run the patch command given an input file, patch file, directory, and output file"""
     outfile_path = os.path.join(wdl_dir, outfile_name)
-    subprocess.run(f"patch {filename} {patch_filename} -o {outfile_path}", shell=True)
+    temp_path = get_temp_path(outfile_path)
+    subprocess.run(f"patch {filename} {patch_filename} -o {temp_path}", shell=True)
+    if os.path.exists(temp_path):
+        os.replace(temp_path, outfile_path)
     return f"{outfile_name}"
 
 
+def get_test_wdl_file(test: Dict[str, Any]) -> str:
+    """
+    Get the path of a test's base WDL file: the "wdl" file in its "dir", or the file named after its "dir" if the test
+    doesn't name one.
+    """
+    wdl_dir = test['inputs']['dir']
+    return f"{wdl_dir}/{test['inputs'].get('wdl', f'{os.path.basename(wdl_dir)}.wdl')}"
+
+
 def get_wdl_file(wdl_file: str, wdl_dir: str, version: str) -> str:
     """
     Get the right WDL file for a test.
@@ -284,15 +307,140 @@ def get_wdl_file(wdl_file: str, wdl_dir: str, version: str) -> str:
     return generate_wdl(wdl_file, wdl_dir, version, outfile_name=outfile_name)
 
 
-def run_cmd(cmd: List[str], cwd: str, debug: bool = False):
+def run_cmd(cmd: List[str], cwd: str, debug: bool = False, sampler: Optional["ProcessTreeSampler"] = None,
+            usage: Optional[Dict[str, Any]] = None):
+    """
+    Run a command and return its return code, stdout and stderr.
+
+    If a sampler is given, it samples the command's process tree for as long as it runs.
+
+    If usage is given, the user and system CPU seconds and the peak resident memory in bytes of the command (and of
+    the descendants it waited for) are stored in it under 'user', 'sys' and 'max_rss'.
+    """
     if debug:
         print(" ".join(cmd))
     p = subprocess.Popen(cmd, stdout=-1, stderr=-1, cwd=cwd)
-    stdout, stderr = p.communicate()
+    if sampler is not None:
+        sampler.start(p.pid)
+    try:
+        if usage is None:
+            stdout, stderr = p.communicate()
+        else:
+            # communicate() reaps the process without its resource usage, so read the pipes and reap it here
+            stderr_chunks = []
+            stderr_reader = threading.Thread(target=lambda: stderr_chunks.append(p.stderr.read()))
+            stderr_reader.start()
+            stdout = p.stdout.read()
+            stderr_reader.join()
+            stderr = stderr_chunks[0]
+            p.stdout.close()
+            p.stderr.close()
+            _, status, rusage = os.wait4(p.pid, 0)
+            p.returncode = os.waitstatus_to_exitcode(status)
+            # ru_maxrss is in kilobytes on Linux
+            usage.update({"user": rusage.ru_utime, "sys": rusage.ru_stime, "max_rss": rusage.ru_maxrss * 1024})
+    finally:
+        if sampler is not None:
+            sampler.stop()
 
     return p.returncode, stdout, stderr
 
 
+def resolve_input_paths(value: Any, base_dir: str) -> Any:
+    """
+    Recursively make every string in a workflow input object that names an existing path relative to base_dir into
+    an absolute path, so the inputs can be used from any working directory.
+    """
+    if isinstance(value, dict):
+        return {k: resolve_input_paths(v, base_dir) for k, v in value.items()}
+    if isinstance(value, list):
+        return [resolve_input_paths(v, base_dir) for v in value]
+    if isinstance(value, str) and value != "" and not os.path.isabs(value) and \
+            os.path.exists(os.path.join(base_dir, value)):
+        return os.path.abspath(os.path.join(base_dir, value))
+    return value
+
+
+def remove_tree_in_background(path: str) -> threading.Thread:
+    """
+    Delete a directory tree on a background thread so that large deletes stay off the critical path.
+
+    The thread is not a daemon, so the interpreter waits for it to finish before exiting.
+    """
+    thread = threading.Thread(target=shutil.rmtree, args=(path,), kwargs={"ignore_errors": True})
+    thread.start()
+    return thread
+
+
+def pin_to_cpus(cpus: Optional[List[int]]) -> None:
+    """
+    Restrict the current process, and every process it starts from then on, to a set of CPUs.
+
+    Does nothing if cpus is empty or None.
+    """
+    if cpus:
+        os.sched_setaffinity(0, cpus)
+
+
+# ionice scheduling class numbers, see ionice(1)
+IONICE_CLASSES = {"realtime": "1", "best-effort": "2", "idle": "3"}
+
+# How the current test worker process was isolated, if it was
+WORKER_ALLOCATION: Dict[str, Any] = {}
+
+
+def init_test_worker(cpus: Optional[List[int]] = None, cpu_sets: Optional["Queue[List[int]]"] = None,
+                     niceness: int = 0, ionice_class: Optional[str] = None) -> None:
+    """
+    Process pool initializer that isolates a test worker. Everything set here is inherited by the runners it starts.
+
+    :param cpus: CPUs to pin the worker to
+    :param cpu_sets: queue of CPU sets to take one from and pin the worker to instead, so each worker gets its own
+    :param niceness: amount to add to the worker's nice value
+    :param ionice_class: ionice scheduling class from IONICE_CLASSES to give the worker
+    """
+    if cpu_sets is not None:
+        cpus = cpu_sets.get()
+    pin_to_cpus(cpus)
+    if niceness:
+        os.nice(niceness)
+    if ionice_class is not None:
+        subprocess.run(["ionice", "-c", IONICE_CLASSES[ionice_class], "-p", str(os.getpid())], check=False)
+    if cpus or niceness or ionice_class is not None:
+        WORKER_ALLOCATION.update({"cpus": sorted(os.sched_getaffinity(0)),
+                                  "nice": os.getpriority(os.PRIO_PROCESS, 0),
+                                  "ionice": ionice_class})
+
+
+def format_cpus(cpus: List[int]) -> str:
+    """
+    Format a list of CPUs as comma separated, hyphenated inclusive ranges. Ex: 0-3,8
+    """
+    ranges = []
+    for cpu in sorted(cpus):
+        if ranges and cpu == ranges[-1][1] + 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ",".join(f"{start}-{end}" if start != end else f"{start}" for start, end in ranges)
+
+
+def split_cpus(cpus: List[int], parts: int) -> List[List[int]]:
+    """
+    Split a list of CPUs into a number of disjoint, contiguous, as-equal-as-possible sets.
+    """
+    if parts > len(cpus):
+        raise RuntimeError(f"Can't split {len(cpus)} CPUs into {parts} disjoint sets")
+    size, extra = divmod(len(cpus), parts)
+    sets = []
+    start = 0
+    for part in range(parts):
+        end = start + size + (1 if part < extra else 0)
+        sets.append(cpus[start:end])
+        start = end
+    return sets
+
+
 def run_setup(setup_script: str):
     """
     Run a setup script
@@ -314,6 +462,8 @@ def print_response(response):
     print(f'{response["number"]}: {response["status"]}: {parsed_description}')
     if response.get("repeat") is not None:
         print(f"Iteration: {response['repeat']}")
+    if response.get("quarantined"):
+        print(f"Quarantined as flaky, attempts: {response.get('attempts', 1)}")
     # print reason, exists only if failed or if verbose
     if response.get("reason") is not None:
         print(f'REASON: {response.get("reason")}')
@@ -323,8 +473,36 @@ def print_response(response):
     if response.get("stderr") is not None:
         print(f'stderr: {response.get("stderr")}')
     if response.get("time") is not None:
-        real_time = parse_time(response["time"]["real"])
-        print(f'\n{"real":<8}{real_time:<10}')
+        print()
+        for key in ("real", "user", "sys"):
+            if response["time"].get(key) is not None:
+                print(f'{key:<8}{parse_time(response["time"][key]):<10}')
+    if response.get("max_rss") is not None:
+        print(f'Peak memory {format_size(response["max_rss"])}')
+    if response.get("allocation") is not None:
+        allocation = response["allocation"]
+        print(f'Ran on CPUs {format_cpus(allocation["cpus"])} with nice {allocation["nice"]}'
+              + (f' and ionice class {allocation["ionice"]}' if allocation["ionice"] is not None else ''))
+    if response.get("resources") is not None and response["resources"]["samples"] > 0:
+        resources = response["resources"]
+        print(f'CPU peak {resources["cpu_percent"]["peak"]:.0f}% avg {resources["cpu_percent"]["avg"]:.0f}%, '
+              f'RSS peak {format_size(resources["rss_bytes"]["peak"])} '
+              f'avg {format_size(int(resources["rss_bytes"]["avg"]))}, '
+              f'FDs peak {resources["open_fds"]["peak"]}, threads peak {resources["threads"]["peak"]}, '
+              f'read {format_size(resources["read_bytes"])}, written {format_size(resources["write_bytes"])}')
+    if response.get("reclaimed_bytes"):
+        print(f'Cleaned up {format_size(response["reclaimed_bytes"])} of execution artifacts')
+
+
+def format_size(size: int) -> str:
+    """
+    Format a number of bytes into a printable string
+    """
+    for unit in ["B", "KiB", "MiB", "GiB"]:
+        if size < 1024:
+            return f"{size:.1f} {unit}" if unit != "B" else f"{size} {unit}"
+        size /= 1024
+    return f"{size:.1f} TiB"
 
 
 def parse_time(time):
@@ -336,6 +514,56 @@ def parse_time(time):
     return f"{real_min}m{real_sec:.3f}s"
 
 
+def median_confidence_interval(samples: List[float], confidence: float = 0.95) -> Optional[Tuple[float, float]]:
+    """
+    Get a distribution-free confidence interval for the median of some samples, from the order statistics.
+
+    The interval is the widest pair of sorted samples (x_j, x_n-j+1) for which the chance of the true median falling
+    outside it is at most 1 - confidence, which follows a Binomial(n, 0.5) distribution. Returns None if there are too
+    few samples for any interval to reach the confidence level (fewer than 6 for 95%).
+    """
+    n = len(samples)
+    ordered = sorted(samples)
+    tail = (1 - confidence) / 2
+    cumulative = 0.0
+    j = 0
+    # find the largest j where P(X <= j - 1) <= tail
+    while j < n // 2:
+        cumulative += math.comb(n, j) / 2 ** n
+        if cumulative > tail:
+            break
+        j += 1
+    if j == 0:
+        return None
+    return ordered[j - 1], ordered[n - j]
+
+
+def get_flakiness(outcomes: List[Tuple[str, Optional[float]]]) -> Dict[str, Any]:
+    """
+    Summarize how consistently a test behaves over its executions, given the status and runtime of each in the order
+    they ran.
+
+    Only executions that succeeded or failed are counted, as skips and warnings say nothing about the test itself. A
+    test is flaky if it both succeeded and failed. Returns the number of executions counted, how many passed and the
+    pass rate, the number of times the status changed from one execution to the next, and the variance and coefficient
+    of variation of the succeeded runtimes (None with fewer than two).
+    """
+    statuses = [status for status, _ in outcomes if status in ("SUCCEEDED", "FAILED")]
+    times = [time for status, time in outcomes if status == "SUCCEEDED" and time is not None]
+    passed = statuses.count("SUCCEEDED")
+    variance = statistics.variance(times) if len(times) >= 2 else None
+    mean = statistics.mean(times) if len(times) >= 2 else None
+    return {
+        "executions": len(statuses),
+        "passed": passed,
+        "pass_rate": passed / len(statuses) if statuses else None,
+        "transitions": sum(1 for before, after in zip(statuses, statuses[1:]) if before != after),
+        "time_variance": variance,
+        "time_cv": math.sqrt(variance) / mean if variance is not None and mean > 0 else None,
+        "flaky": 0 < passed < len(statuses),
+    }
+
+
 def announce_test(test_index, test, version, runner):
     parsed_description = test["description"].strip().replace("\n", "; ")
     if version is not None:
@@ -410,6 +638,52 @@ def get_specific_tests(conformance_tests, options: Namespace):
     return sorted(list(tests))
 
 
+def get_last_failed_path(runner: str) -> str:
+    return os.path.join(CACHE_DIR, "last-failed", f"{runner}.json")
+
+
+def read_last_failed(runner: str) -> Dict[Tuple[str, str], str]:
+    """
+    Get the (test ID, version) pairs that failed or warned the last time they were run with a runner, with that status.
+    """
+    path = get_last_failed_path(runner)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return {(entry["id"], entry["version"]): entry["status"] for entry in json.load(f)}
+
+
+def update_last_failed(runner: str, test_responses: List[Dict[str, Any]]) -> Dict[Tuple[str, str], str]:
+    """
+    Update the persisted failures of a runner with the results of a run.
+
+    A (test ID, version) pair that failed or warned in any repeat is added, and one that only did anything else is
+    removed. Pairs that weren't run are left as they were, so running a subset of the tests doesn't forget the other
+    failures. Returns the updated failures.
+    """
+    last_failed = read_last_failed(runner)
+    statuses: Dict[Tuple[str, str], str] = {}
+    for response in test_responses:
+        key = (str(response["id"]), response["version"])
+        if response["status"] == "FAILED" or (response["status"] == "WARNING" and statuses.get(key) != "FAILED"):
+            statuses[key] = response["status"]
+        else:
+            statuses.setdefault(key, response["status"])
+    for key, status in statuses.items():
+        if status in ("FAILED", "WARNING"):
+            last_failed[key] = status
+        else:
+            last_failed.pop(key, None)
+    path = get_last_failed_path(runner)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # write to a temporary file first, so an interrupted write can't leave a broken cache behind
+    with open(path + ".tmp", "w") as f:
+        json.dump([{"id": test_id, "version": version, "status": status}
+                   for (test_id, version), status in sorted(last_failed.items())], f, indent=1)
+    os.replace(path + ".tmp", path)
+    return last_failed
+
+
 def verify_return_code(expected_ret_code: Union[int, List[int], str], got_ret_code: int):
     """
     Return a test result dict that SUCCEEDED if the return code is on the list, and FAILED otherwise.
@@ -451,10 +725,12 @@ def verify_failure(ret_code: int) -> dict:
     return {'status': f'SUCCEEDED'}
 
 
-def py_type_of_wdl_class(wdl_type: WDLBase) -> Union[Type[int], Type[float], Type[bool], Type[str]]:
+def py_type_of_wdl_class(wdl_type: "WDLBase") -> Union[Type[int], Type[float], Type[bool], Type[str]]:
     """
     Return python equivalent type for a given WDL.Type class
     """
+    from WDL.Type import Float as WDLFloat, String as WDLString, Int as WDLInt, Boolean as WDLBool
+
     if isinstance(wdl_type, WDLInt):
         return int
     elif isinstance(wdl_type, WDLFloat):
@@ -493,7 +769,7 @@ def wdl_outer_type(wdl_type):
         return wdl_type
 
 
-def wdl_type_to_miniwdl_class(wdl_type: Union[Dict[str, Any], str]) -> Optional[WDLBase]:
+def wdl_type_to_miniwdl_class(wdl_type: Union[Dict[str, Any], str]) -> Optional["WDLBase"]:
     """
     Given a WDL type name, return a MiniWDL class.
 
@@ -503,6 +779,18 @@ def wdl_type_to_miniwdl_class(wdl_type: Union[Dict[str, Any], str]) -> Optional[
 
     :param wdl_type: representation of WDL type
     """
+    from WDL.Type import (
+        Float as WDLFloat,
+        String as WDLString,
+        File as WDLFile,
+        Directory as WDLDirectory,
+        Int as WDLInt,
+        Boolean as WDLBool,
+        Array as WDLArray,
+        Map as WDLMap,
+        Pair as WDLPair,
+        StructInstance as WDLStruct,
+    )
 
     if isinstance(wdl_type, dict):
         return WDLStruct
@@ -536,13 +824,15 @@ def wdl_type_to_miniwdl_class(wdl_type: Union[Dict[str, Any], str]) -> Optional[
         # return None
 
 
-def convert_type(wdl_type: Any) -> Optional[WDLBase]:
+def convert_type(wdl_type: Any) -> Optional["WDLBase"]:
     """
     Given a string description of a type in WDL, return an instance
     of a MiniWDL WDL.Type class that represents the given type.
 
     :param wdl_type: representation of wdl type
     """
+    from WDL.Type import Array as WDLArray, Map as WDLMap, Pair as WDLPair, StructInstance as WDLStruct
+
     output_str_typ = wdl_outer_type(wdl_type)
     outer_py_typ = wdl_type_to_miniwdl_class(output_str_typ)
 
@@ -607,13 +897,29 @@ def convert_type(wdl_type: Any) -> Optional[WDLBase]:
     return wdl_type_to_miniwdl_class(wdl_type)(optional=optional)
 
 
+def strtobool(value: str) -> bool:
+    """
+    Parse a yes/no string the way distutils.util.strtobool did, which is gone as of Python 3.12.
+    """
+    value = value.strip().lower()
+    if value in ("y", "yes", "t", "true", "on", "1"):
+        return True
+    if value in ("n", "no", "f", "false", "off", "0"):
+        return False
+    raise ValueError(f"Invalid truth value {value!r}")
+
+
+@functools.lru_cache(maxsize=None)
 def test_gpu_available():
+    """
+    Check whether this host has a GPU. The result is cached, so the vendor tools only run once per process.
+    """
     gpu_env_var = os.getenv("WDL_CONFORMANCE_TESTS_GPU")
     if gpu_env_var is not None:
         # override
-        return bool(strtobool(gpu_env_var))
+        return strtobool(gpu_env_var)
     try:
-        p = subprocess.run("nvidia-smi".split(" "))
+        p = subprocess.run("nvidia-smi".split(" "), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
     except (FileNotFoundError, subprocess.SubprocessError):
         pass
     else:
@@ -624,7 +930,7 @@ def test_gpu_available():
     # This may not work, I'm not sure what the current conventions for getting amd gpu data is
     # see comment in src/toil/lib/accelerators.py::count_amd_gpus
     try:
-        p = subprocess.run(["amd-smi", "static"])
+        p = subprocess.run(["amd-smi", "static"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
     except (FileNotFoundError, subprocess.SubprocessError):
         pass
     else:
@@ -634,6 +940,166 @@ def test_gpu_available():
     return False
 
 
+class HostCapabilities(TypedDict):
+    gpu: bool
+    cores: int
+    memory: int
+    mount_points: List[str]
+    container_engines: List[str]
+    root: bool
+    runner_binaries: Dict[str, Optional[str]]
+
+
+CONTAINER_ENGINES = ["docker", "podman", "singularity", "apptainer"]
+RUNNER_BINARIES = ["cromwell", "java", "miniwdl", "toil-wdl-runner"]
+
+
+def get_mount_points() -> List[str]:
+    """
+    Get the mount points of this host from /proc/mounts. Returns an empty list if they can't be read.
+    """
+    mount_points = []
+    try:
+        with open("/proc/mounts", "r") as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) > 1:
+                    # spaces in mount points are escaped as \040
+                    mount_points.append(fields[1].replace("\\040", " "))
+    except OSError:
+        pass
+    return mount_points
+
+
+@functools.lru_cache(maxsize=None)
+def get_host_capabilities() -> HostCapabilities:
+    """
+    Probe what this host can provide to a test: GPUs, cores, memory, mount points, container engines, root access and
+    which runner binaries are on the PATH.
+
+    The probe is cached, so call this once in the parent process before fanning out to workers and they will inherit it.
+    """
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:
+        # not available on macOS
+        cores = os.cpu_count() or 1
+    try:
+        memory = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (ValueError, OSError, AttributeError):
+        memory = 0
+    return {
+        "gpu": test_gpu_available(),
+        "cores": cores,
+        "memory": memory,
+        "mount_points": get_mount_points(),
+        "container_engines": [engine for engine in CONTAINER_ENGINES if which(engine) is not None],
+        "root": hasattr(os, "geteuid") and os.geteuid() == 0,
+        "runner_binaries": {binary: which(binary) for binary in RUNNER_BINARIES},
+    }
+
+
+def get_runtime_values(filename: str, key: str) -> List[str]:
+    """
+    Get the raw values of a runtime attribute across all runtime/requirements sections of a WDL file.
+
+    ex: `memory: "512 MB"` in a runtime section gives '"512 MB"'
+
+    This requires the same specifically formatted runtime section as generate_change_container_specifier.
+    """
+    values = []
+    in_runtime = False
+    with open(filename, "r") as f:
+        for line in f:
+            stripped = line.strip()
+            if not in_runtime:
+                if stripped in ("runtime {", "requirements {"):
+                    in_runtime = True
+                continue
+            if stripped == "}":
+                in_runtime = False
+                continue
+            name, sep, value = stripped.partition(":")
+            if sep and name.strip() == key:
+                values.append(value.strip())
+    return values
+
+
+def get_container_images(filename: str) -> List[str]:
+    """
+    Get the container images named by string literals in the docker/container runtime attributes of a WDL file.
+
+    Images given by expressions can't be known before running, so they are left out.
+    A WDL 1.1+ container attribute can be an array of alternatives; every literal in it is returned.
+    """
+    images = []
+    for key in ("docker", "container"):
+        for value in get_runtime_values(filename, key):
+            for image in re.findall(r'"([^"]*)"|\'([^\']*)\'', value):
+                image = image[0] or image[1]
+                if image and "~{" not in image and "${" not in image and image not in images:
+                    images.append(image)
+    return images
+
+
+MEMORY_UNITS = {
+    "B": 1, "K": 1000, "KB": 1000, "M": 1000 ** 2, "MB": 1000 ** 2, "G": 1000 ** 3, "GB": 1000 ** 3,
+    "T": 1000 ** 4, "TB": 1000 ** 4, "KI": 1024, "KIB": 1024, "MI": 1024 ** 2, "MIB": 1024 ** 2,
+    "GI": 1024 ** 3, "GIB": 1024 ** 3, "TI": 1024 ** 4, "TIB": 1024 ** 4
+}
+
+
+def parse_memory_string(value: str) -> Optional[int]:
+    """
+    Parse a literal WDL memory value such as `"4 GiB"`, `"512MB"` or `1000000` into bytes.
+
+    Returns None if the value isn't a literal (for example, an expression).
+    """
+    match = re.fullmatch(r'"?\s*([0-9.]+)\s*([A-Za-z]*)\s*"?', value.strip())
+    if match is None:
+        return None
+    amount, unit = match.groups()
+    multiplier = MEMORY_UNITS.get(unit.upper() or "B")
+    if multiplier is None:
+        return None
+    return int(float(amount) * multiplier)
+
+
+def get_unmet_dependencies(dependencies: Optional[List[str]], wdl_file: str, host: HostCapabilities,
+                           clamps_cpu: bool = False) -> List[str]:
+    """
+    Given a set of dependencies for a test, return a reason for each dependency that this host can't satisfy.
+
+    cpu, memory and disks dependencies can only be checked when the WDL file requests literal values; anything else
+    is left to test_dependencies to diagnose after the test runs. CPU requests aren't checked for runners that clamp
+    them to the host (clamps_cpu), as the test can still pass. Dependencies in IGNORE_DEPENDENCIES never stop a test
+    from running.
+    """
+    reasons = []
+    for d in dependencies or []:
+        if d == "gpu" and not host["gpu"]:
+            reasons.append("No GPU is available on this machine. Set 'WDL_CONFORMANCE_TESTS_GPU=True' to override.")
+        elif d == "cpu" and not clamps_cpu:
+            for value in get_runtime_values(wdl_file, "cpu"):
+                try:
+                    requested = float(value.strip('"'))
+                except ValueError:
+                    continue
+                if requested > host["cores"]:
+                    reasons.append(f"A task requests {value} cores but only {host['cores']} are available.")
+        elif d == "memory":
+            for value in get_runtime_values(wdl_file, "memory"):
+                requested = parse_memory_string(value)
+                if requested is not None and host["memory"] and requested > host["memory"]:
+                    reasons.append(f"A task requests {value} of memory but only {host['memory']} bytes are available.")
+        elif d == "disks":
+            for value in get_runtime_values(wdl_file, "disks"):
+                for mount_point in re.findall(r'(?:^|[\s"])(/[^\s",]*)', value):
+                    if mount_point not in host["mount_points"] and not os.path.isdir(mount_point):
+                        reasons.append(f"A task requests mount point {mount_point}, which does not exist.")
+    return reasons
+
+
 IGNORE_DEPENDENCIES = ["docker", "root", "singularity"]
 
 
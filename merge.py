@@ -2,29 +2,135 @@
 # PYTHON_ARGCOMPLETE_OK
 """
 Tool to merge two or more CSV files into one while keeping data sorted by ID
+
+Columnar results files (.parquet, .arrow or .feather) from run_performance.py --columnar-output can be merged too. If
+the output is also a columnar file, every input has to be one, and the schema is kept; otherwise the output is a
+performance CSV, so merging a single columnar file exports it as a CSV.
+
+Tests are ordered as in the conformance file if one is given (followed by any tests it doesn't have), or by ID
+otherwise. By default, all files are read into memory and the rows of each test are grouped by runner. With
+--streaming, files too large for memory are merged a row at a time instead; each file must then already be in that
+test order, and the rows of each test are kept in file order. run_performance.py writes tests in conformance file
+order, so its files can only be streamed with -c and the conformance file they were run from; without -c, each file
+must be sorted by test ID. A file that is out of order stops the merge with an error.
 """
 
 import argparse
+import csv
+import heapq
 import os
 import sys
+from typing import List, Dict, Optional, Callable, Iterator, Tuple
+
+from columnar import is_columnar
+from runner_styles import graph_position
+
+
+def get_test_order(conformance_file: Optional[str]) -> Optional[List[str]]:
+    """
+    Get the test IDs of a conformance file in order, or None if no file is given.
+    """
+    if conformance_file is None:
+        return None
+    if not os.path.exists(conformance_file):
+        raise Exception(f"'{conformance_file}' is not a valid file!")
+    from ruamel.yaml import YAML
+    with open(conformance_file, "r") as f:
+        return [str(conformance_test["id"]) for conformance_test in YAML(typ='safe').load(f)]
 
-import argcomplete
-import pandas as pd
-import numpy as np
-from ruamel import yaml
+
+def merge_in_memory(files: List[str], output: str, test_order: Optional[List[str]]) -> None:
+    """
+    Merge CSV or columnar files with one concatenation and one stable sort by test, then runner.
+    """
+    # pandas and numpy dominate startup time, so only load them once there is something to merge
+    import pandas as pd
+    from columnar import read_columnar, to_performance_csv_frame, frame_to_table, write_table
+
+    columnar_output = is_columnar(output)
+    if columnar_output:
+        if not all(is_columnar(file) for file in files):
+            raise Exception("Only columnar files can be merged into a columnar file.")
+        df = pd.concat([read_columnar(file) for file in files], ignore_index=True)
+        test_column, runner_column = "test_id", "runner"
+    else:
+        # read every value as text so that runtimes and statuses are written back exactly as they were
+        df = pd.concat([to_performance_csv_frame(read_columnar(file)).astype(str) if is_columnar(file) else
+                        pd.read_csv(file, dtype=str, keep_default_na=False) for file in files], ignore_index=True)
+        df = df.fillna("")
+        test_column, runner_column = "Test ID", "Runner"
+    unique_tests = df[test_column].unique().tolist()
+    if test_order is None:
+        test_order = sorted(unique_tests)
+    else:
+        known = set(test_order)
+        test_order = test_order + sorted(test_id for test_id in unique_tests if test_id not in known)
+    runner_order = sorted(df[runner_column].unique().tolist(), key=graph_position)
+    sort_keys = pd.DataFrame({
+        "test": pd.Categorical(df[test_column], categories=list(dict.fromkeys(test_order)), ordered=True),
+        "runner": pd.Categorical(df[runner_column], categories=runner_order, ordered=True),
+    })
+    order = sort_keys.sort_values(["test", "runner"], kind="stable").index
+    if columnar_output:
+        write_table(frame_to_table(df.loc[order]), output)
+    else:
+        df.loc[order].to_csv(output, index=False)
+
+
+def read_sorted_rows(file: str, sort_key: Callable[[str], Tuple[int, str]]) -> Iterator[Dict[str, str]]:
+    """
+    Read the rows of a CSV file one at a time, checking that they are in test order.
+    """
+    with open(file, "r", newline="") as f:
+        previous = None
+        for row in csv.DictReader(f):
+            key = sort_key(row["Test ID"])
+            if previous is not None and key < previous:
+                raise Exception(f"'{file}' is not in test order at test {row['Test ID']}, so it can't be merged with "
+                                f"--streaming. Files from run_performance.py are in conformance file order, so give "
+                                f"the conformance file they were run from with -c.")
+            previous = key
+            yield row
+
+
+def merge_streaming(files: List[str], output: str, test_order: Optional[List[str]]) -> None:
+    """
+    Merge CSV files that are each already in test order with a k-way merge, holding one row per file in memory.
+    """
+    positions = {test_id: position for position, test_id in enumerate(test_order or [])}
+
+    def sort_key(test_id: str) -> Tuple[int, str]:
+        # tests missing from the conformance file go last, by ID
+        return positions.get(test_id, len(positions)), test_id if test_id not in positions else ""
+
+    # files from older versions can have fewer columns, so write every column any file has
+    columns: Dict[str, None] = {}
+    for file in files:
+        with open(file, "r", newline="") as f:
+            columns.update(dict.fromkeys(next(csv.reader(f), [])))
+    with open(output, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(columns), restval="", lineterminator="\n")
+        writer.writeheader()
+        rows = [read_sorted_rows(file, sort_key) for file in files]
+        writer.writerows(heapq.merge(*rows, key=lambda row: sort_key(row["Test ID"])))
 
 
 def main(args=None):
     if args is None:
         args = sys.argv[1:]
-    parser = argparse.ArgumentParser(description=__doc__)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
     parser.add_argument("file", help="Specify files.", nargs="+")
-    # parser.add_argument("file1", help="First file")
-    # parser.add_argument("file2", help="Second file")
     parser.add_argument("--conformance", "-c", default=None, help="Conformance test file. If provided, it will "
-                                                                  "preserve the order"
+                                                                  "preserve the order "
                                                                   "according to the conformance file. Default is None.")
-    parser.add_argument("--output", "-o", default="csv_output_merged.csv", help="Output path of merged CSV file.")
+    parser.add_argument("--output", "-o", default="csv_output_merged.csv",
+                        help="Output path of merged CSV file, or of a merged columnar file if it ends in .parquet, "
+                             ".arrow or .feather.")
+    parser.add_argument("--streaming", default=False, action="store_true",
+                        help="Merge files a row at a time instead of reading them all into memory. Each file must "
+                             "already be in test order: conformance file order with -c (as run_performance.py "
+                             "writes them), or sorted by test ID without it.")
+    import argcomplete
     argcomplete.autocomplete(parser)
     options = parser.parse_args(args)
 
@@ -32,38 +138,13 @@ def main(args=None):
         if not os.path.exists(file):
             raise Exception(f"'{file}' doesn't exist!")
 
-    data_list = []
-    dataframe_list = []
-    unique_test_list = []
-    for file in options.file:
-        with open(file, "r") as f:
-            data = pd.read_csv(f)
-            data_list.append(data)
-        dataframe = pd.DataFrame(data)
-        dataframe_list.append(dataframe)
-        unique_test_list.append(dataframe["Test ID"].unique())
-
-    all_runners = ["miniwdl", "toil-wdl-runner", "cromwell"]
-    final_df = pd.DataFrame()
-    if options.conformance is not None:
-        if not os.path.exists(options.conformance):
-            raise Exception(f"'{options.conformance}' is not a valid file!")
-        with open(options.conformance, "r") as f:
-            conformance_data = yaml.safe_load(f)
-            test_id_keys = [conformance_test["id"] for conformance_test in conformance_data]
+    test_order = get_test_order(options.conformance)
+    if options.streaming:
+        if any(is_columnar(file) for file in options.file + [options.output]):
+            raise Exception("--streaming only merges CSV files.")
+        merge_streaming(options.file, options.output, test_order)
     else:
-        all_test_ids = np.concatenate(unique_test_list, axis=0)
-        test_id_keys = np.unique(all_test_ids).tolist()
-    for test_idx, test_id in enumerate(test_id_keys):
-        for runner_idx, runner in enumerate(all_runners):
-            # get rows with same Runner and testID
-            relevant_row_list = []
-            for df in dataframe_list:
-                relevant_row_list.append(df.loc[(df["Test ID"] == test_id) & (df["Runner"] == runner)])
-            final_df = pd.concat([final_df, *relevant_row_list])
-    if options.conformance is None:
-        final_df = final_df.sort_index()
-    final_df.to_csv(options.output, index=False)
+        merge_in_memory(options.file, options.output, test_order)
 
 
 if __name__ == "__main__":
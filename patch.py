@@ -5,7 +5,6 @@ import os
 import subprocess
 import sys
 
-import argcomplete
 from lib import get_wdl_version_from_file
 
 
@@ -46,6 +45,7 @@ def main(argv=None):
                         help='Remove WDL files that are not the base')
     parser.add_argument("--rename", default=False,
                         help='Rename the base WDL file to the directory (--remove must be set to True too)')
+    import argcomplete
     argcomplete.autocomplete(parser)
     args = parser.parse_args(argv)
 
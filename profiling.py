@@ -0,0 +1,95 @@
+"""
+profiling.py: Profile Python-based runners (miniwdl, toil-wdl-runner) while they run tests.
+
+Each profiled execution writes one profile file. cProfile profiles are pstats files; py-spy profiles are in py-spy's
+"raw" format (one line per distinct stack, with the number of samples taken in it), and cover subprocesses too.
+Profiles of many executions can be summarized together into the functions that took the most time.
+"""
+import os
+from collections import defaultdict
+from shutil import which
+from typing import List, Dict, Tuple, Iterable
+
+PROFILERS = ["cprofile", "py-spy"]
+
+# Samples per second taken by py-spy
+PY_SPY_RATE = 100
+
+# Extension of the profile files written by each profiler
+PROFILE_EXTENSIONS = {"cprofile": ".prof", "py-spy": ".txt"}
+
+
+def profiler_available(profiler: str) -> bool:
+    """
+    Check if a profiler can be used on this machine. cProfile comes with Python, py-spy has to be installed.
+    """
+    return profiler == "cprofile" or which("py-spy") is not None
+
+
+def wrap_command(python_cmd: List[str], profiler: str, profile_file: str) -> List[str]:
+    """
+    Wrap a command that runs a Python script so that it is profiled into profile_file.
+
+    :param python_cmd: command starting with the Python interpreter, as from WDLRunner.python_command
+    """
+    if profiler == "cprofile":
+        return python_cmd[:1] + ["-m", "cProfile", "-o", profile_file] + python_cmd[1:]
+    elif profiler == "py-spy":
+        return ["py-spy", "record", "--format", "raw", "--rate", str(PY_SPY_RATE), "--subprocesses",
+                "--output", profile_file, "--"] + python_cmd
+    raise RuntimeError(f"Unknown profiler: {profiler}")
+
+
+def load_cprofile(profile_files: Iterable[str]) -> Dict[str, Tuple[float, float]]:
+    """
+    Add up the self and cumulative seconds spent in each function over some cProfile profiles.
+    """
+    import pstats
+    times: Dict[str, Tuple[float, float]] = defaultdict(lambda: (0.0, 0.0))
+    for profile_file in profile_files:
+        for (filename, line, name), (_, _, self_time, cumulative_time, _) in pstats.Stats(profile_file).stats.items():
+            function = f"{name} ({os.path.basename(filename)}:{line})" if line else name
+            total_self, total_cumulative = times[function]
+            times[function] = (total_self + self_time, total_cumulative + cumulative_time)
+    return times
+
+
+def load_py_spy(profile_files: Iterable[str]) -> Dict[str, Tuple[float, float]]:
+    """
+    Add up the self and cumulative seconds spent in each function over some py-spy raw profiles.
+    """
+    times: Dict[str, Tuple[float, float]] = defaultdict(lambda: (0.0, 0.0))
+    for profile_file in profile_files:
+        with open(profile_file, "r") as f:
+            for line in f:
+                stack, _, count = line.rstrip("\n").rpartition(" ")
+                if not stack or not count.isdigit():
+                    continue
+                seconds = int(count) / PY_SPY_RATE
+                frames = stack.split(";")
+                # a recursive function only counts once towards its own cumulative time
+                for frame in set(frames):
+                    total_self, total_cumulative = times[frame]
+                    times[frame] = (total_self + (seconds if frame == frames[-1] else 0), total_cumulative + seconds)
+    return times
+
+
+def summarize_profiles(profile_files: List[str], profiler: str, top: int) -> List[Tuple[str, float, float]]:
+    """
+    Get the top functions by self time over some profiles, as (function, self seconds, cumulative seconds).
+    """
+    profile_files = [profile_file for profile_file in profile_files if os.path.exists(profile_file)]
+    times = load_cprofile(profile_files) if profiler == "cprofile" else load_py_spy(profile_files)
+    ranked = sorted(times.items(), key=lambda item: item[1][0], reverse=True)[:top]
+    return [(function, self_time, cumulative_time) for function, (self_time, cumulative_time) in ranked]
+
+
+def print_profile_summary(runner: str, profile_files: List[str], profiler: str, top: int) -> None:
+    """
+    Print the top functions by self time over the profiles of a runner's test executions.
+    """
+    summary = summarize_profiles(profile_files, profiler, top)
+    print(f"\n=== PROFILE ({runner}, {profiler}, {len(profile_files)} executions) ===\n")
+    print(f'{"Self (s)":>10}{"Cumulative (s)":>16}  Function')
+    for function, self_time, cumulative_time in summary:
+        print(f"{self_time:>10.3f}{cumulative_time:>16.3f}  {function}")
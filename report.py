@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+# PYTHON_ARGCOMPLETE_OK
+"""
+Write a self-contained HTML report of performance results.
+
+Reads CSV files from run_performance.py and/or JSONL files of test responses from run.py --jsonl-output, and writes a
+single static HTML file that can be opened without a server:
+
+    python report.py performance_output.csv --output report.html
+
+The report has a summary per runner, a sortable table with the median, 95th percentile and coefficient of variation
+(CV) of each test's runtime per runner along with a small chart, and the reasons each test failed. Rows are aggregated
+per test and runner before the report is written, so its size depends on the number of tests rather than the number
+of runs.
+"""
+import argparse
+import csv
+import html
+import json
+import math
+import os
+import sys
+from collections import Counter
+from typing import Optional, Any, Dict, List, Iterator, Tuple
+
+from runner_styles import get_runner_colors, graph_position
+
+# Number of distinct failure reasons to keep for each test and runner
+MAX_REASONS = 5
+
+# Longest failure reason to include, in characters; longer ones keep their end, where errors usually are
+MAX_REASON_LENGTH = 4000
+
+# Width in pixels of the charts in the test table
+CHART_WIDTH = 160
+
+STYLE = """
+body { font-family: sans-serif; margin: 2em; color: #222; }
+table { border-collapse: collapse; margin-bottom: 2em; }
+th, td { border: 1px solid #ccc; padding: 2px 6px; text-align: right; font-size: 0.85em; }
+th { background: #eee; cursor: pointer; position: sticky; top: 0; }
+td.id, th.id { text-align: left; }
+tr:nth-child(even) { background: #f8f8f8; }
+.failed { color: #b00; font-weight: bold; }
+details { margin-bottom: 0.5em; }
+pre { background: #f4f4f4; padding: 0.5em; white-space: pre-wrap; max-height: 20em; overflow: auto; }
+.swatch { display: inline-block; width: 0.8em; height: 0.8em; margin-right: 0.3em; }
+"""
+
+# Sort the test table by a column when its header is clicked; cells without a value always sort last
+SCRIPT = """
+document.querySelectorAll("table.sortable th").forEach(function (th) {
+  th.addEventListener("click", function () {
+    var table = th.closest("table"), body = table.tBodies[0], column = th.cellIndex;
+    var ascending = th.dataset.order !== "asc";
+    table.querySelectorAll("th").forEach(function (other) { delete other.dataset.order; });
+    th.dataset.order = ascending ? "asc" : "desc";
+    var rows = Array.from(body.rows);
+    rows.sort(function (a, b) {
+      var x = a.cells[column].dataset.v, y = b.cells[column].dataset.v;
+      if (x === undefined || x === "") return 1;
+      if (y === undefined || y === "") return -1;
+      var nx = parseFloat(x), ny = parseFloat(y);
+      var order = (isNaN(nx) || isNaN(ny)) ? x.localeCompare(y) : nx - ny;
+      return ascending ? order : -order;
+    });
+    rows.forEach(function (row) { body.appendChild(row); });
+  });
+});
+"""
+
+
+class Aggregate:
+    """
+    Runtimes and outcomes of every run of one test by one runner.
+    """
+
+    def __init__(self):
+        self.times: List[float] = []
+        self.statuses: Counter = Counter()
+        self.reasons: Counter = Counter()
+
+    def add(self, status: str, runtime: Optional[float], reason: Optional[str]) -> None:
+        self.statuses[status] += 1
+        if runtime is not None:
+            self.times.append(runtime)
+        if reason and status in ("FAILED", "WARNING"):
+            if len(reason) > MAX_REASON_LENGTH:
+                reason = "..." + reason[-MAX_REASON_LENGTH:]
+            if reason in self.reasons or len(self.reasons) < MAX_REASONS:
+                self.reasons[reason] += 1
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Get the number of runs, the count of each status, the runtime statistics and the failure reasons.
+        """
+        times = sorted(self.times)
+        summary: Dict[str, Any] = {"runs": sum(self.statuses.values()), "statuses": dict(self.statuses),
+                                   "median": None, "p95": None, "cv": None, "reasons": self.reasons.most_common()}
+        if len(times) > 0:
+            summary["median"] = percentile(times, 0.5)
+            summary["p95"] = percentile(times, 0.95)
+            mean = sum(times) / len(times)
+            if len(times) > 1 and mean > 0:
+                summary["cv"] = math.sqrt(sum((time - mean) ** 2 for time in times) / len(times)) / mean
+        return summary
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """
+    Get a percentile of some sorted values, interpolating linearly between the closest two.
+    """
+    position = (len(sorted_values) - 1) * fraction
+    lower = math.floor(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def read_csv_rows(path: str) -> Iterator[Tuple[str, str, str, Optional[float], Optional[str]]]:
+    """
+    Read (test ID, runner, status, runtime, reason) from a run_performance.py CSV, where the runtime of a test that
+    didn't succeed is its status.
+    """
+    with open(path, "r", newline="") as f:
+        for row in csv.DictReader(f):
+            try:
+                yield row["Test ID"], row["Runner"], "SUCCEEDED", float(row["Runtime"]), None
+            except ValueError:
+                yield row["Test ID"], row["Runner"], row["Runtime"], None, None
+
+
+def read_jsonl_rows(path: str) -> Iterator[Tuple[str, str, str, Optional[float], Optional[str]]]:
+    """
+    Read (test ID, runner, status, runtime, reason) from a file of run.py test responses, one JSON object per line.
+    """
+    with open(path, "r") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            response = json.loads(line)
+            status = response["status"]
+            runtime = response["time"]["real"] if status == "SUCCEEDED" and response.get("time") else None
+            reason = response.get("reason")
+            if response.get("stderr"):
+                reason = f"{reason or ''}\n\nstderr:\n{response['stderr']}".strip()
+            yield str(response["id"]), response.get("runner", ""), status, runtime, reason
+
+
+def aggregate_files(paths: List[str]) -> Tuple[List[str], List[str], Dict[Tuple[str, str], Aggregate]]:
+    """
+    Aggregate the rows of every file by test and runner, in one pass.
+
+    Returns the test IDs and runners in the order they first appear, and the aggregate of each (test ID, runner).
+    """
+    aggregates: Dict[Tuple[str, str], Aggregate] = {}
+    test_ids: Dict[str, None] = {}
+    runners: Dict[str, None] = {}
+    for path in paths:
+        rows = read_jsonl_rows(path) if path.endswith((".jsonl", ".ndjson")) else read_csv_rows(path)
+        for test_id, runner, status, runtime, reason in rows:
+            test_ids.setdefault(test_id)
+            runners.setdefault(runner)
+            aggregate = aggregates.get((test_id, runner))
+            if aggregate is None:
+                aggregate = aggregates[(test_id, runner)] = Aggregate()
+            aggregate.add(status, runtime, reason)
+    return list(test_ids), list(runners), aggregates
+
+
+def format_seconds(value: Optional[float]) -> str:
+    return "" if value is None else f"{value:.2f}"
+
+
+def cell(text: str, value: Any = None, css_class: Optional[str] = None) -> str:
+    """
+    Make a table cell, with the value to sort it by if it has one.
+    """
+    sort_value = "" if value is None else f' data-v="{html.escape(str(value))}"'
+    css = f' class="{css_class}"' if css_class else ""
+    return f"<td{css}{sort_value}>{text}</td>"
+
+
+def test_chart(summaries: List[Tuple[str, Dict[str, Any]]], colors: Dict[str, str]) -> str:
+    """
+    Draw a small SVG chart of a test with a bar per runner for its median runtime and a whisker out to its 95th
+    percentile, all on the same scale.
+    """
+    bar_height = 8
+    scale_max = max((summary["p95"] for _, summary in summaries if summary["p95"] is not None), default=0)
+    height = bar_height * len(summaries) + 2
+    shapes = []
+    for index, (runner, summary) in enumerate(summaries):
+        if summary["median"] is None or scale_max <= 0:
+            continue
+        y = index * bar_height + 1
+        median_x = summary["median"] / scale_max * CHART_WIDTH
+        p95_x = summary["p95"] / scale_max * CHART_WIDTH
+        shapes.append(f'<rect x="0" y="{y}" width="{median_x:.1f}" height="{bar_height - 2}" fill="{colors[runner]}">'
+                      f'<title>{html.escape(runner)}: median {summary["median"]:.2f}s, '
+                      f'p95 {summary["p95"]:.2f}s</title></rect>')
+        shapes.append(f'<line x1="{median_x:.1f}" x2="{p95_x:.1f}" y1="{y + bar_height / 2 - 1}" '
+                      f'y2="{y + bar_height / 2 - 1}" stroke="#444"/>')
+    return f'<svg width="{CHART_WIDTH}" height="{height}">{"".join(shapes)}</svg>'
+
+
+def render_report(test_ids: List[str], runners: List[str], aggregates: Dict[Tuple[str, str], Aggregate],
+                  title: str, sources: List[str]) -> str:
+    """
+    Render the aggregated results as a self-contained HTML page.
+    """
+    runners = sorted(runners, key=graph_position)
+    colors = get_runner_colors(runners)
+    summaries = {key: aggregate.summary() for key, aggregate in aggregates.items()}
+    empty = Aggregate().summary()
+
+    parts = [f"<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>{html.escape(title)}</title>"
+             f"<style>{STYLE}</style></head><body><h1>{html.escape(title)}</h1>",
+             f"<p>From {', '.join(html.escape(os.path.basename(source)) for source in sources)}: "
+             f"{len(test_ids)} tests, {len(runners)} runners.</p>"]
+
+    # summary per runner, with total median runtime over the tests every runner succeeded on so it is comparable
+    common = [test_id for test_id in test_ids
+              if all(summaries.get((test_id, runner), empty)["median"] is not None for runner in runners)]
+    totals = {runner: sum(summaries[(test_id, runner)]["median"] for test_id in common) for runner in runners}
+    longest = max(totals.values(), default=0)
+    parts.append("<h2>Runners</h2><table><thead><tr><th class=\"id\">Runner</th><th>Runs</th><th>Succeeded</th>"
+                 "<th>Failed</th><th>Warnings</th><th>Skipped</th>"
+                 f"<th>Total median time of the {len(common)} tests all runners succeeded on</th></tr></thead><tbody>")
+    for runner in runners:
+        statuses: Counter = Counter()
+        for test_id in test_ids:
+            statuses.update(summaries.get((test_id, runner), empty)["statuses"])
+        width = totals[runner] / longest * 200 if longest > 0 else 0
+        parts.append(f"<tr><td class=\"id\"><span class=\"swatch\" style=\"background:{colors[runner]}\"></span>"
+                     f"{html.escape(runner)}</td><td>{sum(statuses.values())}</td><td>{statuses['SUCCEEDED']}</td>"
+                     f"<td>{statuses['FAILED']}</td><td>{statuses['WARNING']}</td><td>{statuses['SKIPPED']}</td>"
+                     f"<td><svg width=\"200\" height=\"10\"><rect width=\"{width:.1f}\" height=\"10\" "
+                     f"fill=\"{colors[runner]}\"/></svg> {format_seconds(totals[runner])}s</td></tr>")
+    parts.append("</tbody></table>")
+
+    # one row per test, sortable by any column
+    parts.append("<h2>Tests</h2><p>Runtimes are in seconds over succeeded runs. Click a column to sort by it.</p>"
+                 "<table class=\"sortable\"><thead><tr><th class=\"id\">Test ID</th>")
+    for runner in runners:
+        name = html.escape(runner)
+        parts.append(f"<th>{name} median</th><th>{name} p95</th><th>{name} CV</th><th>{name} succeeded</th>")
+    parts.append("<th>Chart</th></tr></thead><tbody>")
+    failures = []
+    for test_id in test_ids:
+        row = [cell(html.escape(test_id), test_id, "id")]
+        test_summaries = []
+        for runner in runners:
+            summary = summaries.get((test_id, runner), empty)
+            test_summaries.append((runner, summary))
+            succeeded = summary["statuses"].get("SUCCEEDED", 0)
+            runs_text = f"{succeeded}/{summary['runs']}"
+            if summary["reasons"]:
+                failures.append((test_id, runner, summary))
+                runs_text = f"<a class=\"failed\" href=\"#failure-{len(failures)}\">{runs_text}</a>"
+            row.append(cell(format_seconds(summary["median"]), summary["median"]))
+            row.append(cell(format_seconds(summary["p95"]), summary["p95"]))
+            cv = summary["cv"]
+            row.append(cell("" if cv is None else f"{cv:.1%}", cv))
+            row.append(cell(runs_text, succeeded / summary["runs"] if summary["runs"] else None))
+        row.append(cell(test_chart(test_summaries, colors)))
+        parts.append(f"<tr>{''.join(row)}</tr>")
+    parts.append("</tbody></table>")
+
+    # drill-down into why each test failed
+    parts.append("<h2>Failures</h2>")
+    if not failures:
+        parts.append("<p>No failures!</p>")
+    for index, (test_id, runner, summary) in enumerate(failures, 1):
+        failed = summary["statuses"].get("FAILED", 0) + summary["statuses"].get("WARNING", 0)
+        parts.append(f"<details id=\"failure-{index}\"><summary>{html.escape(test_id)} with {html.escape(runner)}: "
+                     f"{failed} of {summary['runs']} runs failed or warned</summary>")
+        for reason, count in summary["reasons"]:
+            parts.append(f"<p>{count} run{'s' if count != 1 else ''}:</p><pre>{html.escape(reason)}</pre>")
+        parts.append("</details>")
+    parts.append(f"<script>{SCRIPT}</script></body></html>")
+    return "".join(parts)
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("file", nargs="+",
+                        help="CSV files from run_performance.py, or JSONL files (.jsonl) from run.py --jsonl-output.")
+    parser.add_argument("--output", "-o", default="report.html", help="Path of the HTML report. Default: report.html")
+    parser.add_argument("--title", default="WDL Conformance Test Performance", help="Title of the report.")
+    import argcomplete
+    argcomplete.autocomplete(parser)
+    options = parser.parse_args(argv)
+
+    for file in options.file:
+        if not os.path.exists(file):
+            raise Exception(f"'{file}' doesn't exist!")
+    test_ids, runners, aggregates = aggregate_files(options.file)
+    with open(options.output, "w") as f:
+        f.write(render_report(test_ids, runners, aggregates, options.title, options.file))
+    print(f"Wrote a report of {len(test_ids)} tests and {len(runners)} runners to {options.output}")
+
+
+if __name__ == "__main__":
+    main()
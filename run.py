@@ -6,36 +6,27 @@ conformance.yaml
 """
 import os
 import json
+import multiprocessing
 import re
 
 import sys
 import hashlib
 import argparse
-import argcomplete
+import shlex
+import shutil
+import tempfile
 import threading
 import timeit
 
-from ruamel.yaml import YAML
-
-from concurrent.futures import as_completed, ProcessPoolExecutor
+from concurrent.futures import as_completed, ProcessPoolExecutor, ThreadPoolExecutor
 from shutil import which
 from uuid import uuid4
 
-from WDL.Type import (
-    Float as WDLFloat,
-    String as WDLString,
-    File as WDLFile,
-    Directory as WDLDirectory,
-    Int as WDLInt,
-    Boolean as WDLBool,
-    Array as WDLArray,
-    Map as WDLMap,
-    Pair as WDLPair,
-    StructInstance as WDLStruct,
-)
+from typing import Optional, Any, Dict, Tuple, List, Set, Union, TYPE_CHECKING
 
-from typing import Optional, Any, Dict, Tuple, List, Union
-from WDL.Type import Base as WDLBase
+if TYPE_CHECKING:
+    from WDL.Type import Base as WDLBase
+    from runners import WDLRunner
 
 from lib import (
     run_cmd,
@@ -49,91 +40,46 @@ from lib import (
     run_setup,
     get_specific_tests,
     get_wdl_file,
+    get_test_wdl_file,
     verify_return_code,
     test_dependencies,
+    get_host_capabilities,
+    get_unmet_dependencies,
+    get_container_images,
+    parse_time,
+    resolve_input_paths,
+    remove_tree_in_background,
+    parse_memory_string,
+    format_size,
+    get_test_indices,
+    init_test_worker,
+    split_cpus,
+    get_flakiness,
+    read_last_failed,
+    update_last_failed,
+    WORKER_ALLOCATION,
+    IONICE_CLASSES,
     WDL_VERSIONS
 )
-
-class WDLRunner:
-    """
-    A class describing how to invoke a WDL runner to run a workflow.
-    """
-    runner: str
-
-    def format_command(self, wdl_file, json_input, results_file, args, verbose, pre_args=None):
-        raise NotImplementedError
-
-
-class CromwellStyleWDLRunner(WDLRunner):
-    def __init__(self, runner):
-        self.runner = runner
-
-    def format_command(self, wdl_file: str, json_input: Union[str, Dict[str, Any]], results_file: str,
-                       args: List[str], verbose: bool, pre_args: Optional[List[str]] = None) -> List[str]:
-        """
-        Make a list of command parts to invoke a WDL runner that uses Cromwell-style arguments.
-
-        :param json_input: Can either be a json as a string or a dictionary that is json parseable
-        """
-        if isinstance(json_input, dict):
-            json_input = json.dumps(json_input)
-        json_arg = ["-i", json_input] if json_input is not None else []
-        return list(filter(None, self.runner.split(" "))) + [wdl_file, "-m", results_file] + json_arg + args
-
-
-class CromwellWDLRunner(CromwellStyleWDLRunner):
-    download_lock = threading.Lock()
-
-    def __init__(self):
-        super().__init__('cromwell')
-
-    def format_command(self, wdl_file: str, json_input: Union[str, Dict[str, Any]], results_file: str,
-                       args: List[str], verbose: bool, pre_args: Optional[List[str]] = None) -> List[str]:
-        if self.runner == 'cromwell' and not which('cromwell'):
-            with CromwellWDLRunner.download_lock:
-                if self.runner == 'cromwell':
-                    # if there is no cromwell binary seen on the path, download
-                    # our pinned version and use that instead
-                    log_level = '-DLOG_LEVEL=OFF' if not verbose else ''
-                    pre_args = '' if pre_args is None else pre_args
-                    cromwell = os.path.abspath('build/cromwell.jar')
-                    if not os.path.exists(cromwell):
-                        print('Cromwell not seen in the path, now downloading cromwell to run tests... ')
-                        run_cmd(cmd='make cromwell'.split(" "), cwd=os.getcwd())
-                    self.runner = f'java {log_level} {pre_args} -jar {cromwell} run'
-
-        return super().format_command(wdl_file, json_input, results_file, args, verbose)
-
-
-class MiniWDLStyleWDLRunner(WDLRunner):
-    def __init__(self, runner):
-        self.runner = runner
-
-    def format_command(self, wdl_file: str, json_input: Union[str, Dict[str, Any]], results_file: str,
-                       args: List[str], verbose: bool, pre_args: Optional[List[str]] = None) -> List[str]:
-        if isinstance(json_input, dict):
-            json_input = json.dumps(json_input)
-        json_arg = ["-i", json_input] if json_input is not None else []
-        return self.runner.split(" ") + [wdl_file, "-o", results_file, "-d", "miniwdl-logs",
-                                         "--verbose"] + json_arg + args
-
-
-RUNNERS = {
-    'cromwell': CromwellWDLRunner(),
-    'toil-wdl-runner': CromwellStyleWDLRunner('toil-wdl-runner --outputDialect miniwdl --logDebug'),
-    'miniwdl': MiniWDLStyleWDLRunner('miniwdl run')
-}
-
+from runners import get_runner, get_runner_names, get_runner_fingerprint, bootstrap_runner
+from janitor import Janitor, get_runner_run_dirs
+from dependencies import get_affected_tests
+from history import open_run, record_responses, get_flaky_tests, format_flakiness
+from sampler import ProcessTreeSampler
+from profiling import PROFILERS, PROFILE_EXTENSIONS, profiler_available, wrap_command, print_profile_summary
 
 class WDLConformanceTestRunner:
     tests: List[Dict[Any, Any]]
+    conformance_file: str
 
     def __init__(self, conformance_file: str):
+        self.conformance_file = conformance_file
+        from ruamel.yaml import YAML
         yaml = YAML(typ='safe')
         with open(conformance_file, 'r') as f:
             self.tests = yaml.load(f)
 
-    def compare_outputs(self, expected: Any, result: Any, typ: WDLBase):
+    def compare_outputs(self, expected: Any, result: Any, typ: "WDLBase"):
         """
         Recursively ensure that the expected output object is the same as the resulting output object
 
@@ -143,6 +89,20 @@ class WDLConformanceTestRunner:
         :param result: result value object from WDL runner
         :param typ: type of output from conformance file
         """
+        # miniwdl is only needed once there are outputs to check, so keep it off the startup path
+        from WDL.Type import (
+            Float as WDLFloat,
+            String as WDLString,
+            File as WDLFile,
+            Directory as WDLDirectory,
+            Int as WDLInt,
+            Boolean as WDLBool,
+            Array as WDLArray,
+            Map as WDLMap,
+            Pair as WDLPair,
+            StructInstance as WDLStruct,
+        )
+
         if typ.optional and expected is None and result is None:
             # an optional result does not need to exist
             return {'status': f'SUCCEEDED'}
@@ -394,21 +354,54 @@ class WDLConformanceTestRunner:
     # Make sure output groups don't clobber each other.
     LOG_LOCK = threading.Lock()
 
+    @staticmethod
+    def get_pre_args(runner: str, args: Optional[Dict[str, Any]]) -> Optional[str]:
+        """
+        Get the arguments that go before the runner's own command line, currently only Cromwell's java system
+        properties.
+        """
+        if runner == "cromwell" and args is not None:
+            return args.get("cromwell_pre_args")
+        return None
+
     def run_single_test(self, test_index: int, test: dict, runner: str, version: str, time: bool, verbose: bool,
-                        quiet: bool, args: Optional[Dict[str, Any]], jobstore_path: Optional[str], debug: bool) -> dict:
+                        quiet: bool, args: Optional[Dict[str, Any]], jobstore_path: Optional[str], debug: bool,
+                        scratch_root: Optional[str] = None, keep_artifacts: bool = False,
+                        artifacts_dir: str = "artifacts", wdl_runner: Optional["WDLRunner"] = None,
+                        profile: Optional[str] = None, profile_dir: str = "profiles",
+                        sample_interval: Optional[float] = None, metrics_dir: str = "metrics") -> dict:
         """
         Run a test and log success or failure.
 
+        If scratch_root is set, the runner runs in its own new scratch directory under it, with its inputs resolved to
+        absolute paths. The scratch directory is copied into artifacts_dir if the test fails or keep_artifacts is set,
+        and is then deleted in the background.
+
+        wdl_runner is the bootstrapped runner to use; if not given, it is bootstrapped here.
+
+        If profile names a profiler from PROFILERS and the runner is a Python script, the runner is profiled into a
+        file under profile_dir/<runner>, which is stored in the response under 'profile'.
+
+        If sample_interval is set, the runner's process tree is sampled every sample_interval seconds. The timeline is
+        written to a file under metrics_dir/<runner>, stored in the response under 'timeline', and its peaks and
+        averages are stored under 'resources'.
+
+        Everything else the execution leaves on disk (results file, Toil jobstore, the runner's working directory and
+        any copied artifacts) is listed in the response under 'execution_artifacts', for a Janitor to clean up.
+
+        If time is set, the runner's CPU time and peak memory are stored in the response along with its wall time, and
+        the time spent setting up, running, verifying and collecting after the test is stored under 'phases'.
+
         Return the response dict.
         """
+        setup_start = timeit.default_timer()
         if test.get("setup") is not None:
             run_setup(test["setup"])
         inputs = test['inputs']
         wdl_dir = inputs['dir']
-        wdl_input = inputs.get('wdl', f'{wdl_dir}.wdl')  # default wdl name
         abs_wdl_dir = os.path.abspath(wdl_dir)
         if version in WDL_VERSIONS:
-            wdl_input = f'{wdl_dir}/{wdl_input}'
+            wdl_input = get_test_wdl_file(test)
         else:
             return {'status': 'FAILED', 'reason': f'WDL version {version} is not supported!'}
         wdl_file = os.path.abspath(get_wdl_file(wdl_input, abs_wdl_dir, version))
@@ -427,18 +420,38 @@ class WDLConformanceTestRunner:
             raise RuntimeError(f'Config file specifies both a json string and json input file! Only one can be supplied! '
                                f'Check the input section for test id {test["id"]}.')
 
-        test_args = args[runner].split(" ") if args[runner] is not None else []
+        test_args = args[runner].split(" ") if args.get(runner) is not None else []
         unique_id = uuid4()
+        execution_artifacts = []
         # deal with jobstore_path argument for toil
         if runner == "toil-wdl-runner" and jobstore_path is not None:
             unique_jobstore_path = os.path.join(jobstore_path, f"wdl-jobstore-{unique_id}")
             test_args.extend(["--jobstore", unique_jobstore_path])
-        results_file = os.path.abspath(f'results-{unique_id}.json')
-        wdl_runner = RUNNERS[runner]
+            execution_artifacts.append(unique_jobstore_path)
+        # runners write their logs and working directories relative to where they are run
+        run_dir = os.path.dirname(os.path.abspath(__file__))
+        scratch_dir = None
+        if scratch_root is not None:
+            os.makedirs(scratch_root, exist_ok=True)
+            scratch_dir = tempfile.mkdtemp(prefix=f"{test['id']}-{version}-", dir=scratch_root)
+            if json_file is not None or json_string is not None:
+                # input paths are relative to where the runner would usually be run, so pin them down
+                if json_file is not None:
+                    with open(json_file, 'r') as f:
+                        json_inputs = json.load(f)
+                else:
+                    json_inputs = inputs['json_string']
+                json_file = os.path.join(scratch_dir, 'inputs.json')
+                json_string = None
+                with open(json_file, 'w') as f:
+                    json.dump(resolve_input_paths(json_inputs, run_dir), f)
+            run_dir = scratch_dir
+        results_file = os.path.join(run_dir, f'results-{unique_id}.json') if scratch_dir is not None else \
+            os.path.abspath(f'results-{unique_id}.json')
         # deal with cromwell arguments to define java system properties
-        pre_args = None
-        if runner == "cromwell":
-            pre_args = args["cromwell_pre_args"]
+        pre_args = self.get_pre_args(runner, args)
+        if wdl_runner is None:
+            wdl_runner = bootstrap_runner(runner, verbose, pre_args)
 
         # todo: it seems odd that I'm looking for a dependency before running when the test spec says test frameworks are supposed to be used to turn failing tests into warnings
         # this is mainly because the docker and singularity strings that I use are custom dependency values that I use
@@ -452,41 +465,84 @@ class WDLConformanceTestRunner:
                 test_args.extend(["--container", "singularity"])
         json_input = json_string or json_file
         cmd = wdl_runner.format_command(wdl_file, json_input, results_file, test_args, verbose, pre_args)
-
+        profile_file = None
+        python_cmd = wdl_runner.python_command(cmd) if profile is not None else None
+        if python_cmd is not None:
+            runner_profile_dir = os.path.abspath(os.path.join(profile_dir, runner))
+            os.makedirs(runner_profile_dir, exist_ok=True)
+            profile_file = os.path.join(runner_profile_dir,
+                                        f"{test['id']}-{version}-{unique_id}{PROFILE_EXTENSIONS[profile]}")
+            cmd = wrap_command(python_cmd, profile, profile_file)
+
+        sampler = ProcessTreeSampler(sample_interval) if sample_interval is not None else None
         realtime = None
+        usage = {}
         if time:
             realtime_start = timeit.default_timer()
-            (ret_code, stdout, stderr) = run_cmd(cmd=cmd, cwd=os.path.dirname(os.path.abspath(__file__)), debug=debug)
+            (ret_code, stdout, stderr) = run_cmd(cmd=cmd, cwd=run_dir, debug=debug, sampler=sampler, usage=usage)
             realtime_end = timeit.default_timer()
             realtime = realtime_end - realtime_start
         else:
-            (ret_code, stdout, stderr) = run_cmd(cmd=cmd, cwd=os.path.dirname(os.path.abspath(__file__)), debug=debug)
+            (ret_code, stdout, stderr) = run_cmd(cmd=cmd, cwd=run_dir, debug=debug, sampler=sampler)
 
         if verbose:
             with self.LOG_LOCK:
                 announce_test(test_index, test, version, runner)
         response = self.run_verify(test, results_file, ret_code)
+        verify_end = timeit.default_timer()
 
         if response["status"] == "FAILED" and test.get("priority") == "optional":
             # an optional test can be reported as a warning if it fails
             response["status"] = "WARNING"
 
         if time:
-            response['time'] = {"real": realtime}
+            response['time'] = {"real": realtime, "user": usage["user"], "sys": usage["sys"]}
+            response['max_rss'] = usage["max_rss"]
+        if profile_file is not None and os.path.exists(profile_file):
+            response['profile'] = profile_file
+        if sampler is not None:
+            runner_metrics_dir = os.path.abspath(os.path.join(metrics_dir, runner))
+            os.makedirs(runner_metrics_dir, exist_ok=True)
+            response['timeline'] = os.path.join(runner_metrics_dir, f"{test['id']}-{version}-{unique_id}.json")
+            sampler.write(response['timeline'])
+            response['resources'] = sampler.summary()
         if not quiet and (verbose or response['status'] == 'FAILED'):
             response['stdout'] = stdout.decode("utf-8", errors="ignore")
             response['stderr'] = stderr.decode("utf-8", errors="ignore")
+        if scratch_dir is not None:
+            if keep_artifacts or response['status'] == 'FAILED':
+                response['artifacts'] = os.path.join(artifacts_dir, os.path.basename(scratch_dir))
+                shutil.copytree(scratch_dir, response['artifacts'], symlinks=True)
+                execution_artifacts.append(os.path.abspath(response['artifacts']))
+            remove_tree_in_background(scratch_dir)
+        else:
+            execution_artifacts.extend(get_runner_run_dirs(results_file))
+            execution_artifacts.append(results_file)
+        response['execution_artifacts'] = execution_artifacts
+        if time:
+            response['phases'] = {"setup": realtime_start - setup_start, "run": realtime,
+                                  "verify": verify_end - realtime_end, "collect": timeit.default_timer() - verify_end}
         return response
 
     def handle_test(self, test_index: int, test: Dict[str, Any], runner: str, version: str, time: bool,
                     verbose: bool, quiet: bool, args: Optional[Dict[str, Any]], jobstore_path: Optional[str],
-                    repeat: Optional[int] = None, progress: bool = False, debug: bool = False) -> Dict[str, Any]:
+                    repeat: Optional[int] = None, progress: bool = False, debug: bool = False,
+                    check_host: bool = True, scratch_root: Optional[str] = None, keep_artifacts: bool = False,
+                    artifacts_dir: str = "artifacts", wdl_runner: Optional["WDLRunner"] = None,
+                    profile: Optional[str] = None, profile_dir: str = "profiles",
+                    sample_interval: Optional[float] = None, metrics_dir: str = "metrics",
+                    retries: int = 0) -> Dict[str, Any]:
         """
         Decide if the test should be skipped. If not, run it.
 
-        Returns a result that can have status SKIPPED, SUCCEEDED, or FAILED.
+        If check_host is set, a test whose dependencies this host can't satisfy is turned into a warning without
+        being run. A test that fails is run again up to retries times, and the response of its last attempt is kept; the
+        outcome and artifacts of each earlier attempt are listed under 'retried_attempts'.
+
+        Returns a result that can have status SKIPPED, SUCCEEDED, WARNING, or FAILED.
         """
-        response = {'description': test.get('description'), 'number': test_index, 'id': test.get('id')}
+        response = {'description': test.get('description'), 'number': test_index, 'id': test.get('id'),
+                    'runner': runner, 'version': version}
         # priority flag is defined in https://github.com/openwdl/wdl-tests/blob/main/docs/Specification.md#test-configuration
         if test.get("priority") == "ignore":
             # config specifies to ignore this test, so skip
@@ -504,54 +560,201 @@ class WDLConformanceTestRunner:
             if verbose:
                 response.update({'reason': f'Test only applies to versions: {",".join(test["versions"])}'})
             return response
+        unmet_dependencies = []
+        if check_host:
+            wdl_file = get_test_wdl_file(test)
+            clamps_cpu = (wdl_runner if wdl_runner is not None else get_runner(runner)).clamps_cpu
+            unmet_dependencies = get_unmet_dependencies(test.get("dependencies"), wdl_file, get_host_capabilities(),
+                                                        clamps_cpu)
+        if unmet_dependencies:
+            if progress:
+                print(f"Not running test {test_index} (ID: {test['id']}) with runner {runner} on WDL version {version}"
+                      f" as its dependencies can't be met on this host.")
+            response.update({'status': 'WARNING',
+                             'reason': "Test was not run as this host can't satisfy its dependencies:\n" +
+                                       "\n".join(unmet_dependencies)})
         else:
             # New test to run, if progress is true, then output
             if progress:
                 print(f"Running test {test_index} (ID: {test['id']}) with runner {runner} on WDL version {version}.")
-            response.update(
-                self.run_single_test(test_index, test, runner, version, time, verbose, quiet, args, jobstore_path, debug))
+            attempts = 0
+            retried_attempts = []
+            while True:
+                result = self.run_single_test(test_index, test, runner, version, time, verbose, quiet, args,
+                                              jobstore_path, debug, scratch_root, keep_artifacts, artifacts_dir,
+                                              wdl_runner, profile, profile_dir, sample_interval, metrics_dir)
+                attempts += 1
+                if result['status'] != 'FAILED' or attempts > retries:
+                    break
+                # keep how the failed attempt went, so it counts towards flakiness, and what it left behind, for the
+                # janitor to clean up with the last attempt
+                retried_attempts.append({'status': result['status'], 'reason': result.get('reason'),
+                                         'time': result.get('time'), 'max_rss': result.get('max_rss'),
+                                         'execution_artifacts': result.get('execution_artifacts', [])})
+                if progress:
+                    print(f"Retrying test {test_index} (ID: {test['id']}) with runner {runner} on WDL version "
+                          f"{version} after failed attempt {attempts}.")
+            response.update(result)
+            if retries > 0:
+                response['attempts'] = attempts
+                response['retried_attempts'] = retried_attempts
         if repeat is not None:
             response["repeat"] = repeat
+        if WORKER_ALLOCATION:
+            response["allocation"] = dict(WORKER_ALLOCATION)
         # Turn failing tests to warnings if any of the tests' dependencies were not
         # actually available.
         response.update(test_dependencies(dependencies=test.get("dependencies"), current_result=response))
         return response
 
-    def _debug_run_all_tests(self, options: argparse.Namespace, args: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def plan_tests(self, options: argparse.Namespace) -> Tuple[List[Tuple[int, Dict[str, Any], str, Optional[int]]],
+                                                             List[Dict[str, Any]]]:
         """
-        Meant to be called by _run_debug. Runs the tests single-threaded to be compatible with pycharm's debugger.
+        Work out every (test index, test, version, repeat) job to run with the selected runner.
+
+        Jobs that the runner's capability profile says it can't run are pruned here instead of being run to failure.
+        With options.last_failed, only the jobs that failed or warned the last time they were run are kept, and with
+        options.failed_first, those jobs are moved ahead of the others. With options.changed_since, only the tests that
+        the changes since that git ref affect are kept.
+
+        Returns the jobs to run, and a SKIPPED response for each pruned job.
         """
-        print(f"===DEBUG===")
+        wdl_runner = get_runner(options.runner)
         versions_to_test = set(options.versions.split(','))
+        last_failed = read_last_failed(options.runner) if options.last_failed or options.failed_first else {}
         selected_tests = get_specific_tests(conformance_tests=self.tests, options=options)
-        selected_tests_amt = len(selected_tests) * len(versions_to_test) * options.repeat
-        test_responses = list()
-        completed_count = 0
+        if options.last_failed:
+            failed_ids = {test_id for test_id, version in last_failed}
+            selected_tests = [test_index for test_index in selected_tests
+                              if test_index < len(self.tests) and str(self.tests[test_index]['id']) in failed_ids]
+            if len(selected_tests) == 0:
+                print(f"No failures to rerun from the last run of {options.runner}.")
+        if options.changed_since is not None:
+            affected = get_affected_tests(self.conformance_file, self.tests, options.changed_since)
+            if affected is None:
+                print(f"Harness files changed since {options.changed_since}, so all selected tests are affected.")
+            else:
+                selected_tests = [test_index for test_index in selected_tests if test_index < len(self.tests) and
+                                  str(self.tests[test_index]['id']) in affected]
+                print(f"{len(selected_tests)} selected tests are affected by changes since {options.changed_since}.")
+        jobs = []
+        pruned_responses = []
         for test_index in selected_tests:
             try:
                 test = self.tests[test_index]
-            except KeyError:
+            except (KeyError, IndexError):
                 print(f'ERROR: Provided test [{test_index}] do not exist.')
                 sys.exit(1)
-            result = {}
             for version in versions_to_test:
+                if options.last_failed and (str(test['id']), version) not in last_failed:
+                    continue
+                # versions the test doesn't apply to are reported by handle_test
+                reason = wdl_runner.unsupported_reason(test, version) if version in test['versions'] else None
                 for iteration in range(options.repeat):
-                    # Handle each test as a concurrent job
-                    # todo: abstract below and the other run function so code is deduplicated
-                    result = self.handle_test(
-                        test_index,
-                        test,
-                        options.runner,
-                        version,
-                        options.time,
-                        options.verbose,
-                        options.quiet,
-                        args,
-                        options.jobstore_path,
-                        iteration + 1 if options.repeat is not None else None,
-                        options.progress,
-                        options.debug)
-                    test_responses.append(result)
+                    repeat = iteration + 1 if options.repeat is not None else None
+                    if reason is None:
+                        jobs.append((test_index, test, version, repeat))
+                        continue
+                    if options.progress:
+                        print(f"Skipping test {test_index} (ID: {test['id']}) with runner {options.runner} on WDL "
+                              f"version {version} as the runner does not support it.")
+                    pruned_responses.append({'description': test.get('description'), 'number': test_index,
+                                             'id': test.get('id'), 'runner': options.runner, 'version': version,
+                                             'status': 'SKIPPED', 'reason': reason, 'repeat': repeat})
+        if options.failed_first:
+            # a stable sort, so the failures and the rest each stay in test order
+            jobs.sort(key=lambda job: (str(job[1]['id']), job[2]) not in last_failed)
+        return jobs, pruned_responses
+
+    def pre_pull_images(self, jobs: List[Tuple[int, Dict[str, Any], str, Optional[int]]], pull_command: str,
+                        threads: int) -> Dict[str, Dict[str, Any]]:
+        """
+        Pull every container image used by the planned jobs once, in parallel, so that image pulls don't land inside
+        any test's timed run.
+
+        Images are found in the WDL file each job will actually run, after conversion to the job's WDL version.
+
+        :param pull_command: command to pull an image with. {image} is replaced with the image name; otherwise the
+            image name is appended to the command.
+        :param threads: number of images to pull at once
+
+        Returns the pull time and return code of each image.
+        """
+        images = []
+        for test_index, test, version, repeat in jobs:
+            if version not in test['versions']:
+                continue
+            wdl_dir = test['inputs']['dir']
+            wdl_input = get_test_wdl_file(test)
+            wdl_file = get_wdl_file(wdl_input, os.path.abspath(wdl_dir), version)
+            images.extend(image for image in get_container_images(wdl_file) if image not in images)
+        if len(images) == 0:
+            return {}
+
+        def pull(image: str) -> Dict[str, Any]:
+            if "{image}" in pull_command:
+                cmd = shlex.split(pull_command.replace("{image}", image))
+            else:
+                cmd = shlex.split(pull_command) + [image]
+            pull_start = timeit.default_timer()
+            ret_code, stdout, stderr = run_cmd(cmd=cmd, cwd=os.getcwd())
+            return {'time': timeit.default_timer() - pull_start, 'return_code': ret_code,
+                    'stderr': stderr.decode("utf-8", errors="ignore")}
+
+        print(f"Pulling {len(images)} container images before running tests: {', '.join(images)}")
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            pulls = dict(zip(images, executor.map(pull, images)))
+        for image, result in pulls.items():
+            status = "pulled" if result['return_code'] == 0 else f"FAILED to pull ({result['stderr'].strip()})"
+            print(f"\t{image}: {status} in {parse_time(result['time'])}")
+        return pulls
+
+    def _debug_run_all_tests(self, options: argparse.Namespace, args: Optional[Dict[str, Any]],
+                             plan: Optional[Tuple[List[Tuple[int, Dict[str, Any], str, Optional[int]]],
+                                                  List[Dict[str, Any]]]] = None,
+                             janitor: Optional[Janitor] = None,
+                             quarantine: Optional[Set[Tuple[str, str]]] = None) -> List[Dict[str, Any]]:
+        """
+        Meant to be called by _run_debug. Runs the tests single-threaded to be compatible with pycharm's debugger.
+
+        :param plan: result of plan_tests, if it has already been called
+        :param janitor: if set, each response is handed to it to clean up after as soon as it is verified
+        :param quarantine: (test ID, version) pairs of known-flaky tests, which are retried options.flaky_retries
+        times if they fail
+        """
+        print(f"===DEBUG===")
+        jobs, test_responses = plan if plan is not None else self.plan_tests(options)
+        selected_tests_amt = len(jobs) + len(test_responses)
+        completed_count = len(test_responses)
+        wdl_runner = bootstrap_runner(options.runner, options.verbose, self.get_pre_args(options.runner, args))
+        for test_index, test, version, repeat in jobs:
+            # todo: abstract below and the other run function so code is deduplicated
+            result = self.handle_test(
+                test_index,
+                test,
+                options.runner,
+                version,
+                options.time,
+                options.verbose,
+                options.quiet,
+                args,
+                options.jobstore_path,
+                repeat,
+                options.progress,
+                options.debug,
+                not options.ignore_host_capabilities,
+                options.scratch_root,
+                options.keep_artifacts,
+                options.artifacts_dir,
+                wdl_runner,
+                options.profile,
+                options.profile_dir,
+                options.sample_interval,
+                options.metrics_dir,
+                options.flaky_retries if (str(test['id']), version) in (quarantine or set()) else 0)
+            test_responses.append(result)
+            if janitor is not None:
+                janitor.track(result)
             completed_count += 1
             if options.progress:
                 print(
@@ -561,46 +764,100 @@ class WDLConformanceTestRunner:
         print(completed_count, len(test_responses), test_responses)
         return test_responses
 
-    def run_all_tests(self, options: argparse.Namespace, args: Optional[Dict[str, Any]]):
+    @staticmethod
+    def get_worker_isolation(options: argparse.Namespace, max_workers: int) -> Tuple[int, Tuple[Any, ...]]:
+        """
+        Work out how to isolate the test workers from each other and from the rest of the host.
+
+        With options.isolate_cpus, each worker gets its own share of the CPUs, so there can be no more workers than
+        CPUs. Warns if tests are timed on a host that is already busy or has more workers than CPUs.
+
+        Returns the number of workers to start and the initargs for init_test_worker.
         """
-        Run all tests and capture the test results. Runs in a threaded manner depending on options.threads
+        available = sorted(get_test_indices(options.cpus)) if options.cpus is not None else \
+            sorted(os.sched_getaffinity(0))
+        cpu_sets = None
+        if options.isolate_cpus:
+            if max_workers > len(available):
+                print(f"Warning: Only running {len(available)} tests at once, as there are only {len(available)} "
+                      f"CPUs to give each its own.")
+                max_workers = len(available)
+            cpu_sets = multiprocessing.Queue()
+            for cpu_set in split_cpus(available, max_workers):
+                cpu_sets.put(cpu_set)
+        elif options.time and max_workers > len(available):
+            print(f"Warning: Running {max_workers} timed tests at once on {len(available)} CPUs, so they will compete "
+                  f"for CPU time. Consider --isolate-cpus.")
+        if options.time or options.isolate_cpus:
+            others = (os.cpu_count() or len(available)) - len(available)
+            load = os.getloadavg()[0]
+            # other work needs at least a whole CPU more than the tests leave free
+            if load >= others + 1:
+                print(f"Warning: The host's load average is {load:.1f}, but only {others} CPUs are left for anything "
+                      f"other than the tests. Timings may be noisy.")
+        cpus = available if options.cpus is not None else None
+        return max_workers, (cpus, cpu_sets, options.nice, options.ionice_class)
+
+    def run_all_tests(self, options: argparse.Namespace, args: Optional[Dict[str, Any]],
+                      plan: Optional[Tuple[List[Tuple[int, Dict[str, Any], str, Optional[int]]],
+                                           List[Dict[str, Any]]]] = None,
+                      janitor: Optional[Janitor] = None, quarantine: Optional[Set[Tuple[str, str]]] = None):
         """
-        test_responses = list()
+        Run all tests and capture the test results. Runs in a threaded manner depending on options.threads, capped
+        by the runner's concurrency limit.
 
-        versions_to_test = set(options.versions.split(','))
-        selected_tests = get_specific_tests(conformance_tests=self.tests, options=options)
-        selected_tests_amt = len(selected_tests) * len(versions_to_test) * options.repeat
-        with ProcessPoolExecutor(max_workers=options.threads) as executor:  # process instead of thread so realtime works
+        :param plan: result of plan_tests, if it has already been called
+        :param janitor: if set, each response is handed to it to clean up after as soon as it is verified
+        :param quarantine: (test ID, version) pairs of known-flaky tests, which are retried options.flaky_retries
+        times if they fail
+        """
+        jobs, test_responses = plan if plan is not None else self.plan_tests(options)
+        selected_tests_amt = len(jobs) + len(test_responses)
+        # bootstrap here rather than in the workers, which would each do it on their own copy of the runner
+        wdl_runner = bootstrap_runner(options.runner, options.verbose, self.get_pre_args(options.runner, args))
+        max_workers = options.threads
+        if wdl_runner.max_concurrency is not None:
+            max_workers = min(max_workers, wdl_runner.max_concurrency)
+        max_workers, isolation = self.get_worker_isolation(options, max_workers)
+        # process instead of thread so realtime works
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=init_test_worker,
+                                 initargs=isolation) as executor:
             pending_futures = []
-            for test_index in selected_tests:
-                try:
-                    test = self.tests[test_index]
-                except KeyError:
-                    print(f'ERROR: Provided test [{test_index}] do not exist.')
-                    sys.exit(1)
-                for version in versions_to_test:
-                    for iteration in range(options.repeat):
-                        # Handle each test as a concurrent job
-                        result_future = executor.submit(self.handle_test,
-                                                        test_index,
-                                                        test,
-                                                        options.runner,
-                                                        version,
-                                                        options.time,
-                                                        options.verbose,
-                                                        options.quiet,
-                                                        args,
-                                                        options.jobstore_path,
-                                                        iteration + 1 if options.repeat is not None else None,
-                                                        options.progress,
-                                                        options.debug)
-                        pending_futures.append(result_future)
-            completed_count = 0
+            for test_index, test, version, repeat in jobs:
+                # Handle each test as a concurrent job
+                result_future = executor.submit(self.handle_test,
+                                                test_index,
+                                                test,
+                                                options.runner,
+                                                version,
+                                                options.time,
+                                                options.verbose,
+                                                options.quiet,
+                                                args,
+                                                options.jobstore_path,
+                                                repeat,
+                                                options.progress,
+                                                options.debug,
+                                                not options.ignore_host_capabilities,
+                                                options.scratch_root,
+                                                options.keep_artifacts,
+                                                options.artifacts_dir,
+                                                wdl_runner,
+                                                options.profile,
+                                                options.profile_dir,
+                                                options.sample_interval,
+                                                options.metrics_dir,
+                                                options.flaky_retries
+                                                if (str(test['id']), version) in (quarantine or set()) else 0)
+                pending_futures.append(result_future)
+            completed_count = len(test_responses)
             for result_future in as_completed(pending_futures):
                 completed_count += 1
                 # Go get each result
                 result = result_future.result()
                 test_responses.append(result)
+                if janitor is not None:
+                    janitor.track(result)
                 if options.progress:
                     # if progress is true, then print a summarized output of the completed test and current status
                     print(
@@ -616,19 +873,70 @@ class WDLConformanceTestRunner:
         # might allow it.
         # But the tests all need to be for single WDL versions.
         versions_to_test = set(options.versions.split(','))
-        selected_tests = get_specific_tests(conformance_tests=self.tests, options=options)
-        selected_tests_amt = len(selected_tests) * len(versions_to_test) * options.repeat
         successes = 0
         skips = 0
         ignored = 0
         warnings = 0
         failed = 0
-        print(f'Testing runner {options.runner} on WDL versions: {",".join(versions_to_test)}\n')
+        print(f'Testing runner {options.runner} on WDL versions: {",".join(versions_to_test)}')
+        if options.history_db is not None:
+            # start the run before any tests, so it is timestamped with when they started
+            open_run(options.history_db, options)
+        pre_args = self.get_pre_args(options.runner, args)
+        # Resolve the runner's command (downloading it if needed) once, before any test worker is started
+        bootstrap_runner(options.runner, options.verbose, pre_args)
+        # Fingerprint the runner once up front so every result can be tied to the exact runner build that made it
+        fingerprint = get_runner_fingerprint(options.runner, pre_args)
+        print(f'Runner fingerprint {fingerprint["id"]}: {fingerprint["version"]}\n')
+        if options.verbose:
+            print(f"Full runner fingerprint: {fingerprint}\n")
+
+        if options.profile is not None:
+            wdl_runner = bootstrap_runner(options.runner, options.verbose, pre_args)
+            if not profiler_available(options.profile):
+                raise RuntimeError(f"Can't profile with {options.profile} as it isn't installed.")
+            if wdl_runner.python_command(shlex.split(wdl_runner.runner)) is None:
+                print(f"Warning: Not profiling {options.runner} as it isn't run by Python.\n")
+            elif options.time:
+                print(f"Warning: Test times include the overhead of profiling with {options.profile}.\n")
+
+        if not options.ignore_host_capabilities:
+            # Probe once here so the test workers inherit the cached result instead of each probing the host
+            host = get_host_capabilities()
+            if options.verbose:
+                print(f"Host capabilities: {host}\n")
+
+        plan = self.plan_tests(options)
+        selected_tests_amt = len(plan[0]) + len(plan[1])
+        quarantine = set()
+        if options.quarantine_flaky and options.history_db is not None:
+            planned = {(str(test['id']), version) for _, test, version, _ in plan[0]}
+            quarantine = planned & set(get_flaky_tests(options.history_db, options.runner))
+            print(f"Quarantining {len(quarantine)} known-flaky tests: they are retried up to {options.flaky_retries} "
+                  f"times if they fail, and don't fail the run.\n")
+        image_pulls = {}
+        # by default, only spend time pre-pulling images when the tests are being timed
+        pre_pull = options.pre_pull if options.pre_pull is not None else options.time
+        if pre_pull:
+            if which(shlex.split(options.pull_command)[0]) is None:
+                print(f"Warning: Not pre-pulling container images as {options.pull_command} is not available.\n")
+            else:
+                image_pulls = self.pre_pull_images(plan[0], options.pull_command, options.pull_threads)
+
+        janitor = self.get_janitor(options)
 
         if options.debug is True:
-            test_responses = self._debug_run_all_tests(options, args)
+            test_responses = self._debug_run_all_tests(options, args, plan, janitor, quarantine)
         else:
-            test_responses = self.run_all_tests(options, args)
+            test_responses = self.run_all_tests(options, args, plan, janitor, quarantine)
+
+        reclaimed_bytes = janitor.finish() if janitor is not None else 0
+
+        for response in test_responses:
+            if (str(response['id']), response['version']) in quarantine:
+                response['quarantined'] = True
+        self.finish_responses(options, fingerprint, test_responses)
+        last_failed = update_last_failed(options.runner, test_responses)
 
         print("\n=== REPORT ===\n")
 
@@ -651,39 +959,130 @@ class WDLConformanceTestRunner:
             f'{selected_tests_amt - skips} tests run, {successes} succeeded, {failed} '
             f'failed, {skips} skipped, {ignored} ignored, {warnings} warnings'
         )
-
-        # identify the failing tests
+        if len(image_pulls) > 0:
+            pull_time = sum(pull['time'] for pull in image_pulls.values())
+            failed_pulls = [image for image, pull in image_pulls.items() if pull['return_code'] != 0]
+            print(f"\t{len(image_pulls)} container images pre-pulled in {parse_time(pull_time)} "
+                  f"(not included in test times)")
+            if len(failed_pulls) > 0:
+                print(f"\tFailed image pulls: {','.join(failed_pulls)}")
+        if janitor is not None:
+            print(f"\t{format_size(reclaimed_bytes)} of execution artifacts cleaned up")
+
+        profile_files = [response['profile'] for response in test_responses if response.get('profile') is not None]
+        if len(profile_files) > 0:
+            print_profile_summary(options.runner, profile_files, options.profile, options.profile_top)
+            print(f"Profiles of each test are in {os.path.join(options.profile_dir, options.runner)}\n")
+
+        # identify the failing tests, leaving out quarantined flaky tests
         failed_ids = [str(response['number']) for response in test_responses if
-                      response['status'] in {'FAILED'}]
+                      response['status'] in {'FAILED'} and not response.get('quarantined')]
+        quarantined_ids = [str(response['number']) for response in test_responses if
+                           response['status'] in {'FAILED'} and response.get('quarantined')]
         warn_ids = [str(response['number']) for response in test_responses if
                     response['status'] in {'WARNING'}]
         if len(failed_ids) > 0:
             print(f"\tFailures: {','.join(failed_ids)}")
         else:
             print("\tNo failures!")
+        if len(quarantined_ids) > 0:
+            print(f"\tQuarantined flaky failures (not counted): {','.join(quarantined_ids)}")
         if len(warn_ids) > 0:
             print(f"\tWarnings: {','.join(warn_ids)}")
+        if len(last_failed) > 0:
+            print(f"\t{len(last_failed)} failed or warned the last time they were run with {options.runner}; rerun "
+                  f"them with --last-failed")
+        self.print_flaky_tests(options, test_responses)
 
         if len(failed_ids) > 0:
             return test_responses, False
         else:
             return test_responses, True
 
-    def run_and_generate_tests(self, options: argparse.Namespace) -> Tuple[List[Any], bool]:
+    @staticmethod
+    def print_flaky_tests(options: argparse.Namespace, test_responses: List[Dict[str, Any]]) -> None:
         """
-        Call run_and_generate_tests_args with a namespace object
+        Print the tests of this run that both succeeded and failed, with their pass rate, how often their status
+        changed and how much their runtime varied.
+
+        With options.history_db, this is over the recent runs in the database (including this one), otherwise over the
+        repeats of this run.
+        """
+        numbers = {(str(response['id']), response['version']): response['number'] for response in test_responses}
+        if options.history_db is not None:
+            flaky = get_flaky_tests(options.history_db, options.runner)
+        else:
+            outcomes: Dict[Tuple[str, str], List[Tuple[str, Optional[float]]]] = {}
+            for response in sorted(test_responses, key=lambda a: a.get('repeat') or 0):
+                # failed attempts of retried tests count too, or retries would hide how flaky a test is
+                for attempt in response.get('retried_attempts', []) + [response]:
+                    outcomes.setdefault((str(response['id']), response['version']), []).append(
+                        (attempt['status'], (attempt.get('time') or {}).get('real')))
+            flaky = {key: get_flakiness(test_outcomes) for key, test_outcomes in outcomes.items()}
+        flaky = {key: flakiness for key, flakiness in flaky.items() if flakiness['flaky'] and key in numbers}
+        if len(flaky) > 0:
+            print("\tFlaky:")
+            for (test_id, version), flakiness in sorted(flaky.items(), key=lambda item: numbers[item[0]]):
+                print(f"\t\t{numbers[(test_id, version)]} (ID: {test_id}) on WDL version {version}: "
+                      f"{format_flakiness(flakiness)}")
+
+    @staticmethod
+    def finish_responses(options: argparse.Namespace, fingerprint: Dict[str, Any],
+                         test_responses: List[Dict[str, Any]]) -> None:
+        """
+        Tie each response to the runner build that made it, and write the responses to options.jsonl_output and
+        options.history_db if they are set.
+        """
+        for response in test_responses:
+            response['runner_fingerprint'] = fingerprint["id"]
+
+        if options.jsonl_output is not None:
+            # append, so that several runs (such as one per runner) can be collected into one file
+            with open(options.jsonl_output, "a") as f:
+                for response in test_responses:
+                    f.write(json.dumps(response, default=str) + "\n")
+        if options.history_db is not None:
+            run_id = record_responses(options.history_db, options, options.runner, fingerprint, test_responses)
+            print(f"Recorded {len(test_responses)} test executions in run {run_id} of {options.history_db}")
+
+    @staticmethod
+    def get_janitor(options: argparse.Namespace) -> Optional[Janitor]:
+        """
+        Get a janitor that cleans up after tests as options.cleanup and the options that go with it ask, or None
+        without options.cleanup.
+        """
+        if not options.cleanup:
+            return None
+        max_bytes = None
+        if options.max_artifacts_size is not None:
+            max_bytes = parse_memory_string(options.max_artifacts_size)
+            if max_bytes is None:
+                raise RuntimeError(f"Can't parse --max-artifacts-size {options.max_artifacts_size}")
+        return Janitor(keep_failed=options.keep_failed, keep_last=options.keep_last, max_bytes=max_bytes)
+
+    @staticmethod
+    def get_runner_args(options: argparse.Namespace) -> Dict[str, Any]:
+        """
+        Get the extra arguments to pass to each runner from a namespace object.
         """
         args = {}
-        for runner in RUNNERS.keys():
+        for runner in get_runner_names():
             if runner == "miniwdl":
                 args[runner] = options.miniwdl_args
-            if runner == "toil-wdl-runner":
+            elif runner == "toil-wdl-runner":
                 args[runner] = options.toil_args
-            if runner == "cromwell":
+            elif runner == "cromwell":
                 args[runner] = options.cromwell_args
                 args["cromwell_pre_args"] = options.cromwell_pre_args
+            else:
+                args[runner] = options.runner_args
+        return args
 
-        return self.run_and_generate_tests_args(options=options, args=args)
+    def run_and_generate_tests(self, options: argparse.Namespace) -> Tuple[List[Any], bool]:
+        """
+        Call run_and_generate_tests_args with a namespace object
+        """
+        return self.run_and_generate_tests_args(options=options, args=self.get_runner_args(options))
 
 
 def add_options(parser) -> None:
@@ -699,8 +1098,9 @@ def add_options(parser) -> None:
     parser.add_argument("--numbers", "-n", default=None,
                         help='Select the WDL test numbers you wish to run. Can be a comma separated list or hyphen '
                              'separated inclusive ranges. Ex: -n=1-4,6,8-10')
-    parser.add_argument("--runner", "-r", default='cromwell', choices=["cromwell", "toil-wdl-runner", "miniwdl"],
-                        help='Select the WDL runner to use.')
+    parser.add_argument("--runner", "-r", default='cromwell', choices=get_runner_names(),
+                        help='Select the WDL runner to use. Runners other than the built-in ones can be installed '
+                             'as wdl_conformance_tests.runners entry points.')
     parser.add_argument("--threads", type=int, default=1,
                         help='Number of tests to run in parallel. The maximum should be the number of CPU cores (not '
                              'threads due to wall clock timing).')
@@ -722,6 +1122,8 @@ def add_options(parser) -> None:
                                                                   "setting cromwell config files with "
                                                                   "--cromwell-pre-args="
                                                                   "\"-Dconfig.file=build/overrides.conf\".")
+    parser.add_argument("--runner-args", default=None, help="Arguments to pass into a runner installed from an "
+                                                            "entry point.")
     parser.add_argument("--id", default=None, help="Specify WDL tests by ID.")
     parser.add_argument("--repeat", default=1, type=int, help="Specify how many times to run each test.")
     # This is to deal with jobstores being created in the /data/tmp directory on Phoenix, which appears to be unique
@@ -731,6 +1133,84 @@ def add_options(parser) -> None:
     # Test responses are collected and sorted, so this option allows the script to print out the current progress
     parser.add_argument("--progress", default=False, action="store_true", help="Print the progress of the test suite "
                                                                                "as it runs.")
+    parser.add_argument("--cpus", default=None,
+                        help="Run tests, and the runners they start, only on these CPUs. Can be a comma separated "
+                             "list or hyphen separated inclusive ranges. Ex: --cpus=0-3,8")
+    parser.add_argument("--isolate-cpus", default=False, action="store_true",
+                        help="Give each test worker its own share of the CPUs (of --cpus if given), which the runners "
+                             "it starts inherit, so concurrent timed tests don't compete for cores. Not applied with "
+                             "--debug.")
+    parser.add_argument("--nice", default=0, type=int,
+                        help="Amount to add to the nice value of the test workers and the runners they start.")
+    parser.add_argument("--ionice-class", default=None, choices=list(IONICE_CLASSES),
+                        help="ionice scheduling class to give the test workers and the runners they start.")
+    parser.add_argument("--profile", default=None, nargs="?", const="cprofile", choices=PROFILERS,
+                        help="Profile runners that are run by Python (miniwdl and toil-wdl-runner), with cProfile by "
+                             "default or with py-spy (which also profiles subprocesses) if installed. One profile is "
+                             "written per test, and the functions that took the most time over all tests are printed "
+                             "with the report.")
+    parser.add_argument("--profile-dir", default="profiles",
+                        help="With --profile, directory to write profiles into, under a directory per runner.")
+    parser.add_argument("--profile-top", default=20, type=int,
+                        help="With --profile, number of functions to print in the summary.")
+    parser.add_argument("--sample-interval", default=None, type=float,
+                        help="Sample the CPU, memory, open files, threads and I/O of each runner's process tree every "
+                             "this many seconds while it runs. The peaks and averages are reported for each test. "
+                             "Ex: --sample-interval=0.5")
+    parser.add_argument("--metrics-dir", default="metrics",
+                        help="With --sample-interval, directory to write each test's timeline into, under a directory "
+                             "per runner.")
+    parser.add_argument("--scratch-root", default=None,
+                        help="Run each test in its own scratch directory under this directory, ideally on fast "
+                             "local storage such as tmpfs or a local NVMe drive. By default, tests run in this "
+                             "directory and share the runners' log and working directories.")
+    parser.add_argument("--keep-artifacts", default=False, action="store_true",
+                        help="With --scratch-root, keep the scratch directory of every test, not just failed ones.")
+    parser.add_argument("--artifacts-dir", default="artifacts",
+                        help="With --scratch-root, directory to copy the scratch directories of failed tests into.")
+    parser.add_argument("--cleanup", default=False, action="store_true",
+                        help="Delete what each test leaves behind (results file, Toil jobstore, runner working "
+                             "directory and copied artifacts) in the background as soon as the test is verified.")
+    parser.add_argument("--keep-failed", default=True, action=argparse.BooleanOptionalAction,
+                        help="With --cleanup, keep what failed tests leave behind.")
+    parser.add_argument("--keep-last", default=0, type=int,
+                        help="With --cleanup, keep what the last N tests to finish leave behind.")
+    parser.add_argument("--max-artifacts-size", default=None,
+                        help="With --cleanup, delete the oldest kept artifacts, even those of failed tests, while "
+                             "they take up more than this much space. Ex: --max-artifacts-size=\"10 GiB\"")
+    parser.add_argument("--jsonl-output", default=None,
+                        help="Append the full response of every test (status, reason, times and so on) to this file, "
+                             "one JSON object per line. This can be turned into an HTML report with report.py.")
+    parser.add_argument("--history-db", default=None,
+                        help="Record this run and every test execution in it (status, times and resource usage) in "
+                             "this SQLite database, which is created if needed. Query it with history.py.")
+    parser.add_argument("--last-failed", default=False, action="store_true",
+                        help="Only run the selected tests that failed or warned the last time they were run with the "
+                             "runner, on the versions they did. Failures are kept in .wdl-conformance-cache.")
+    parser.add_argument("--failed-first", default=False, action="store_true",
+                        help="Run the selected tests that failed or warned the last time they were run with the "
+                             "runner before all the others.")
+    parser.add_argument("--changed-since", default=None, metavar="REF",
+                        help="Only run the selected tests that changes since this git ref (including uncommitted "
+                             "ones) affect: changes to their test directory, the WDL files they import, their setup "
+                             "script or their entry in the conformance file. Changes to the harness run every test.")
+    parser.add_argument("--quarantine-flaky", default=False, action="store_true",
+                        help="Retry the tests that both succeeded and failed in the recent runs recorded in "
+                             "--history-db if they fail, and don't fail the run if they still do.")
+    parser.add_argument("--flaky-retries", default=2, type=int,
+                        help="With --quarantine-flaky, how many times to retry a failing flaky test. Default: 2")
+    parser.add_argument("--pre-pull", default=None, action=argparse.BooleanOptionalAction,
+                        help="Pull every container image the selected tests use before running any of them, so image "
+                             "pulls aren't timed as part of a test. Defaults to on when --time is set.")
+    parser.add_argument("--pull-command", default="docker pull",
+                        help="Command used to pull container images for --pre-pull. {image} is replaced with the "
+                             "image name, otherwise the image name is appended. Ex: "
+                             "--pull-command=\"singularity pull docker://{image}\"")
+    parser.add_argument("--pull-threads", default=4, type=int,
+                        help="Number of container images to pull at once for --pre-pull.")
+    parser.add_argument("--ignore-host-capabilities", default=False, action="store_true",
+                        help="Run tests even if this host can't satisfy their dependencies (such as a GPU or root "
+                             "access). By default, such tests are reported as warnings without being run.")
     parser.add_argument("--debug", action="store_true", default=False, help="Specifically to be used with Pycharm's debugger (or a pgdb based debugger)."
                                                                             "This makes everything run on the same thread.")
 
@@ -742,10 +1222,13 @@ def main(argv=None):
         argv = sys.argv[1:]
     parser = argparse.ArgumentParser(description='Run WDL conformance tests.')
     add_options(parser)
+    import argcomplete
     argcomplete.autocomplete(parser)
     args = parser.parse_args(argv)
+    if args.quarantine_flaky and args.history_db is None:
+        parser.error("--quarantine-flaky requires --history-db")
 
-    if args.runner not in RUNNERS:
+    if args.runner not in get_runner_names():
         print(f'Unsupported runner: {args.runner}')
         sys.exit(1)
 
@@ -5,67 +5,385 @@ Run the performance testing suite and output the results to a CSV file.
 
 Output file is specified with --output and runners are specified by --runners or --all-runners. Test options such as
 --repeat and -n are carried over from the standalone run.py script.
+
+With --measure-overhead, each runner's fixed overhead (startup and teardown, with no actual work) is measured before
+testing by running the no-op workflow in overhead.yaml, and recorded alongside each runtime so that it can be
+subtracted when graphing.
+
+With --interleave, runners take turns on each test in a random order (reproducible with --seed) instead of each
+running the whole suite in turn, so drift in machine state over the run doesn't favor any runner. The schedule that
+was followed is written to a separate CSV next to the output.
+
+With --adaptive, each test is repeated until the confidence interval of its median runtime is narrow enough instead of
+a fixed --repeat times. Warm-up runs from --warmup are never included in the output, and are written to a separate
+CSV next to it.
 """
 
 import argparse
+import copy
 import os.path
+import random
+import shlex
+import statistics
 import timeit
-from typing import Dict, Any, List
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from shutil import which
+from typing import Dict, Any, List, Tuple, Optional
 
-import argcomplete
 import sys
 
-from lib import parse_time
+from lib import parse_time, median_confidence_interval, get_specific_tests, get_test_indices, split_cpus, \
+    update_last_failed
 from run import WDLConformanceTestRunner, add_options
+from runners import get_runner_names, get_runner_fingerprint, bootstrap_runner
+from history import open_run
+
+
+# Suite with a single no-op workflow, used to measure the fixed overhead of each runner
+OVERHEAD_CONFORMANCE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "overhead.yaml")
+# WDL version the no-op workflow is run on
+OVERHEAD_VERSION = "1.0"
 
 
 def get_runners(options: argparse.Namespace):
     if options.all_runners:
-        return ["miniwdl", "toil-wdl-runner", "cromwell"]
+        return get_runner_names()
     elif options.runners is None:
         return [options.runner]
     else:
         return options.runners.split(",")
 
 
-def call_test(options: argparse.Namespace) -> Dict[str, Any]:
+def narrow_options(options: argparse.Namespace, numbers: List[int], repeat: int) -> argparse.Namespace:
     """
-    Run all tests and record times
+    Copy options to select only the given test numbers, each to be run the given number of times.
     """
-    conformance_runner = WDLConformanceTestRunner(options.conformance_file)
-    runners = get_runners(options)
-    all_responses = {}
+    run_options = copy.copy(options)
+    run_options.numbers = ",".join(str(number) for number in numbers)
+    run_options.id = None
+    run_options.tags = None
+    run_options.exclude_numbers = None
+    run_options.exclude_tags = None
+    run_options.repeat = repeat
+    return run_options
+
+
+def start_jobs(conformance_runner: WDLConformanceTestRunner, run_options: argparse.Namespace) -> \
+        Tuple[Dict[str, Any], Dict[str, Any], Tuple[List[Tuple[int, Dict[str, Any], str, Optional[int]]],
+                                                    List[Dict[str, Any]]]]:
+    """
+    Get ready to hand the tests selected by run_options straight to the test workers: bootstrap and fingerprint the
+    runner, plan the jobs, and pre-pull their images if run_options asks for it.
+
+    Returns the runner arguments, the runner fingerprint and the plan.
+    """
+    args = conformance_runner.get_runner_args(run_options)
+    pre_args = conformance_runner.get_pre_args(run_options.runner, args)
+    bootstrap_runner(run_options.runner, run_options.verbose, pre_args)
+    fingerprint = get_runner_fingerprint(run_options.runner, pre_args)
+    plan = conformance_runner.plan_tests(run_options)
+    pre_pull = run_options.pre_pull if run_options.pre_pull is not None else run_options.time
+    if pre_pull and which(shlex.split(run_options.pull_command)[0]) is not None:
+        conformance_runner.pre_pull_images(plan[0], run_options.pull_command, run_options.pull_threads)
+    return args, fingerprint, plan
+
+
+def run_jobs(conformance_runner: WDLConformanceTestRunner, options: argparse.Namespace, numbers: List[int],
+             repeat: int) -> List[Dict[str, Any]]:
+    """
+    Run only the given test numbers, each the given number of times, with all other options unchanged. Unlike a full
+    run, this prints no report and doesn't update the last-failed cache.
+    """
+    if len(numbers) == 0 or repeat == 0:
+        return []
+    run_options = narrow_options(options, numbers, repeat)
+    args, fingerprint, plan = start_jobs(conformance_runner, run_options)
+    janitor = conformance_runner.get_janitor(run_options)
+    test_responses = conformance_runner.run_all_tests(run_options, args, plan, janitor)
+    if janitor is not None:
+        janitor.finish()
+    conformance_runner.finish_responses(run_options, fingerprint, test_responses)
+    return test_responses
+
+
+def run_adaptive(conformance_runner: WDLConformanceTestRunner, options: argparse.Namespace,
+                 numbers: List[int]) -> List[Dict[str, Any]]:
+    """
+    Run each test on each WDL version one round at a time until the confidence interval of its median runtime is
+    within options.target_ci_width of the median, or it has been run options.max_repeat times.
+
+    Each round's jobs are handed straight to the test workers, without the report of a full run. Tests that don't
+    succeed on a version are not run again on it. Returns the responses of every round.
+    """
+    if len(numbers) == 0:
+        return []
+    run_options = narrow_options(options, numbers, 1)
+    args, fingerprint, (jobs, test_responses) = start_jobs(conformance_runner, run_options)
+    conformance_runner.finish_responses(run_options, fingerprint, test_responses)
+
+    # each (test number, WDL version) is sampled on its own, as versions can run at different speeds
+    tests = {(test_index, version): test for test_index, test, version, _ in jobs}
+    times: Dict[Tuple[int, str], List[float]] = {key: [] for key in tests}
+    outcome: Dict[Tuple[int, str], str] = {(response['number'], response['version']): response['status']
+                                           for response in test_responses}
+    remaining = list(tests)
+    rounds = 0
+    while len(remaining) > 0:
+        rounds += 1
+        round_jobs = [(test_index, tests[(test_index, version)], version, rounds) for test_index, version in remaining]
+        round_responses = conformance_runner.run_all_tests(run_options, args, (round_jobs, []))
+        conformance_runner.finish_responses(run_options, fingerprint, round_responses)
+        for response in round_responses:
+            test_responses.append(response)
+            key = (response['number'], response['version'])
+            if response['status'] != 'SUCCEEDED':
+                outcome[key] = response['status']
+                continue
+            times[key].append(response['time']['real'])
+            if len(times[key]) < options.min_repeat:
+                continue
+            width = relative_ci_width(times[key], options.confidence)
+            if width is not None and width <= options.target_ci_width:
+                outcome[key] = "converged"
+            elif len(times[key]) >= options.max_repeat:
+                outcome[key] = "hit --max-repeat"
+        remaining = [key for key in remaining if key not in outcome]
+
+    print(f"\n=== ADAPTIVE REPETITION ({options.runner}) ===\n")
+    print(f'{"Test":<8}{"Version":<13}{"Runs":>6}{"Median":>14}{"CI width":>10}  Outcome')
+    for key in sorted(outcome):
+        test_times = times.get(key, [])
+        width = relative_ci_width(test_times, options.confidence)
+        median = parse_time(statistics.median(test_times)) if test_times else "-"
+        width_string = f"{width:.1%}" if width is not None else "-"
+        print(f"{key[0]:<8}{key[1]:<13}{len(test_times):>6}{median:>14}{width_string:>10}  {outcome[key]}")
+    return test_responses
+
+
+def make_schedule(numbers: List[int], runners: List[str], repeat: int, seed: int) -> List[Dict[str, Any]]:
+    """
+    Make a round-robin schedule of which runner runs which test when: in each of the repeat rounds, every test is run
+    by every runner, in a random order per test.
+
+    The same seed always makes the same schedule.
+    """
+    rng = random.Random(seed)
+    schedule = []
+    for round_number in range(1, repeat + 1):
+        for number in numbers:
+            order = list(runners)
+            rng.shuffle(order)
+            schedule.append({'round': round_number, 'number': number, 'runners': order})
+    return schedule
+
+
+def run_interleaved(conformance_runner: WDLConformanceTestRunner, options: argparse.Namespace, runners: List[str],
+                    schedule: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Run tests following a schedule from make_schedule. With options.concurrent_runners, the runners in each slot of
+    the schedule run at the same time, each pinned to its own disjoint set of CPUs.
+
+    Each slot is summarized as it finishes, rather than with the report of a full run, and the last-failed cache is
+    updated once at the end. The CPUs each runner was given are stored in each schedule slot. Returns the responses of
+    each runner.
+    """
+    cpu_sets = {}
+    if options.concurrent_runners:
+        cpus = sorted(get_test_indices(options.cpus)) if options.cpus is not None else sorted(os.sched_getaffinity(0))
+        cpu_sets = dict(zip(runners, split_cpus(cpus, len(runners))))
+    runner_options = {}
     for runner in runners:
-        realtime_start = timeit.default_timer()
-        options.runner = runner
-        options.time = True
-        all_test_responses, successful_run = conformance_runner.run_and_generate_tests(options)
-        realtime_end = timeit.default_timer()
-        print(f"Total runtime: {parse_time(realtime_end - realtime_start)}")
-        all_responses[runner] = all_test_responses
+        runner_options[runner] = copy.copy(options)
+        runner_options[runner].runner = runner
+        runner_options[runner].time = True
+        if runner in cpu_sets:
+            runner_options[runner].cpus = ",".join(str(cpu) for cpu in cpu_sets[runner])
+    all_responses: Dict[str, List[Dict[str, Any]]] = {runner: [] for runner in runners}
+    for position, slot in enumerate(schedule, start=1):
+        print(f"Schedule slot {position}/{len(schedule)}: round {slot['round']}, test {slot['number']}, "
+              f"runners {','.join(slot['runners'])}")
+        slot['cpus'] = {runner: runner_options[runner].cpus for runner in slot['runners']}
+        # each slot skips the report of a full run, and is summarized here once its runners are done instead
+        if options.concurrent_runners:
+            with ThreadPoolExecutor(max_workers=len(slot['runners'])) as executor:
+                futures = {runner: executor.submit(run_jobs, conformance_runner, runner_options[runner],
+                                                   [slot['number']], 1) for runner in slot['runners']}
+                slot_responses = {runner: future.result() for runner, future in futures.items()}
+        else:
+            slot_responses = {runner: run_jobs(conformance_runner, runner_options[runner], [slot['number']], 1)
+                              for runner in slot['runners']}
+        for runner, test_responses in slot_responses.items():
+            for response in test_responses:
+                response['repeat'] = slot['round']
+                time = (response.get('time') or {}).get('real')
+                print(f"\t{runner}: {response['status']} on WDL version {response['version']}"
+                      + (f" in {parse_time(time)}" if time is not None else ""))
+            all_responses[runner].extend(test_responses)
+            # images only need pulling once
+            runner_options[runner].pre_pull = False
+    # the last-failed cache is updated once per runner, with the responses of every slot
+    for runner in runners:
+        statuses = Counter(response['status'] for response in all_responses[runner])
+        print(f"{runner}: {len(all_responses[runner])} runs, "
+              + ", ".join(f"{count} {status.lower()}" for status, count in sorted(statuses.items())))
+        update_last_failed(runner, all_responses[runner])
+    return all_responses
+
+
+def write_schedule_to_csv(schedule: List[Dict[str, Any]], output: str, seed: int) -> None:
+    # one row per runner per slot, in the order they were started, so the run can be reproduced with --seed
+    with open(output, "w") as f:
+        f.write("Seed,Slot,Round,Test Number,Order,Runner,CPUs\n")
+        for position, slot in enumerate(schedule, start=1):
+            for order, runner in enumerate(slot['runners'], start=1):
+                cpus = (slot.get('cpus') or {}).get(runner) or ''
+                f.write(f"{seed},{position},{slot['round']},{slot['number']},{order},{runner},\"{cpus}\"\n")
+
+
+def relative_ci_width(times: List[float], confidence: float) -> Optional[float]:
+    """
+    Get the width of the confidence interval of the median of some times, relative to the median.
+    """
+    interval = median_confidence_interval(times, confidence)
+    median = statistics.median(times) if times else 0
+    if interval is None or median == 0:
+        return None
+    return (interval[1] - interval[0]) / median
+
 
-    # consolidate
+def measure_overhead(options: argparse.Namespace, runner: str) -> Optional[float]:
+    """
+    Measure the fixed overhead of a runner: the median time it takes to run a workflow that does nothing.
+
+    The runs are done one at a time, so the first one, which is discarded to warm up caches, really runs first and
+    none of them compete with each other. They always use WDL 1.0, which every runner supports, so that overheads are
+    comparable whatever versions the tests are run on, and what they leave behind is always cleaned up, unless they
+    fail and options.keep_failed is set. Returns None if the no-op workflow didn't succeed.
+    """
+    overhead_runner = WDLConformanceTestRunner(OVERHEAD_CONFORMANCE_FILE)
+    overhead_options = copy.copy(options)
+    overhead_options.runner = runner
+    overhead_options.time = True
+    overhead_options.threads = 1
+    overhead_options.versions = OVERHEAD_VERSION
+    overhead_options.cleanup = True
+    overhead_options.keep_last = 0
+    overhead_options.max_artifacts_size = None
+    overhead_options.isolate_cpus = False
+    overhead_options.pre_pull = False
+    overhead_options.jsonl_output = None
+    overhead_options.history_db = None
+    overhead_options.profile = None
+    overhead_options.sample_interval = None
+    # the no-op workflow is always measured, whatever the tests are narrowed down to
+    overhead_options.last_failed = False
+    overhead_options.failed_first = False
+    overhead_options.changed_since = None
+    # run_jobs keeps these runs out of the last-failed cache and doesn't print a report of them
+    test_responses = run_jobs(overhead_runner, overhead_options, [0], options.overhead_repeat + 1)
+    test_responses.sort(key=lambda response: response.get('repeat') or 0)
+    times = [response['time']['real'] for response in test_responses[1:] if response['status'] == 'SUCCEEDED']
+    if len(times) == 0:
+        print(f"Warning: Could not measure the overhead of {runner}, as the no-op workflow did not succeed.")
+        return None
+    overhead = statistics.median(times)
+    print(f"Overhead of {runner}: {parse_time(overhead)} (median of {len(times)} no-op runs)")
+    return overhead
+
+
+def consolidate(all_responses: Dict[str, List[Dict[str, Any]]]) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """
+    Collect the times (or statuses, for tests that didn't succeed) of each test by test ID and runner, and the
+    fingerprint ID of each runner.
+    """
     ordered_tests_by_id = dict()
+    fingerprints = dict()
     for runner, all_test_responses in all_responses.items():
         for test in all_test_responses:
+            fingerprints[runner] = test['runner_fingerprint']
             test_id = test["id"]
             ordered_tests_by_id.setdefault(test_id, dict())
             test_time = test['time']['real'] if test['status'] == 'SUCCEEDED' else test['status']
             ordered_tests_by_id[test_id].setdefault(runner, list())
             ordered_tests_by_id[test_id][runner].append(test_time)
-    return ordered_tests_by_id
+    return ordered_tests_by_id, fingerprints
+
+
+def call_test(options: argparse.Namespace) -> Tuple[Dict[str, List[Dict[str, Any]]], Dict[str, List[Dict[str, Any]]],
+                                                   Dict[str, Optional[float]]]:
+    """
+    Run all tests and record times
+
+    Returns the test responses of each runner, the responses of the warm-up runs of each runner, and the overhead of
+    each runner. With options.interleave, the schedule that was followed is written out too.
+    """
+    conformance_runner = WDLConformanceTestRunner(options.conformance_file)
+    runners = get_runners(options)
+    numbers = get_specific_tests(conformance_tests=conformance_runner.tests, options=options)
+    warmup = options.warmup if options.warmup is not None else (1 if options.adaptive else 0)
+    all_responses = {}
+    warmup_responses = {}
+    overheads = {}
+    for runner in runners:
+        if options.measure_overhead:
+            overheads[runner] = measure_overhead(options, runner)
+    for runner in runners:
+        realtime_start = timeit.default_timer()
+        runner_options = copy.copy(options)
+        runner_options.runner = runner
+        runner_options.time = True
+        if warmup > 0:
+            print(f"Warming up {runner} with {warmup} discarded runs of each test")
+            # warm-up runs are discarded, so they aren't recorded anywhere else either: run_jobs prints no report and
+            # leaves the last-failed cache alone
+            warmup_options = copy.copy(runner_options)
+            warmup_options.jsonl_output = None
+            warmup_options.history_db = None
+            warmup_responses[runner] = run_jobs(conformance_runner, warmup_options, numbers, warmup)
+            runner_options.pre_pull = False
+        if options.interleave:
+            continue
+        if options.adaptive:
+            all_test_responses = run_adaptive(conformance_runner, runner_options, numbers)
+        else:
+            all_test_responses, successful_run = conformance_runner.run_and_generate_tests(runner_options)
+        realtime_end = timeit.default_timer()
+        print(f"Total runtime: {parse_time(realtime_end - realtime_start)}")
+        all_responses[runner] = all_test_responses
+
+    if options.interleave:
+        seed = options.seed if options.seed is not None else random.SystemRandom().randrange(2 ** 32)
+        print(f"Interleaving runners {','.join(runners)} with seed {seed}")
+        schedule = make_schedule(numbers, runners, options.repeat, seed)
+        realtime_start = timeit.default_timer()
+        if warmup > 0:
+            options = copy.copy(options)
+            options.pre_pull = False
+        all_responses = run_interleaved(conformance_runner, options, runners, schedule)
+        print(f"Total runtime: {parse_time(timeit.default_timer() - realtime_start)}")
+        root, ext = os.path.splitext(options.output)
+        write_schedule_to_csv(schedule, f"{root}_schedule{ext}", seed)
+
+    return all_responses, warmup_responses, overheads
 
 
-def write_times_to_csv(tests_by_id: Dict[str, Any], output: str, runners: List[str]) -> None:
+def write_times_to_csv(tests_by_id: Dict[str, Any], output: str, runners: List[str],
+                       fingerprints: Dict[str, str], overheads: Optional[Dict[str, Optional[float]]] = None) -> None:
     # write the average of all runtimes per test id
+    # the runner fingerprint is recorded so that CSVs from different runner builds aren't compared by mistake
+    # and the runner overhead so that it can be subtracted out
+    overheads = overheads or {}
     with open(output, "w") as f:
-        f.write("Test ID,Runner,Runtime\n")
+        f.write("Test ID,Runner,Runtime,Runner Fingerprint,Overhead\n")
         # f.write("Test ID" + "," + ",".join(runners) + "\n")
         for test_id, test_times in tests_by_id.items():
             for runner in runners:
-                test_time_list = test_times[runner]
+                test_time_list = test_times.get(runner, [])
                 for test_time in test_time_list:
-                    f.write(f"{test_id},{runner},{test_time}\n")
+                    overhead = overheads.get(runner)
+                    f.write(f"{test_id},{runner},{test_time},{fingerprints.get(runner, '')},"
+                            f"{overhead if overhead is not None else ''}\n")
     return
 
 
@@ -87,27 +405,95 @@ def get_data(test_response: Dict[str, Any], all_test_data: List[Dict[str, Any]])
 def call_and_write_csv(options: argparse.Namespace) -> None:
     runners = get_runners(options)
     output = options.output
-    tests_by_id = call_test(options)
-    write_times_to_csv(tests_by_id, output, runners)
+    all_responses, warmup_responses, overheads = call_test(options)
+    tests_by_id, fingerprints = consolidate(all_responses)
+    warmup_tests_by_id, _ = consolidate(warmup_responses)
+    write_times_to_csv(tests_by_id, output, runners, fingerprints, overheads)
+    if len(warmup_tests_by_id) > 0:
+        root, ext = os.path.splitext(output)
+        write_times_to_csv(warmup_tests_by_id, f"{root}_warmup{ext}", runners, fingerprints, overheads)
+    if options.columnar_output is not None:
+        from columnar import responses_to_columns, concat_columns, write_columnar
+        write_columnar(concat_columns(responses_to_columns(all_responses, overheads),
+                                      responses_to_columns(warmup_responses, overheads, warmup=True)),
+                       options.columnar_output)
 
 
 def add_performance_testing_args(parser: argparse.ArgumentParser) -> None:
     performance_testing_group = parser.add_argument_group("Arguments for running WDL performance tests")
     performance_testing_group.add_argument("--output", "-o", default="csv_output.csv",
                                            help='Specify the output CSV file.')
+    performance_testing_group.add_argument("--columnar-output", default=None,
+                                           help="Also write every run, including warm-up runs, to this file with a "
+                                                "typed schema that includes CPU time, peak memory and phase timings: "
+                                                "Parquet for .parquet, Arrow IPC for .arrow or .feather. Requires "
+                                                "pyarrow.")
     performance_testing_group.add_argument("--all-runners", "-a", default=False, action="store_true",
                                            help="Specify whether to run with all runners. This will override the "
                                                 "--runners argument.")
     performance_testing_group.add_argument("--runners", default=None,
                                            help="Specify multiple runners in a comma separated list.")
+    performance_testing_group.add_argument("--measure-overhead", default=False, action=argparse.BooleanOptionalAction,
+                                           help="Measure each runner's fixed overhead with a no-op workflow before "
+                                                "testing, and record it in the Overhead column of the CSV. This "
+                                                "costs --overhead-repeat + 1 extra runs per runner.")
+    performance_testing_group.add_argument("--overhead-repeat", default=5, type=int,
+                                           help="Number of no-op runs to take the median overhead of. Default: 5")
+    performance_testing_group.add_argument("--interleave", default=False, action="store_true",
+                                           help="Have the runners take turns on each test in a random order, instead "
+                                                "of each runner running every test in turn. The schedule is written "
+                                                "to a separate _schedule CSV.")
+    performance_testing_group.add_argument("--seed", default=None, type=int,
+                                           help="With --interleave, seed for the random order, to reproduce an "
+                                                "earlier schedule. Default: a new random seed, which is printed")
+    performance_testing_group.add_argument("--concurrent-runners", default=False, action="store_true",
+                                           help="With --interleave, run every runner on each test at the same time, "
+                                                "each pinned to its own disjoint share of the CPUs (of --cpus if "
+                                                "given).")
+    performance_testing_group.add_argument("--adaptive", default=False, action="store_true",
+                                           help="Instead of running each test --repeat times, keep repeating it "
+                                                "until the confidence interval of its median runtime is within "
+                                                "--target-ci-width of the median, or --max-repeat is reached.")
+    performance_testing_group.add_argument("--target-ci-width", default=0.05, type=float,
+                                           help="With --adaptive, the target width of the confidence interval of the "
+                                                "median, as a fraction of the median. Default: 0.05")
+    performance_testing_group.add_argument("--confidence", default=0.95, type=float,
+                                           help="With --adaptive, the confidence level of the interval. Default: 0.95")
+    performance_testing_group.add_argument("--min-repeat", default=6, type=int,
+                                           help="With --adaptive, the fewest measured runs of each test. Default: 6")
+    performance_testing_group.add_argument("--max-repeat", default=30, type=int,
+                                           help="With --adaptive, the most measured runs of each test. Default: 30")
+    performance_testing_group.add_argument("--warmup", default=None, type=int,
+                                           help="Number of runs of each test to do and discard before measuring. "
+                                                "Their times are written to a separate _warmup CSV. Default: 1 with "
+                                                "--adaptive, 0 otherwise")
 
 
 def main(args):
     parser = argparse.ArgumentParser(description=__doc__)
     add_options(parser)
     add_performance_testing_args(parser)
+    import argcomplete
     argcomplete.autocomplete(parser)
     options = parser.parse_args(args)
+    if options.interleave and options.adaptive:
+        parser.error("--interleave and --adaptive can't be used together")
+    if options.concurrent_runners and not options.interleave:
+        parser.error("--concurrent-runners requires --interleave")
+    if options.quarantine_flaky and options.history_db is None:
+        parser.error("--quarantine-flaky requires --history-db")
+    if options.columnar_output is not None:
+        from columnar import is_columnar, import_pyarrow
+        if not is_columnar(options.columnar_output):
+            parser.error("--columnar-output must end in .parquet, .arrow or .feather")
+        try:
+            # fail before running any tests rather than after
+            import_pyarrow()
+        except RuntimeError as e:
+            parser.error(str(e))
+    if options.history_db is not None:
+        # record the whole invocation as one run, with these options rather than those of each batch of tests
+        open_run(options.history_db, options)
     call_and_write_csv(options)
 
 
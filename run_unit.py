@@ -8,8 +8,6 @@ import os
 import subprocess
 import sys
 
-import argcomplete
-
 from run import WDLConformanceTestRunner, add_options
 
 
@@ -29,6 +27,7 @@ def main():
     parser.set_defaults(versions="1.1")  # override default to 1.1
     parser.set_defaults(runner="toil-wdl-runner")  # cromwell doesn't support 1.1+
 
+    import argcomplete
     argcomplete.autocomplete(parser)
     args = parser.parse_args()
 
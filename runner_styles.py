@@ -0,0 +1,34 @@
+"""
+runner_styles.py: How each runner is ordered and colored in graphs and reports.
+
+This is kept free of the harness and of matplotlib so that report.py and merge.py can use it without loading either.
+"""
+from typing import Dict, Iterable, Tuple
+
+graph_order = ["miniwdl", "toil-wdl-runner", "cromwell"]
+
+# matplotlib's default color cycle ("tab10"), so reports match the graphs
+DEFAULT_COLORS = ["#1f77b4", "#ff7f0e", "#2ca02c", "#d62728", "#9467bd",
+                  "#8c564b", "#e377c2", "#7f7f7f", "#bcbd22", "#17becf"]
+
+
+def graph_position(runner: str) -> Tuple[int, str]:
+    """
+    Sort key that puts the built-in runners first in graph_order, followed by any other runners by name.
+    """
+    return graph_order.index(runner) if runner in graph_order else len(graph_order), runner
+
+
+def get_runner_colors(runners: Iterable[str]) -> Dict[str, str]:
+    """
+    Map each runner to a color from DEFAULT_COLORS. The built-in runners always get the same colors.
+    """
+    colors = {
+        "miniwdl": DEFAULT_COLORS[0],
+        "cromwell": DEFAULT_COLORS[1],
+        "toil-wdl-runner": DEFAULT_COLORS[2]
+    }
+    other_runners = sorted(runner for runner in runners if runner not in colors)
+    for runner_idx, runner in enumerate(other_runners):
+        colors[runner] = DEFAULT_COLORS[(len(graph_order) + runner_idx) % len(DEFAULT_COLORS)]
+    return colors
@@ -0,0 +1,342 @@
+"""
+runners.py: Describe how to invoke each WDL runner, and what each one is capable of running.
+
+Runners other than the built-in ones can be added by installing a package that advertises a WDLRunner under the
+`wdl_conformance_tests.runners` entry point group. The entry point name is used as the runner name, and the object it
+points to can either be a WDLRunner instance or a callable (such as a WDLRunner subclass) that returns one:
+
+    [project.entry-points."wdl_conformance_tests.runners"]
+    my-runner = "my_package.conformance:MyRunner"
+"""
+import contextlib
+import fcntl
+import functools
+import hashlib
+import json
+import os
+import shlex
+import subprocess
+from shutil import which
+from typing import Optional, Any, Dict, List, Union, Iterable, Iterator
+
+from lib import run_cmd, WDL_VERSIONS
+
+RUNNER_ENTRY_POINT_GROUP = "wdl_conformance_tests.runners"
+
+# Test dependencies that depend on the runner rather than only on the host
+# See https://github.com/openwdl/wdl-tests/blob/main/docs/Specification.md#test-configuration
+RUNNER_FEATURES = ["docker", "singularity", "gpu", "disks"]
+
+
+class WDLRunner:
+    """
+    A class describing how to invoke a WDL runner to run a workflow, and the capability profile of that runner.
+
+    :param versions: WDL versions the runner can run
+    :param features: test dependencies from RUNNER_FEATURES that the runner supports
+    :param output_dialect: format of the results file the runner writes
+    :param max_concurrency: maximum number of tests to run with this runner at once, or None for no limit
+    :param clamps_cpu: whether the runner lowers task CPU requests to what the host has, instead of failing them
+    """
+    runner: str
+
+    def __init__(self, runner: str, versions: Optional[Iterable[str]] = None, features: Optional[Iterable[str]] = None,
+                 output_dialect: str = "miniwdl", max_concurrency: Optional[int] = None, clamps_cpu: bool = False):
+        self.runner = runner
+        self.versions = list(versions) if versions is not None else list(WDL_VERSIONS)
+        self.features = set(features) if features is not None else set(RUNNER_FEATURES)
+        self.output_dialect = output_dialect
+        self.max_concurrency = max_concurrency
+        self.clamps_cpu = clamps_cpu
+
+    def format_command(self, wdl_file, json_input, results_file, args, verbose, pre_args=None):
+        raise NotImplementedError
+
+    def bootstrap(self, verbose: bool, pre_args: Optional[str] = None) -> "WDLRunner":
+        """
+        Do any one-time setup the runner needs (such as downloading it) and return a runner whose command is fully
+        resolved, so it can be handed to test workers as is.
+
+        This is called once, in the main process, before any test runs.
+        """
+        return self
+
+    def unsupported_reason(self, test: Dict[str, Any], version: str) -> Optional[str]:
+        """
+        Return why this runner can't run a test on a WDL version, or None if it can.
+        """
+        if version not in self.versions:
+            return f"Runner only supports WDL versions: {','.join(self.versions)}"
+        missing = [d for d in test.get("dependencies") or [] if d in RUNNER_FEATURES and d not in self.features]
+        if missing:
+            return f"Runner does not support test dependencies: {','.join(missing)}"
+        return None
+
+    def executable(self) -> Optional[str]:
+        """
+        Get the path of the file that is run to invoke this runner, or None if it can't be found.
+        """
+        return which(self.runner.split(" ")[0])
+
+    def version_command(self) -> List[str]:
+        """
+        Get a command that prints the runner's version.
+        """
+        return [self.runner.split(" ")[0], "--version"]
+
+    def config_files(self, pre_args: Optional[str] = None) -> List[str]:
+        """
+        Get the configuration files that change how this runner behaves, if any exist.
+        """
+        return []
+
+    def python_command(self, cmd: List[str]) -> Optional[List[str]]:
+        """
+        Given a command made by format_command, get the same command with the Python interpreter that runs the
+        runner made explicit (ex: ["/usr/bin/python3", "/usr/bin/miniwdl", "run", ...]), so that the interpreter can be
+        given extra arguments such as a profiler. The interpreter is always the first element, even if the shebang
+        line finds it with env. Returns None if the runner isn't a Python script.
+        """
+        executable = which(cmd[0])
+        if executable is None:
+            return None
+        interpreter = script_interpreter(executable)
+        if interpreter is None:
+            return None
+        python_index = next((index for index, part in enumerate(interpreter)
+                             if os.path.basename(part).startswith("python")), None)
+        if python_index is None:
+            return None
+        # with "#!/usr/bin/env python3", env would look the interpreter up on PATH, so look it up here instead
+        python = which(interpreter[python_index])
+        if python is None:
+            return None
+        return [python] + interpreter[python_index + 1:] + [executable] + cmd[1:]
+
+    def fingerprint(self, pre_args: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Identify exactly which build and configuration of this runner is being tested.
+
+        The fingerprint holds the runner's version string, a hash of its executable, the version of the interpreter
+        (Python or Java) running it and a hash of each of its configuration files. Its "id" is a short hash of all of
+        those, so results with the same id came from the same runner setup.
+        """
+        executable = self.executable()
+        fingerprint = {
+            "version": _first_output_line(self.version_command()),
+            "executable": executable,
+            "sha256": _hash_file(executable) if executable is not None else None,
+            "interpreter": _interpreter_version(executable) if executable is not None else None,
+            "config_files": {path: _hash_file(path) for path in self.config_files(pre_args) if os.path.isfile(path)},
+        }
+        fingerprint["id"] = hashlib.sha256(json.dumps(fingerprint, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+        return fingerprint
+
+
+def _hash_file(path: str) -> str:
+    """
+    Get the sha256 hex digest of a file.
+    """
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _first_output_line(cmd: List[str]) -> Optional[str]:
+    """
+    Run a command and return the first non-empty line it prints to stdout or stderr, or None if it can't be run.
+    """
+    try:
+        p = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=120)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    for output in (p.stdout, p.stderr):
+        for line in output.decode("utf-8", errors="ignore").splitlines():
+            if line.strip():
+                return line.strip()
+    return None
+
+
+def script_interpreter(executable: str) -> Optional[List[str]]:
+    """
+    Get the interpreter command named by the shebang line of a script, or None if the executable isn't a script.
+    """
+    try:
+        with open(executable, "rb") as f:
+            first_line = f.readline().decode("utf-8", errors="ignore")
+    except OSError:
+        return None
+    if not first_line.startswith("#!"):
+        # a compiled binary
+        return None
+    return first_line[2:].split()
+
+
+def _interpreter_version(executable: str) -> Optional[str]:
+    """
+    Get the version of the interpreter that runs an executable: Java for jar files, or whatever the shebang line of
+    a script names (usually Python).
+    """
+    if executable.endswith(".jar"):
+        return _first_output_line(["java", "-version"])
+    interpreter = script_interpreter(executable)
+    if interpreter is None:
+        return None
+    return _first_output_line(interpreter + ["--version"])
+
+
+class CromwellStyleWDLRunner(WDLRunner):
+    def format_command(self, wdl_file: str, json_input: Union[str, Dict[str, Any]], results_file: str,
+                       args: List[str], verbose: bool, pre_args: Optional[List[str]] = None) -> List[str]:
+        """
+        Make a list of command parts to invoke a WDL runner that uses Cromwell-style arguments.
+
+        :param json_input: Can either be a json as a string or a dictionary that is json parseable
+        """
+        if isinstance(json_input, dict):
+            json_input = json.dumps(json_input)
+        json_arg = ["-i", json_input] if json_input is not None else []
+        return list(filter(None, self.runner.split(" "))) + [wdl_file, "-m", results_file] + json_arg + args
+
+
+@contextlib.contextmanager
+def file_lock(path: str) -> Iterator[None]:
+    """
+    Hold an exclusive lock on a file for the duration of the context, so only one process at a time (including other
+    copies of these scripts) can do what the lock guards.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class CromwellWDLRunner(CromwellStyleWDLRunner):
+    def __init__(self):
+        # Cromwell's languages are WDL draft-2 and 1.0, and its "development" is an early draft of 1.1 that can't
+        # parse "version 1.1" or "version 1.2" files, so those aren't run. It is given every test dependency, as its
+        # backend configuration decides which of them it can satisfy.
+        super().__init__('cromwell', versions=["draft-2", "1.0"], output_dialect="cromwell")
+
+    def bootstrap(self, verbose: bool, pre_args: Optional[str] = None) -> WDLRunner:
+        if which('cromwell'):
+            return self
+        # if there is no cromwell binary seen on the path, download
+        # our pinned version and use that instead
+        cromwell = os.path.abspath('build/cromwell.jar')
+        with file_lock('build/cromwell.jar.lock'):
+            if not os.path.exists(cromwell):
+                print('Cromwell not seen in the path, now downloading cromwell to run tests... ')
+                run_cmd(cmd='make cromwell'.split(" "), cwd=os.getcwd())
+        log_level = '-DLOG_LEVEL=OFF' if not verbose else ''
+        pre_args = '' if pre_args is None else pre_args
+        return CromwellStyleWDLRunner(f'java {log_level} {pre_args} -jar {cromwell} run', versions=self.versions,
+                                      features=self.features, output_dialect=self.output_dialect,
+                                      max_concurrency=self.max_concurrency, clamps_cpu=self.clamps_cpu)
+
+    def executable(self) -> Optional[str]:
+        cromwell = which('cromwell')
+        if cromwell is None and os.path.exists('build/cromwell.jar'):
+            cromwell = os.path.abspath('build/cromwell.jar')
+        return cromwell
+
+    def version_command(self) -> List[str]:
+        executable = self.executable()
+        if executable is not None and executable.endswith(".jar"):
+            return ["java", "-jar", executable, "--version"]
+        return ["cromwell", "--version"]
+
+    def config_files(self, pre_args: Optional[str] = None) -> List[str]:
+        # Cromwell config files are set as java system properties, ex: -Dconfig.file=build/overrides.conf
+        return [arg[len("-Dconfig.file="):] for arg in shlex.split(pre_args or "") if arg.startswith("-Dconfig.file=")]
+
+
+class MiniWDLStyleWDLRunner(WDLRunner):
+    def format_command(self, wdl_file: str, json_input: Union[str, Dict[str, Any]], results_file: str,
+                       args: List[str], verbose: bool, pre_args: Optional[List[str]] = None) -> List[str]:
+        if isinstance(json_input, dict):
+            json_input = json.dumps(json_input)
+        json_arg = ["-i", json_input] if json_input is not None else []
+        return self.runner.split(" ") + [wdl_file, "-o", results_file, "-d", "miniwdl-logs",
+                                         "--verbose"] + json_arg + args
+
+    def config_files(self, pre_args: Optional[str] = None) -> List[str]:
+        # See https://miniwdl.readthedocs.io/en/latest/runner_reference.html#configuration
+        config_home = os.environ.get("XDG_CONFIG_HOME", os.path.expanduser("~/.config"))
+        return [path for path in (os.environ.get("MINIWDL_CFG"), os.path.join(config_home, "miniwdl.cfg")) if path]
+
+
+class ToilWDLRunner(CromwellStyleWDLRunner):
+    def __init__(self):
+        super().__init__('toil-wdl-runner --outputDialect miniwdl --logDebug')
+
+    def config_files(self, pre_args: Optional[str] = None) -> List[str]:
+        return [os.path.expanduser("~/.toil/default.yaml")]
+
+
+BUILTIN_RUNNERS = {
+    'cromwell': CromwellWDLRunner(),
+    'toil-wdl-runner': ToilWDLRunner(),
+    # miniwdl's parser rejects "version 1.2" as an unknown WDL version, so 1.2 tests aren't run. It lowers task CPU
+    # requests to the host's cores.
+    'miniwdl': MiniWDLStyleWDLRunner('miniwdl run', versions=["draft-2", "1.0", "1.1", "development"],
+                                     clamps_cpu=True)
+}
+
+# Runners loaded from entry points, by name
+_loaded_runners: Dict[str, WDLRunner] = {}
+
+
+def _runner_entry_points() -> Dict[str, Any]:
+    """
+    Get the runner entry points advertised by installed packages, by name, without importing them.
+    """
+    from importlib.metadata import entry_points
+    return {entry_point.name: entry_point for entry_point in entry_points(group=RUNNER_ENTRY_POINT_GROUP)
+            if entry_point.name not in BUILTIN_RUNNERS}
+
+
+def get_runner_names() -> List[str]:
+    """
+    Get the names of all built-in and installed runners.
+    """
+    return list(BUILTIN_RUNNERS) + list(_runner_entry_points())
+
+
+def get_runner(name: str) -> WDLRunner:
+    """
+    Get the runner with the given name, loading it from its entry point if it isn't built in.
+    """
+    if name in BUILTIN_RUNNERS:
+        return BUILTIN_RUNNERS[name]
+    if name not in _loaded_runners:
+        entry_point = _runner_entry_points().get(name)
+        if entry_point is None:
+            raise KeyError(f"Unknown runner: {name}")
+        loaded = entry_point.load()
+        runner = loaded if isinstance(loaded, WDLRunner) else loaded()
+        if not isinstance(runner, WDLRunner):
+            raise TypeError(f"Entry point {name} in group {RUNNER_ENTRY_POINT_GROUP} did not provide a WDLRunner")
+        _loaded_runners[name] = runner
+    return _loaded_runners[name]
+
+
+@functools.lru_cache(maxsize=None)
+def bootstrap_runner(name: str, verbose: bool, pre_args: Optional[str] = None) -> WDLRunner:
+    """
+    Bootstrap a runner by name. This can download the runner, so the result is cached for the rest of the session.
+    """
+    return get_runner(name).bootstrap(verbose, pre_args)
+
+
+@functools.lru_cache(maxsize=None)
+def get_runner_fingerprint(name: str, pre_args: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Fingerprint a runner by name. This runs the runner, so the result is cached for the rest of the session.
+    """
+    return get_runner(name).fingerprint(pre_args)
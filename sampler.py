@@ -0,0 +1,162 @@
+"""
+sampler.py: Sample the resource usage of a runner's process tree from /proc while it runs a test.
+
+Only processes descended from the runner are seen, so tasks that a container engine daemon (such as dockerd) runs on
+the runner's behalf aren't included; Singularity containers and local tasks are.
+"""
+import json
+import os
+import threading
+import timeit
+from typing import Optional, Any, Dict, List, Tuple
+
+# Columns of a timeline, in order
+TIMELINE_COLUMNS = ["time", "processes", "cpu_percent", "rss_bytes", "open_fds", "threads", "read_bytes",
+                    "write_bytes"]
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+def read_stat(pid: int) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Read a process's parent pid, CPU time in clock ticks, thread count and resident pages from /proc/<pid>/stat.
+
+    Returns None if the process is gone.
+    """
+    try:
+        with open(f"/proc/{pid}/stat", "r") as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # the command name is in parentheses and can contain spaces, so split after it
+    fields = stat[stat.rfind(")") + 2:].split()
+    ppid, utime, stime, threads, rss = int(fields[1]), int(fields[11]), int(fields[12]), int(fields[17]), \
+        int(fields[21])
+    return ppid, utime + stime, threads, rss
+
+
+def read_io(pid: int) -> Tuple[int, int]:
+    """
+    Read the bytes a process has read from and written to storage, or zeros if they can't be read.
+    """
+    read_bytes = write_bytes = 0
+    try:
+        with open(f"/proc/{pid}/io", "r") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key == "read_bytes":
+                    read_bytes = int(value)
+                elif key == "write_bytes":
+                    write_bytes = int(value)
+    except OSError:
+        pass
+    return read_bytes, write_bytes
+
+
+def count_fds(pid: int) -> int:
+    """
+    Count a process's open file descriptors, or 0 if they can't be listed.
+    """
+    try:
+        return len(os.listdir(f"/proc/{pid}/fd"))
+    except OSError:
+        return 0
+
+
+class ProcessTreeSampler:
+    """
+    Poll /proc on a background thread for the resource usage of a process and all its descendants.
+
+    CPU usage is over the time since the previous sample, and I/O is cumulative since the process started,
+    including descendants that have since exited.
+
+    :param interval: seconds between samples
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.timeline: Dict[str, List[float]] = {column: [] for column in TIMELINE_COLUMNS}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # last seen CPU ticks and I/O bytes of every process ever in the tree
+        self._cpu_ticks: Dict[int, int] = {}
+        self._io: Dict[int, Tuple[int, int]] = {}
+
+    def start(self, pid: int) -> None:
+        """
+        Start sampling the tree of a running process.
+        """
+        self._thread = threading.Thread(target=self._run, args=(pid,), daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop sampling and wait for the sampling thread to finish.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _tree(self, root: int) -> Dict[int, Tuple[int, int, int, int]]:
+        stats = {}
+        for entry in os.listdir("/proc"):
+            if entry.isdigit():
+                stat = read_stat(int(entry))
+                if stat is not None:
+                    stats[int(entry)] = stat
+        children: Dict[int, List[int]] = {}
+        for pid, stat in stats.items():
+            children.setdefault(stat[0], []).append(pid)
+        tree = {}
+        pending = [root]
+        while pending:
+            pid = pending.pop()
+            if pid in stats:
+                tree[pid] = stats[pid]
+                pending.extend(children.get(pid, []))
+        return tree
+
+    def _run(self, root: int) -> None:
+        start = last = timeit.default_timer()
+        while True:
+            tree = self._tree(root)
+            now = timeit.default_timer()
+            ticks = 0
+            for pid, (_, cpu_ticks, _, _) in tree.items():
+                ticks += cpu_ticks - self._cpu_ticks.get(pid, 0)
+                self._cpu_ticks[pid] = cpu_ticks
+                self._io[pid] = read_io(pid)
+            elapsed = now - last
+            self.timeline["time"].append(round(now - start, 3))
+            self.timeline["processes"].append(len(tree))
+            self.timeline["cpu_percent"].append(round(100 * ticks / CLOCK_TICKS / elapsed, 1) if elapsed > 0 else 0)
+            self.timeline["rss_bytes"].append(sum(stat[3] for stat in tree.values()) * PAGE_SIZE)
+            self.timeline["open_fds"].append(sum(count_fds(pid) for pid in tree))
+            self.timeline["threads"].append(sum(stat[2] for stat in tree.values()))
+            self.timeline["read_bytes"].append(sum(io[0] for io in self._io.values()))
+            self.timeline["write_bytes"].append(sum(io[1] for io in self._io.values()))
+            last = now
+            if len(tree) == 0 or self._stop.wait(self.interval):
+                return
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Get the peak and average of each sampled gauge, and the total I/O.
+        """
+        summary: Dict[str, Any] = {"samples": len(self.timeline["time"])}
+        if summary["samples"] == 0:
+            return summary
+        for column in ["cpu_percent", "rss_bytes", "open_fds", "threads"]:
+            values = self.timeline[column]
+            summary[column] = {"peak": max(values), "avg": sum(values) / len(values)}
+        summary["read_bytes"] = self.timeline["read_bytes"][-1]
+        summary["write_bytes"] = self.timeline["write_bytes"][-1]
+        return summary
+
+    def write(self, path: str) -> None:
+        """
+        Write the timeline as JSON with one array per column.
+        """
+        with open(path, "w") as f:
+            json.dump({"interval": self.interval, "columns": self.timeline}, f, separators=(",", ":"))
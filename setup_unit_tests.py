@@ -16,7 +16,6 @@ import glob
 import json
 from ruamel.yaml import YAML
 import argparse
-import argcomplete
 from pathlib import Path
 import re
 import shutil
@@ -494,6 +493,7 @@ def main(argv=None):
         default=None,
         help="Branch of the repository to pull from. Will override the corresponding branch to the --version argument."
     )
+    import argcomplete
     argcomplete.autocomplete(parser)
     args = parser.parse_args(argv)
 
@@ -0,0 +1,64 @@
+"""
+Check that columnar results files survive being written, merged and exported as a performance CSV.
+
+    python -m unittest test_columnar
+
+pyarrow is optional, so these are skipped without it.
+"""
+import csv
+import importlib.util
+import os
+import tempfile
+import unittest
+
+from columnar import responses_to_columns, write_columnar, read_columnar
+import merge
+
+SUCCEEDED = {'id': 'sep', 'number': 4, 'version': '1.1', 'repeat': 1, 'status': 'SUCCEEDED',
+             'runner_fingerprint': 'abc', 'time': {'real': 1.5, 'user': 0.5, 'sys': 0.25}, 'max_rss': 1024}
+# no repeat, times or memory, so its integer columns are null
+FAILED = {'id': 'quote', 'number': 5, 'version': '1.1', 'status': 'FAILED', 'runner_fingerprint': 'def'}
+
+
+@unittest.skipUnless(importlib.util.find_spec("pyarrow") is not None, "pyarrow is not installed")
+class TestColumnarMerge(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.dir.name, name)
+
+    def test_round_trip(self):
+        for extension in (".parquet", ".arrow"):
+            with self.subTest(extension=extension):
+                write_columnar(responses_to_columns({'miniwdl': [SUCCEEDED]}, {'miniwdl': 0.5}),
+                               self.path(f"a{extension}"))
+                write_columnar(responses_to_columns({'toil-wdl-runner': [FAILED]}, {}), self.path(f"b{extension}"))
+                merge.main([self.path(f"a{extension}"), self.path(f"b{extension}"),
+                            "--output", self.path(f"merged{extension}")])
+                merged = read_columnar(self.path(f"merged{extension}"))
+                self.assertEqual(merged["test_id"].tolist(), ["quote", "sep"])
+                self.assertEqual(merged["max_rss_bytes"].tolist()[1], 1024)
+
+                merge.main([self.path(f"merged{extension}"), "--output", self.path("merged.csv")])
+                with open(self.path("merged.csv"), newline="") as f:
+                    rows = list(csv.DictReader(f))
+                self.assertEqual([(row["Test ID"], row["Runner"], row["Runtime"], row["Overhead"]) for row in rows],
+                                 [("quote", "toil-wdl-runner", "FAILED", ""), ("sep", "miniwdl", "1.5", "0.5")])
+
+    def test_missing_column(self):
+        import pyarrow.parquet as pq
+        write_columnar(responses_to_columns({'miniwdl': [SUCCEEDED]}, {}), self.path("new.parquet"))
+        # as written before max_rss_bytes was recorded
+        pq.write_table(pq.read_table(self.path("new.parquet")).drop_columns(["max_rss_bytes"]), self.path("old.parquet"))
+        merge.main([self.path("new.parquet"), self.path("old.parquet"), "--output", self.path("merged.parquet")])
+        merged = pq.read_table(self.path("merged.parquet"))
+        self.assertEqual(str(merged.schema.field("max_rss_bytes").type), "int64")
+        self.assertEqual(merged.column("max_rss_bytes").to_pylist(), [1024, None])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+"""
+Check that Python-based runners can be profiled whatever shebang line their script has.
+
+    python -m unittest test_profiling
+"""
+import os
+import stat
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from profiling import wrap_command
+from runners import WDLRunner
+
+
+class TestProfiledCommand(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.profile_file = os.path.join(self.dir.name, "out.prof")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def make_script(self, shebang: str) -> str:
+        script = os.path.join(self.dir.name, "fake-runner")
+        with open(script, "w") as f:
+            f.write(f"#!{shebang}\nimport sys\nprint(' '.join(sys.argv[1:]))\n")
+        os.chmod(script, os.stat(script).st_mode | stat.S_IXUSR)
+        return script
+
+    def check_profiled(self, shebang: str) -> None:
+        script = self.make_script(shebang)
+        python_cmd = WDLRunner(script).python_command([script, "run", "a.wdl"])
+        self.assertIsNotNone(python_cmd)
+        self.assertTrue(os.path.basename(python_cmd[0]).startswith("python"))
+        self.assertEqual(python_cmd[-3:], [script, "run", "a.wdl"])
+        cmd = wrap_command(python_cmd, "cprofile", self.profile_file)
+        self.assertEqual(cmd[1:5], ["-m", "cProfile", "-o", self.profile_file])
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), "run a.wdl")
+        self.assertTrue(os.path.exists(self.profile_file))
+
+    def test_absolute_shebang(self):
+        self.check_profiled(sys.executable)
+
+    def test_env_shebang(self):
+        self.check_profiled(f"/usr/bin/env {os.path.basename(sys.executable)}")
+
+
+if __name__ == "__main__":
+    unittest.main()
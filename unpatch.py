@@ -8,8 +8,6 @@ import os
 import subprocess
 import sys
 
-import argcomplete
-
 from lib import get_wdl_version_from_file, WDL_VERSIONS
 
 
@@ -50,7 +48,7 @@ def unpatch(directory, version, filename):
         for patch_file in patch_files:
             output_version = os.path.splitext(os.path.basename(patch_file))[0]
             output_basename = os.path.basename(base_wdl)
-            for version_name in [f"_version_{version}" for version in WDL_VERSIONS]:]:
+            for version_name in [f"_version_{version}" for version in WDL_VERSIONS]:
                 # filename may have a version suffix if --rename was not used, so get rid of it when recreating
                 output_basename = output_basename.replace(version_name, "")
             output_file = os.path.splitext(output_basename)[0] + "_" + output_version + ".wdl"
@@ -94,6 +92,7 @@ def main(argv=None):
     parser.add_argument("--file", "-f", default=None,
                         help="File name of base WDL file. If specified, it will use it to create patched files from."
                              "Takes priority over --version")
+    import argcomplete
     argcomplete.autocomplete(parser)
     args = parser.parse_args(argv)
 